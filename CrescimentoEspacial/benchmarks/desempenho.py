@@ -0,0 +1,209 @@
+"""
+Suite de benchmarks do modelo.
+
+Mede, para cada tamanho de grade: passos/s de `Dinamica.passo`, pico de
+memória (primeiro passo, que aloca o espaço de trabalho, e passo em regime),
+o tempo de cada termo isolado (Laplaciano/gradientes, convolução de
+spillover, divergência de migração) e o custo de `Visualizacao.atualizar`
+(quando há display). Grava JSON e, com `--base`, compara com uma execução
+anterior e sai com código 1 se alguma métrica piorar além de `--limite`.
+
+Uso:
+    python benchmarks/desempenho.py --tamanhos 50 128 256 512 1024 \\
+        --saida bench.json --base bench_anterior.json --limite 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.model.parametros import Parametros
+from src.model.estado import Estado
+from src.model.dinamica import Dinamica
+
+TAMANHOS_PADRAO = (50, 128, 256, 512, 1024)
+
+# Sentido de cada métrica: +1 quando maior é melhor, -1 quando menor é melhor
+SENTIDO = {
+    'passos_por_segundo': +1,
+    'pico_memoria_primeiro_passo': -1,
+    'pico_memoria_passo': -1,
+    'tempo_laplaciano': -1,
+    'tempo_spillover': -1,
+    'tempo_migracao': -1,
+    'tempo_visualizacao': -1,
+}
+
+
+def cronometrar(funcao, tempo_min=0.2, repeticoes=5):
+    """Tempo por chamada (mediana de `repeticoes` rodadas de pelo menos `tempo_min` s)."""
+    funcao()  # aquecimento (caches, buffers)
+    medidas = []
+    for _ in range(repeticoes):
+        n, inicio = 0, time.perf_counter()
+        while True:
+            funcao()
+            n += 1
+            decorrido = time.perf_counter() - inicio
+            if decorrido >= tempo_min:
+                break
+        medidas.append(decorrido / n)
+    return float(np.median(medidas))
+
+
+def pico_memoria(funcao):
+    """Pico de bytes alocados (tracemalloc) durante uma chamada."""
+    ja_ativo = tracemalloc.is_tracing()
+    if not ja_ativo:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    try:
+        funcao()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if not ja_ativo:
+            tracemalloc.stop()
+
+
+def _novo_caso(n):
+    params = Parametros(Nx=n, Ny=n)
+    np.random.seed(0)
+    estado = Estado(params)
+    estado.inicializar_com_ruido()
+    return params, estado, Dinamica(params)
+
+
+def _medir_visualizacao(estado, tempo_min, repeticoes):
+    """Tempo de `Visualizacao.atualizar`, ou None sem display disponível."""
+    try:
+        import tkinter as tk
+        raiz = tk.Tk()
+    except Exception:
+        return None
+    try:
+        from src.gui.visualizacao import Visualizacao
+        raiz.geometry("1200x800")
+        vis = Visualizacao(raiz, estado)
+        vis.pack(fill=tk.BOTH, expand=True)
+        raiz.update()
+
+        def atualizar():
+            vis.atualizar()
+            raiz.update()
+        return cronometrar(atualizar, tempo_min, repeticoes)
+    finally:
+        raiz.destroy()
+
+
+def medir(tamanhos=TAMANHOS_PADRAO, tempo_min=0.2, repeticoes=5, visualizacao=True):
+    """Executa a suite e retorna o dicionário de resultados."""
+    resultados = {}
+    for n in tamanhos:
+        params, estado, dinamica = _novo_caso(n)
+        r = {}
+        r['pico_memoria_primeiro_passo'] = pico_memoria(lambda: dinamica.passo(estado))
+        r['pico_memoria_passo'] = pico_memoria(lambda: dinamica.passo(estado))
+
+        # O passo é medido a partir de um estado fixo, restaurado a cada rodada,
+        # para não depender de a trajetória divergir em grades grandes
+        inicial = estado.dados.copy()
+
+        def passo():
+            np.copyto(estado.dados, inicial)
+            dinamica.passo(estado)
+        t_restaurar = cronometrar(lambda: np.copyto(estado.dados, inicial), tempo_min, repeticoes)
+        t_passo = max(cronometrar(passo, tempo_min, repeticoes) - t_restaurar, 1e-12)
+        r['passos_por_segundo'] = 1.0 / t_passo
+
+        np.copyto(estado.dados, inicial)
+        ws = dinamica.espaco_trabalho(estado)
+        dinamica.tendencias(estado)  # W e U consistentes com o estado
+        dx, dy = estado.dx, estado.dy
+        r['tempo_laplaciano'] = cronometrar(
+            lambda: dinamica.calcular_derivadas_espaciais(estado.K, dx, dy), tempo_min, repeticoes)
+        r['tempo_spillover'] = cronometrar(
+            lambda: dinamica.spillover.aplicar(estado.A, out=ws.spillover), tempo_min, repeticoes)
+
+        def migracao():
+            dinamica._fluxo(estado.U, estado.L, params.m_L, ws.fluxo_L_x, ws.fluxo_L_y, dx, dy)
+            dinamica._divergente(ws.fluxo_L_x, ws.fluxo_L_y, dx, dy, ws.div, ws.tmp)
+        r['tempo_migracao'] = cronometrar(migracao, tempo_min, repeticoes)
+        r['tempo_visualizacao'] = (_medir_visualizacao(estado, tempo_min, repeticoes)
+                                   if visualizacao else None)
+        resultados[str(n)] = r
+    return {
+        'ambiente': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'plataforma': platform.platform(),
+            'processador': platform.processor(),
+            'nucleos': os.cpu_count(),
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, base, limite=0.15):
+    """
+    Lista as regressões de `atual` em relação a `base`: métricas que pioraram
+    mais que a fração `limite`. Tamanhos ou métricas ausentes em um dos lados
+    são ignorados.
+    """
+    regressoes = []
+    for tamanho, metricas in atual['resultados'].items():
+        anteriores = base['resultados'].get(tamanho, {})
+        for nome, valor in metricas.items():
+            anterior = anteriores.get(nome)
+            if valor is None or anterior is None or anterior <= 0 or nome not in SENTIDO:
+                continue
+            variacao = (valor - anterior) / anterior * SENTIDO[nome]
+            if variacao < -limite:
+                regressoes.append({'tamanho': int(tamanho), 'metrica': nome,
+                                   'base': anterior, 'atual': valor, 'variacao': variacao})
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=list(TAMANHOS_PADRAO))
+    parser.add_argument('--saida', help="arquivo JSON de saída (padrão: stdout)")
+    parser.add_argument('--base', help="JSON de uma execução anterior para comparação")
+    parser.add_argument('--limite', type=float, default=0.15,
+                        help="piora relativa tolerada antes de acusar regressão")
+    parser.add_argument('--tempo-min', type=float, default=0.2)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--sem-visualizacao', action='store_true')
+    args = parser.parse_args(argv)
+
+    atual = medir(args.tamanhos, args.tempo_min, args.repeticoes, not args.sem_visualizacao)
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        atual['comparacao'] = {'base': args.base, 'limite': args.limite,
+                               'regressoes': comparar(atual, base, args.limite)}
+
+    texto = json.dumps(atual, indent=2)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    regressoes = atual.get('comparacao', {}).get('regressoes', [])
+    for r in regressoes:
+        print(f"REGRESSÃO {r['tamanho']}²: {r['metrica']} {r['base']:.4g} -> {r['atual']:.4g} "
+              f"({100 * r['variacao']:+.1f}%)", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Validação dos modos de precisão do modelo.
+
+Roda a referência em float64 e cada modo pedido ('float32', 'misto') em
+paralelo, a partir da mesma condição inicial, e registra a cada
+`--intervalo` passos o desvio de cada campo em relação à referência (erro
+relativo máximo, RMS e da média espacial). Mede também passos/s e a memória
+do estado e do espaço de trabalho de cada modo. Grava JSON.
+
+Uso:
+    python benchmarks/precisao.py --tamanho 256 --passos 5000 --intervalo 250 \\
+        --saida precisao.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.model.parametros import Parametros
+from src.model.estado import Estado
+from src.model.dinamica import Dinamica
+from src.execucao.trabalhador import CAMPOS_QUADRO
+
+MODOS_PADRAO = ('float32', 'misto')
+
+
+def desvio(campo, referencia):
+    """Erros relativos de `campo` em relação a `referencia` (escala: max|referencia|)."""
+    ref = referencia.astype(np.float64)
+    erro = campo.astype(np.float64) - ref
+    escala = max(float(np.abs(ref).max()), 1e-300)
+    media_ref = float(ref.mean())
+    return {
+        'max_rel': float(np.abs(erro).max()) / escala,
+        'rms_rel': float(np.sqrt(np.mean(erro ** 2))) / escala,
+        'media_rel': abs(float(erro.mean())) / max(abs(media_ref), 1e-300),
+    }
+
+
+def _bytes_trabalho(ws):
+    return sum(v.nbytes for v in vars(ws).values() if isinstance(v, np.ndarray))
+
+
+def _novo_caso(n, precisao, integrador, inicial):
+    params = Parametros(Nx=n, Ny=n, integrador=integrador, precisao=precisao)
+    estado = Estado(params)
+    estado.dados[...] = inicial
+    return estado, Dinamica(params)
+
+
+def validar(tamanho=128, passos=1000, intervalo=100, modos=MODOS_PADRAO,
+            integrador='imex', semente=0):
+    """Executa a validação e retorna o dicionário de resultados."""
+    np.random.seed(semente)
+    base = Estado(Parametros(Nx=tamanho, Ny=tamanho))
+    base.inicializar_com_ruido()
+
+    casos = {m: _novo_caso(tamanho, m, integrador, base.dados)
+             for m in ('float64',) + tuple(modos)}
+    tempos = dict.fromkeys(casos, 0.0)
+    series = {m: [] for m in modos}
+
+    for passo in range(1, passos + 1):
+        for modo, (estado, dinamica) in casos.items():
+            inicio = time.perf_counter()
+            dinamica.passo(estado)
+            tempos[modo] += time.perf_counter() - inicio
+        if passo % intervalo and passo != passos:
+            continue
+        referencia = casos['float64'][0]
+        for modo in modos:
+            estado = casos[modo][0]
+            series[modo].append({
+                'passo': passo,
+                'campos': {nome: desvio(getattr(estado, nome), getattr(referencia, nome))
+                           for nome in CAMPOS_QUADRO},
+            })
+
+    resultados = {}
+    for modo, (estado, dinamica) in casos.items():
+        resultados[modo] = {
+            'passos_por_segundo': passos / max(tempos[modo], 1e-12),
+            'bytes_estado': estado.dados.nbytes,
+            'bytes_trabalho': _bytes_trabalho(dinamica.espaco_trabalho(estado)),
+            'finito': bool(np.isfinite(estado.dados).all()),
+        }
+        if modo in series:
+            resultados[modo]['desvio'] = series[modo]
+    return {'tamanho': tamanho, 'passos': passos, 'integrador': integrador,
+            'resultados': resultados}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--tamanho', type=int, default=128)
+    parser.add_argument('--passos', type=int, default=1000)
+    parser.add_argument('--intervalo', type=int, default=100)
+    parser.add_argument('--modos', nargs='+', default=list(MODOS_PADRAO))
+    parser.add_argument('--integrador', default='imex')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', help="arquivo JSON de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    resultado = validar(args.tamanho, args.passos, args.intervalo, args.modos,
+                        args.integrador, args.semente)
+    texto = json.dumps(resultado, indent=2)
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            f.write(texto + '\n')
+    else:
+        print(texto)
+
+    ref = resultado['resultados']['float64']
+    for modo in args.modos:
+        r = resultado['resultados'][modo]
+        pior = max(d['max_rel'] for d in r['desvio'][-1]['campos'].values())
+        print(f"{modo}: {r['passos_por_segundo'] / ref['passos_por_segundo']:.2f}x passos/s, "
+              f"{r['bytes_estado'] / ref['bytes_estado']:.2f}x memória do estado, "
+              f"desvio máximo final {pior:.3g}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
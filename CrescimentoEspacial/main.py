@@ -1,14 +1,142 @@
-import sys
+"""
+Ponto de entrada.
+
+    python main.py                  # GUI (o mesmo que `python main.py gui`)
+    python main.py executar ...     # uma simulação sem GUI
+    python main.py varredura ...    # varredura de parâmetros sem GUI
+    python main.py servidor ...     # servidor de quadros para visualizadores remotos
+
+Só os módulos do subcomando escolhido são importados: os comandos sem GUI
+não carregam tkinter nem matplotlib.
+"""
+import argparse
+import json
 import os
+import sys
 
 # Adicionar o diretório atual ao path para importar módulos corretamente
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from src.gui.janela_principal import JanelaPrincipal
 
-def main():
+def _parametros(atribuicoes, Nx, Ny):
+    """Parametros a partir de 'nome=valor', convertendo pelo tipo do campo."""
+    from dataclasses import fields
+    from src.model.parametros import Parametros
+
+    tipos = {f.name: f.type for f in fields(Parametros)}
+    valores = {'Nx': Nx, 'Ny': Ny}
+    for atribuicao in atribuicoes:
+        nome, _, valor = atribuicao.partition('=')
+        if nome not in tipos or not valor:
+            raise SystemExit(f"Parâmetro inválido: {atribuicao!r} (use nome=valor)")
+        valores[nome] = tipos[nome](valor)
+    return Parametros(**valores)
+
+
+def _grade(atribuicoes):
+    """{'nome': [v1, v2, ...]} a partir de 'nome=v1,v2,...' (a Varredura converte os números)."""
+    grade = {}
+    for atribuicao in atribuicoes:
+        nome, _, valores = atribuicao.partition('=')
+        if not valores:
+            raise SystemExit(f"Grade inválida: {atribuicao!r} (use nome=v1,v2,...)")
+        grade[nome] = valores.split(',')
+    return grade
+
+
+def gui(args):
+    from src.gui.janela_principal import JanelaPrincipal
     app = JanelaPrincipal()
     app.mainloop()
 
+
+def executar(args):
+    import numpy as np
+    from dataclasses import asdict
+    from src.model.estado import Estado, CAMPOS
+    from src.model.dinamica import Dinamica
+    from src.execucao.controle import ControladorExecucao
+
+    params = _parametros(args.param, args.Nx, args.Ny)
+    estado = Estado(params)
+    estado.inicializar_com_ruido(args.ruido, np.random.default_rng(args.semente))
+    dinamica = Dinamica(params)
+    if args.diagnostico:
+        from src.model.diagnostico import Diagnostico
+        dinamica.diagnostico = Diagnostico(intervalo=args.intervalo)
+
+    resultado = ControladorExecucao(dinamica, intervalo=args.intervalo, tol=args.tol).executar(estado, args.passos)
+    resumo = asdict(resultado)
+    resumo['medias'] = {nome: float(estado.dados[i].mean()) for i, nome in enumerate(CAMPOS)}
+    if args.saida:
+        np.savez(args.saida, dados=estado.dados, t=np.asarray(estado.t), campos=np.array(CAMPOS))
+    if args.diagnostico:
+        dinamica.diagnostico.salvar(args.diagnostico)
+    print(json.dumps(resumo, indent=2))
+    return resultado
+
+
+def varredura(args):
+    from src.execucao.varredura import Varredura
+
+    base = _parametros(args.param, args.Nx, args.Ny)
+    resultado = Varredura(_grade(args.grade), args.passos, base=base, diretorio=args.diretorio,
+                          semente=args.semente, tol=args.tol, intervalo=args.intervalo
+                          ).executar(processos=args.processos)
+    passos = resultado.passos_executados()
+    for i, combinacao in enumerate(resultado.combinacoes):
+        print(json.dumps({'combinacao': combinacao, 'passos': int(passos[i])}))
+    return resultado
+
+
+def servidor(args):
+    from src.execucao.servidor import main as main_servidor
+    main_servidor(args.argumentos)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(description="Modelo EDP de crescimento econômico espacial")
+    comandos = parser.add_subparsers(dest='comando')
+    comandos.add_parser('gui', help="interface gráfica (padrão)").set_defaults(funcao=gui)
+
+    def sem_gui(nome, funcao, ajuda):
+        sub = comandos.add_parser(nome, help=ajuda)
+        sub.add_argument('--Nx', type=int, default=50)
+        sub.add_argument('--Ny', type=int, default=50)
+        sub.add_argument('--param', action='append', default=[], metavar='NOME=VALOR')
+        sub.add_argument('--passos', type=int, default=100)
+        sub.add_argument('--tol', type=float, default=None, help="parar ao convergir")
+        sub.add_argument('--intervalo', type=int, default=10, help="passos entre verificações")
+        sub.add_argument('--semente', type=int, default=0)
+        sub.set_defaults(funcao=funcao)
+        return sub
+
+    sub = sem_gui('executar', executar, "uma simulação sem GUI; imprime um resumo em JSON")
+    sub.add_argument('--ruido', type=float, default=0.1)
+    sub.add_argument('--saida', help="grava o estado final em um .npz")
+    sub.add_argument('--diagnostico', help="grava as séries de diagnóstico em um .npz")
+
+    sub = sem_gui('varredura', varredura, "varredura de parâmetros em vários processos")
+    sub.add_argument('--grade', action='append', default=[], required=True, metavar='NOME=V1,V2,...')
+    sub.add_argument('--diretorio', help="grava (e retoma) os resultados neste diretório")
+    sub.add_argument('--processos', type=int, default=None)
+
+    # Sem opções próprias: tudo (inclusive --help) vai para o parser do servidor
+    sub = comandos.add_parser('servidor', add_help=False,
+                              help="servidor de quadros (opções de src.execucao.servidor)")
+    sub.set_defaults(funcao=servidor)
+    return parser
+
+
+def main(argv=None):
+    parser = _parser()
+    args, resto = parser.parse_known_args(argv)
+    if args.comando == 'servidor':
+        args.argumentos = resto
+    elif resto:
+        parser.error(f"argumentos não reconhecidos: {' '.join(resto)}")
+    return getattr(args, 'funcao', gui)(args)
+
+
 if __name__ == "__main__":
     main()
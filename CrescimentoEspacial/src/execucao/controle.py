@@ -0,0 +1,252 @@
+"""
+Controle de execuções longas: convergência, divergência e eventos.
+
+`ControladorExecucao` avança uma `Dinamica` e, a cada `intervalo` passos,
+avalia critérios baratos sobre o estado: a taxa de variação relativa desde
+a última verificação (convergência), valores não finitos (divergência) e
+eventos definidos pelo usuário sobre agregados como o produto total ou a
+poluição máxima. Cada critério dispara uma ação: parar, gravar um
+checkpoint ou ajustar o dt.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Callable, Union
+
+import numpy as np
+
+from ..model.estado import Estado, CAMPOS
+from ..model.dinamica import Dinamica
+
+ACOES = ('parar', 'checkpoint', 'reduzir_dt', 'registrar')
+REDUCOES = {
+    'total': lambda Z, estado: float(np.sum(Z)) * estado.dx * estado.dy,
+    'media': lambda Z, estado: float(np.mean(Z)),
+    'max': lambda Z, estado: float(np.max(Z)),
+    'min': lambda Z, estado: float(np.min(Z)),
+}
+
+
+def metrica(nome):
+    """
+    Função f(estado) -> float para um nome '<campo>_<redução>', como
+    'Y_total' (integral no domínio), 'P_max', 'L_min' ou 'K_media'.
+    """
+    campo, _, reducao = nome.partition('_')
+    if campo not in CAMPOS or reducao not in REDUCOES:
+        raise ValueError(f"Métrica desconhecida: {nome!r} (use <campo>_<{'|'.join(REDUCOES)}>)")
+    indice, reduzir = CAMPOS.index(campo), REDUCOES[reducao]
+    return lambda estado: reduzir(estado.dados[indice], estado)
+
+
+@dataclass
+class Evento:
+    """
+    Dispara `acao` quando `metrica` passa de `limite` (para cima, ou para
+    baixo com `acima=False`). O evento dispara na transição: só volta a
+    disparar depois que a condição deixar de valer.
+    """
+    nome: str
+    metrica: Union[str, Callable]
+    limite: float
+    acima: bool = True
+    acao: str = 'parar'
+
+    def __post_init__(self):
+        if self.acao not in ACOES:
+            raise ValueError(f"Ação desconhecida: {self.acao!r} (use {ACOES})")
+        self._avaliar = metrica(self.metrica) if isinstance(self.metrica, str) else self.metrica
+
+    def valor(self, estado: Estado):
+        return self._avaliar(estado)
+
+    def ocorre(self, valor):
+        return valor > self.limite if self.acima else valor < self.limite
+
+
+@dataclass
+class ResultadoExecucao:
+    """Resultado de `ControladorExecucao.executar`."""
+    motivo: str  # 'passos', 'tempo', 'convergencia', 'divergencia' ou 'evento:<nome>'
+    passos: int
+    t: float
+    variacao: float = None  # última taxa de variação relativa medida
+    dt: float = None  # dt em uso no fim (menor que o dos parâmetros se foi reduzido; lista em ensemble)
+    ocorrencias: list = field(default_factory=list)  # eventos, divergências e ajustes de dt
+    checkpoints: list = field(default_factory=list)
+
+
+def salvar_checkpoint(estado: Estado, caminho, passo=0):
+    """Grava `estado.dados`, o tempo e o passo em um .npz (escrita atômica)."""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'wb') as f:
+        np.savez(f, dados=estado.dados, t=np.asarray(estado.t), passo=passo)
+    os.replace(temporario, caminho)
+
+
+def carregar_checkpoint(caminho, estado: Estado):
+    """Restaura em `estado` um checkpoint gravado por `salvar_checkpoint`; retorna o passo."""
+    with np.load(caminho) as arquivo:
+        if arquivo['dados'].shape != estado.dados.shape:
+            raise ValueError(f"Checkpoint com forma {arquivo['dados'].shape}, esperado {estado.dados.shape}")
+        estado.dados[...] = arquivo['dados']
+        estado.zerar_compensacao()
+        t = arquivo['t']
+        estado.t = t.copy() if t.ndim else float(t)
+        return int(arquivo['passo'])
+
+
+class ControladorExecucao:
+    """
+    Avança `dinamica` com critérios de parada avaliados a cada `intervalo` passos.
+
+    - Convergência: com `tol`, a execução para quando a taxa de variação
+      relativa max_campo RMS(y - y_anterior) / RMS(y) / Δt, medida entre duas
+      verificações, cai abaixo de `tol`.
+    - Divergência: valores não finitos em K, H, A, P ou L. O estado volta à
+      última verificação (que era finita). Com `ao_divergir='parar'` a
+      execução termina aí; com 'reduzir_dt', o dt é multiplicado por
+      `fator_dt` e o trecho é refeito (no máximo `max_reducoes` vezes, sem
+      passar de `dt_min`).
+    - `eventos`: lista de `Evento` sobre métricas agregadas.
+
+    Ações de evento: 'parar'; 'checkpoint' (grava em `diretorio`);
+    'reduzir_dt' (multiplica `dinamica.p.dt` por `fator_dt`, sem refazer
+    passos); 'registrar' (só anota em `ResultadoExecucao.ocorrencias`).
+    As reduções de dt valem só durante `executar`: ao terminar, o dt dos
+    parâmetros volta ao original, e o dt em uso no fim fica em
+    `ResultadoExecucao.dt`.
+
+    Observadores f(estado, passo), como em `TrabalhadorSimulacao`, são
+    chamados após cada passo. O único custo fora das verificações é o laço;
+    cada verificação copia o estado uma vez para um buffer pré-alocado.
+    """
+    def __init__(self, dinamica: Dinamica, intervalo=10, tol=None, eventos=(),
+                 ao_divergir='parar', fator_dt=0.5, dt_min=None, max_reducoes=10, diretorio=None):
+        if ao_divergir not in ('parar', 'reduzir_dt'):
+            raise ValueError("ao_divergir deve ser 'parar' ou 'reduzir_dt'")
+        if intervalo < 1:
+            raise ValueError("intervalo deve ser positivo")
+        eventos = list(eventos)
+        if diretorio is None and any(e.acao == 'checkpoint' for e in eventos):
+            raise ValueError("Eventos com ação 'checkpoint' exigem `diretorio`")
+        self.dinamica = dinamica
+        self.intervalo = intervalo
+        self.tol = tol
+        self.eventos = eventos
+        self.ao_divergir = ao_divergir
+        self.fator_dt = fator_dt
+        self.dt_min = dt_min
+        self.max_reducoes = max_reducoes
+        self.diretorio = diretorio
+        self.observadores = []
+        self._anterior = None
+
+    def _variacao(self, estado: Estado, t_anterior):
+        """Taxa de variação relativa desde a última verificação (inf se não finita)."""
+        n = estado.prognosticos.shape[0]
+        y = estado.prognosticos.reshape(n, -1)
+        y0 = self._anterior[:n].reshape(n, -1)
+        soma_y = np.einsum('ij,ij->i', y, y, dtype=np.float64)
+        if not np.all(np.isfinite(soma_y)):
+            return np.inf
+        np.subtract(y, y0, out=self._diferenca)
+        soma_d = np.einsum('ij,ij->i', self._diferenca, self._diferenca, dtype=np.float64)
+        dt = float(np.max(estado.t)) - t_anterior
+        relativa = np.sqrt(soma_d / np.maximum(soma_y, 1e-300))
+        return float(relativa.max()) / dt if dt > 0 else 0.0
+
+    def _guardar(self, estado: Estado):
+        np.copyto(self._anterior, estado.dados)
+        return estado.t, float(np.max(estado.t))
+
+    def _checkpoint(self, estado: Estado, passo, resultado: ResultadoExecucao):
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, f'checkpoint_{passo:08d}.npz')
+        salvar_checkpoint(estado, caminho, passo)
+        resultado.checkpoints.append(caminho)
+
+    def _reduzir_dt(self):
+        """Multiplica dt por `fator_dt`; retorna False se passaria de `dt_min`."""
+        p = self.dinamica.p
+        dt = p.dt * self.fator_dt
+        if self.dt_min is not None and np.min(dt) < self.dt_min:
+            return False
+        p.dt = dt
+        return True
+
+    def executar(self, estado: Estado, passos=None, t_final=None):
+        """Avança até `passos` passos e/ou o tempo `t_final`, ou até um critério de parada."""
+        if passos is None and t_final is None:
+            raise ValueError("Defina `passos` e/ou `t_final`")
+        if self._anterior is None or self._anterior.shape != estado.dados.shape:
+            self._anterior = np.empty_like(estado.dados)
+            n = estado.prognosticos.shape[0]
+            self._diferenca = np.empty((n, estado.prognosticos[0].size), dtype=estado.dados.dtype)
+        resultado = ResultadoExecucao(motivo='passos' if passos is not None else 'tempo', passos=0, t=0.0)
+        p = self.dinamica.p
+        dt_original = p.dt
+        try:
+            self._executar(estado, passos, t_final, resultado)
+        finally:
+            resultado.dt = np.asarray(p.dt).tolist()
+            p.dt = dt_original
+        return resultado
+
+    def _executar(self, estado: Estado, passos, t_final, resultado: ResultadoExecucao):
+        ativos = set()
+        t_salvo, t_anterior = self._guardar(estado)
+        passo_salvo = passo = reducoes = 0
+
+        while (passos is None or passo < passos) and \
+                (t_final is None or float(np.max(estado.t)) < t_final - 1e-12):
+            self.dinamica.passo(estado)
+            passo += 1
+            for observador in self.observadores:
+                observador(estado, passo)
+            fim = passo == passos or (t_final is not None and float(np.max(estado.t)) >= t_final - 1e-12)
+            if passo % self.intervalo and not fim:
+                continue
+
+            variacao = self._variacao(estado, t_anterior)
+            if not np.isfinite(variacao):
+                resultado.ocorrencias.append({'passo': passo, 't': float(np.max(estado.t)),
+                                              'nome': 'divergencia', 'acao': self.ao_divergir})
+                # Voltar à última verificação
+                estado.dados[...] = self._anterior
+                estado.zerar_compensacao()
+                estado.t = t_salvo
+                passo = passo_salvo
+                if self.ao_divergir == 'reduzir_dt' and reducoes < self.max_reducoes and self._reduzir_dt():
+                    reducoes += 1
+                    continue
+                resultado.motivo = 'divergencia'
+                break
+            resultado.variacao = variacao
+
+            parar = None
+            for evento in self.eventos:
+                valor = evento.valor(estado)
+                if not evento.ocorre(valor):
+                    ativos.discard(evento.nome)
+                    continue
+                if evento.nome in ativos:
+                    continue
+                ativos.add(evento.nome)
+                resultado.ocorrencias.append({'passo': passo, 't': float(np.max(estado.t)),
+                                              'nome': evento.nome, 'valor': valor, 'acao': evento.acao})
+                if evento.acao == 'parar':
+                    parar = parar or 'evento:' + evento.nome
+                elif evento.acao == 'checkpoint':
+                    self._checkpoint(estado, passo, resultado)
+                elif evento.acao == 'reduzir_dt':
+                    self._reduzir_dt()
+            if parar is None and self.tol is not None and variacao <= self.tol:
+                parar = 'convergencia'
+            if parar is not None:
+                resultado.motivo = parar
+                break
+            t_salvo, t_anterior = self._guardar(estado)
+            passo_salvo = passo
+
+        resultado.passos = passo
+        resultado.t = float(np.max(estado.t))
@@ -0,0 +1,353 @@
+import gc
+import multiprocessing as mp
+import traceback
+from dataclasses import replace
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ..model.parametros import Parametros, CAMPOS_GEOMETRIA
+from ..model.estado import Estado, CAMPOS, N_PROGNOSTICOS
+from ..model.dinamica import Dinamica, INTEGRADORES
+
+# Largura do halo (em linhas): a divergência do fluxo de migração aplica
+# duas derivadas centrais seguidas (grad do potencial e div do fluxo), que
+# juntas alcançam duas células; o Laplaciano precisa de uma.
+HALO = 2
+
+# Campos difundidos pelo passo IMEX, contíguos no bloco de dados (K, H, A, P)
+_DIFUNDIDOS = slice(0, 4)
+_DERIVADOS = slice(CAMPOS.index('Y'), len(CAMPOS))
+
+
+def particionar(n, partes):
+    """Limites [a, b) de `partes` faixas contíguas e equilibradas de 0..n."""
+    limites = np.linspace(0, n, partes + 1).round().astype(int).tolist()
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def _anexar(descricao, blocos):
+    """Anexa (no trabalhador) os arrays compartilhados descritos por nome/forma/dtype."""
+    arrays = {}
+    for chave, (nome, forma, dtype) in descricao.items():
+        shm = shared_memory.SharedMemory(name=nome)
+        blocos.append(shm)
+        arrays[chave] = np.ndarray(forma, dtype=dtype, buffer=shm.buf)
+    return arrays
+
+
+class _SpilloverDistribuido:
+    """
+    Convolução de spillover repartida entre os processos.
+
+    Usa a mesma sequência de transformadas de `PlanoSpillover.convoluir`
+    (rfft nas linhas, fft nas colunas, produto, ifft nas colunas, irfft nas
+    linhas) sobre buffers compartilhados: cada processo transforma um bloco
+    de linhas ou de colunas, com uma barreira entre as fases. Cada linha ou
+    coluna é transformada exatamente como na versão de um processo.
+    """
+    def __init__(self, sub, arrays, plano, indice, processos):
+        self.sub = sub
+        self.preenchido = arrays['preenchido']
+        self.espectro = arrays['espectro']
+        self.resultado = arrays['resultado']
+        self.espectro_kernel = arrays['espectro_kernel']
+        self.plano = plano
+        f0, f1 = plano['forma_fft']
+        self.linhas = particionar(f0, processos)[indice]
+        self.colunas = particionar(f1 // 2 + 1, processos)[indice]
+
+    def _preencher(self, A):
+        """Escreve as linhas deste processo da grade preenchida (contorno aplicado)."""
+        r0, r1 = self.linhas
+        n0, n1 = self.plano['forma']
+        b0, b1 = self.plano['antes']
+        e0, e1 = self.plano['forma_preenchida']
+        destino = self.preenchido
+        if self.plano['modo'] == 'periodico':
+            destino[r0:r1] = A[r0:r1]
+            return
+        # Faixas de linhas: borda superior (réplica da linha 0), interior e
+        # borda inferior (réplica da última linha)
+        for d0, d1, origem in ((0, b0, lambda a, b: slice(0, 1)),
+                               (b0, b0 + n0, lambda a, b: slice(a - b0, b - b0)),
+                               (b0 + n0, e0, lambda a, b: slice(n0 - 1, n0))):
+            a, b = max(r0, d0), min(r1, d1)
+            if a >= b:
+                continue
+            o = origem(a, b)
+            destino[a:b, b1:b1 + n1] = A[o]
+            destino[a:b, :b1] = A[o, 0:1]
+            destino[a:b, b1 + n1:e1] = A[o, n1 - 1:n1]
+
+    def aplicar(self, Z, out=None, dtype=None):
+        # Z (A local) é ignorado: a convolução é global e lê A do bloco
+        # compartilhado; a precisão da FFT é a dos buffers compartilhados
+        barreira = self.sub.barreira
+        r0, r1 = self.linhas
+        c0, c1 = self.colunas
+        f1 = self.plano['forma_fft'][1]
+
+        self._preencher(self.sub.global_[CAMPOS.index('A')])
+        np.fft.rfft(self.preenchido[r0:r1], axis=-1, out=self.espectro[r0:r1])
+        barreira.wait()
+        bloco = self.espectro[:, c0:c1]
+        np.fft.fft(bloco, axis=-2, out=bloco)
+        bloco *= self.espectro_kernel[:, c0:c1]
+        np.fft.ifft(bloco, axis=-2, out=bloco)
+        barreira.wait()
+        np.fft.irfft(self.espectro[r0:r1], n=f1, axis=-1, out=self.resultado[r0:r1])
+        barreira.wait()
+
+        # Linhas da faixa local (com halo) do resultado recortado
+        g0, g1 = self.plano['recorte']
+        n1 = self.plano['forma'][1]
+        np.copyto(out, self.resultado[g0 + self.sub.lo:g0 + self.sub.hi, g1:g1 + n1])
+        return out
+
+
+class _DifusaoDistribuida:
+    """Passo implícito de difusão (DCT) repartido entre os processos, como em `DifusaoImplicita`."""
+    def __init__(self, sub, arrays, indice, processos):
+        self.sub = sub
+        self.coef = arrays['coef']
+        n0, n1 = self.coef.shape[-2:]
+        self.linhas = particionar(n0, processos)[indice]
+        self.colunas = particionar(n1, processos)[indice]
+
+    def resolver(self, coeficientes, dt, dx, dy):
+        """Resolve (I - dt D lap) u_novo = u para K, H, A e P no bloco global."""
+        from scipy import fft
+        barreira = self.sub.barreira
+        u = self.sub.global_[_DIFUNDIDOS]
+        r0, r1 = self.linhas
+        c0, c1 = self.colunas
+        lam = self.sub.dinamica.difusao.autovalores(u.shape, dx, dy)[:, c0:c1]
+
+        for f in range(u.shape[0]):
+            self.coef[f, r0:r1] = fft.dct(u[f, r0:r1], type=2, norm='ortho', axis=-1)
+        barreira.wait()
+        for f, D in enumerate(coeficientes):
+            bloco = fft.dct(self.coef[f, :, c0:c1], type=2, norm='ortho', axis=-2)
+            bloco /= (1.0 - dt * D * lam)
+            self.coef[f, :, c0:c1] = fft.idct(bloco, type=2, norm='ortho', axis=-2, overwrite_x=True)
+        barreira.wait()
+        for f in range(u.shape[0]):
+            u[f, r0:r1] = fft.idct(self.coef[f, r0:r1], type=2, norm='ortho', axis=-1)
+
+
+class _Subdominio:
+    """Faixa de linhas [a, b) da grade, avançada por um processo trabalhador."""
+    def __init__(self, indice, arrays, barreira, config):
+        self.barreira = barreira
+        self.global_ = arrays['dados']
+        params = config['params']
+        n0 = params.Nx
+        processos = config['processos']
+        self.a, self.b = particionar(n0, processos)[indice]
+        self.lo, self.hi = max(0, self.a - HALO), min(n0, self.b + HALO)
+        self.interior = slice(self.a - self.lo, self.b - self.lo)
+
+        # Estado local da faixa com halo; o espaçamento é o da grade global
+        self.local = Estado(replace(params, Nx=self.hi - self.lo))
+        self.local.dx, self.local.dy = config['dx'], config['dy']
+        self.dinamica = Dinamica(params)
+        self.dinamica.kernel_spillover = None  # o espectro já está no bloco compartilhado
+        self.dinamica.spillover = _SpilloverDistribuido(self, arrays, config['plano'], indice, processos)
+        self.difusao = (_DifusaoDistribuida(self, arrays, indice, processos)
+                        if 'coef' in arrays else None)
+
+    def avancar(self, params, passos):
+        self.dinamica.p = params
+        for _ in range(passos):
+            self._passo(params.integrador)
+
+    def _escrever(self):
+        """Copia o interior da faixa (prognósticos e derivados) para o bloco global."""
+        g, l, i = self.global_, self.local.dados, self.interior
+        g[:N_PROGNOSTICOS, self.a:self.b] = l[:N_PROGNOSTICOS, i]
+        g[_DERIVADOS, self.a:self.b] = l[_DERIVADOS, i]
+
+    def _passo(self, integrador):
+        dinamica, local = self.dinamica, self.local
+        np.copyto(local.dados, self.global_[:, self.lo:self.hi])
+        # As barreiras internas do spillover garantem que todos os processos já
+        # leram suas faixas antes de qualquer escrita no bloco global
+        if integrador == 'euler':
+            ws = dinamica.tendencias(local)
+            dinamica._atualizar(local, ws)
+            self._escrever()
+        else:
+            ws = dinamica.tendencias(local, difusao=False)
+            dinamica._avancar_explicito(local, ws)
+            self._escrever()
+            self.barreira.wait()
+            p = dinamica._coef
+            self.difusao.resolver((p.D_K, p.D_H, p.D_A, p.D_P), p.dt, local.dx, local.dy)
+            prog = self.global_[:N_PROGNOSTICOS, self.a:self.b]
+            np.maximum(prog, 0, out=prog)
+        self.barreira.wait()
+
+
+def _executar_trabalhador(indice, conexao, barreira, descricao, config):
+    blocos = []
+    arrays = {}
+    try:
+        arrays.update(_anexar(descricao, blocos))
+        sub = _Subdominio(indice, arrays, barreira, config)
+        conexao.send(None)
+        while True:
+            comando = conexao.recv()
+            if comando is None:
+                break
+            params, passos = comando
+            sub.avancar(params, passos)
+            conexao.send(None)
+    except Exception:
+        # Libera os demais processos presos na barreira e reporta o erro
+        barreira.abort()
+        conexao.send(traceback.format_exc())
+    finally:
+        # As vistas (inclusive as presas em ciclos de referência) precisam
+        # ser liberadas antes de fechar os blocos
+        sub = None
+        arrays.clear()
+        gc.collect()
+        for shm in blocos:
+            shm.close()
+
+
+class DecomposicaoDominio:
+    """
+    Execução em vários processos por decomposição de domínio.
+
+    A grade é dividida em faixas de linhas, uma por processo. O estado global
+    fica em memória compartilhada; a cada passo, cada processo copia sua faixa
+    com um halo de `HALO` linhas (a "troca de halo" é a leitura das linhas
+    vizinhas no bloco compartilhado), calcula as tendências localmente e
+    escreve de volta só o interior. O spillover, que é global, e o passo
+    implícito de difusão do integrador IMEX são transformadas distribuídas
+    por blocos de linhas/colunas, sincronizadas por barreiras.
+
+    O resultado é idêntico, bit a bit, ao de `Dinamica.passo` em um processo.
+    Modo ensemble não é suportado. Os parâmetros (exceto a geometria, o
+    integrador e a precisão) podem mudar entre chamadas de `avancar`.
+    """
+    def __init__(self, params: Parametros, processos=None, contexto=None):
+        if params.n_membros() is not None:
+            raise ValueError("A decomposição de domínio não aceita parâmetros em modo ensemble")
+        if params.integrador not in INTEGRADORES:
+            raise ValueError(f"Integrador desconhecido: {params.integrador!r} (use {INTEGRADORES})")
+        self.params = params
+        # Geometria, integrador e precisão definem os buffers compartilhados e não podem mudar
+        self._fixos = {nome: getattr(params, nome)
+                       for nome in CAMPOS_GEOMETRIA + ('integrador', 'precisao')}
+        self.processos = max(1, min(processos or mp.cpu_count() or 1, params.Nx // (2 * HALO)))
+        self._contexto = contexto or mp.get_context()
+        self._blocos = []
+        self._arrays = {}
+        self._trabalhadores = []
+        self._conexoes = []
+
+    def _iniciar(self, estado: Estado):
+        params = self.params
+        dinamica = Dinamica(params)
+        plano = dinamica.spillover.plano(estado.K.shape)
+        f0, f1 = plano.forma_fft
+        # Mesmos tipos da FFT de um processo (sempre float64, ver Dinamica)
+        tipo = estado.dados.dtype
+        real, complexo = np.float64, np.complex128
+        formas = {
+            'dados': (estado.dados.shape, tipo),
+            'preenchido': ((f0, f1), real),
+            'espectro': ((f0, f1 // 2 + 1), complexo),
+            'resultado': ((f0, f1), real),
+            'espectro_kernel': (plano.espectro.shape, complexo),
+        }
+        if params.integrador == 'imex':
+            formas['coef'] = ((4,) + estado.K.shape, tipo)
+        descricao = {}
+        for chave, (forma, dtype) in formas.items():
+            tamanho = max(1, int(np.prod(forma)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=tamanho)
+            self._blocos.append(shm)
+            self._arrays[chave] = np.ndarray(forma, dtype=dtype, buffer=shm.buf)
+            descricao[chave] = (shm.name, forma, np.dtype(dtype).str)
+        self._arrays['preenchido'].fill(0.0)
+        self._arrays['espectro_kernel'][...] = plano.espectro_kernel(complexo)
+
+        config = {
+            'params': params, 'processos': self.processos, 'dx': estado.dx, 'dy': estado.dy,
+            'plano': {'forma': plano.forma, 'modo': plano.modo, 'antes': plano.antes,
+                      'forma_preenchida': plano.forma_preenchida, 'forma_fft': plano.forma_fft,
+                      'recorte': plano.recorte},
+        }
+        barreira = self._contexto.Barrier(self.processos)
+        for indice in range(self.processos):
+            local, remoto = self._contexto.Pipe()
+            processo = self._contexto.Process(target=_executar_trabalhador, daemon=True,
+                                              args=(indice, remoto, barreira, descricao, config))
+            processo.start()
+            remoto.close()
+            self._trabalhadores.append(processo)
+            self._conexoes.append(local)
+        self._aguardar()
+
+    def _aguardar(self):
+        erros = []
+        for conexao in self._conexoes:
+            try:
+                resposta = conexao.recv()
+            except EOFError:
+                resposta = "Processo trabalhador terminou inesperadamente"
+            if resposta is not None:
+                erros.append(resposta)
+        if erros:
+            self.fechar()
+            raise RuntimeError("Falha na decomposição de domínio:\n" + erros[0])
+
+    def avancar(self, estado: Estado, passos=1):
+        """Avança `estado` por `passos` passos usando os processos trabalhadores."""
+        params = estado.params
+        for nome, valor in self._fixos.items():
+            if getattr(params, nome) != valor:
+                raise ValueError(f"'{nome}' não pode mudar depois de criada a decomposição")
+        if not self._trabalhadores:
+            self._iniciar(estado)
+        dados = self._arrays['dados']
+        np.copyto(dados, estado.dados)
+        for conexao in self._conexoes:
+            conexao.send((params, passos))
+        self._aguardar()
+        np.copyto(estado.dados, dados)
+        for _ in range(passos):
+            estado.avancar_tempo(params.dt)
+
+    def passo(self, estado: Estado):
+        self.avancar(estado, 1)
+
+    def fechar(self):
+        """Encerra os processos e libera a memória compartilhada."""
+        for conexao in self._conexoes:
+            try:
+                conexao.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for processo in self._trabalhadores:
+            processo.join(timeout=5)
+            if processo.is_alive():
+                processo.terminate()
+        for conexao in self._conexoes:
+            conexao.close()
+        self._trabalhadores, self._conexoes = [], []
+        self._arrays.clear()
+        for shm in self._blocos:
+            shm.close()
+            shm.unlink()
+        self._blocos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
@@ -0,0 +1,216 @@
+import json
+import os
+import queue
+import threading
+
+import numpy as np
+
+from ..model.estado import Estado, CAMPOS
+from .trabalhador import Quadro, CAMPOS_QUADRO
+
+_INDICES_GRAVADOS = [CAMPOS.index(c) for c in CAMPOS_QUADRO]
+DTYPES = ('float16', 'float32', 'float64')
+
+
+def _nome_bloco(numero):
+    return f'bloco_{numero:05d}.npy'
+
+
+class GravadorTrajetoria:
+    """
+    Grava a trajetória dos campos de `CAMPOS_QUADRO` em disco, em blocos.
+
+    Cada bloco é um arquivo .npy (passos_por_bloco, campos, Nx, Ny) que pode
+    ser aberto por memmap; `dtype` reduz o tamanho em disco (float16/float32).
+    Um valor finito fora da faixa do `dtype` (acima de 65504 em float16, o que
+    K e Y alcançam em execuções longas) gera ValueError em vez de virar inf.
+    O gravador é um observador, `gravador(estado, passo)`, e pode ser ligado a
+    `TrabalhadorSimulacao.observadores` ou chamado em qualquer laço. A cada
+    `intervalo` passos os campos são copiados para um buffer de um conjunto
+    pré-alocado, e a escrita fica com uma thread própria. Se todos os buffers
+    estiverem na fila, o laço espera (nada é descartado); `esperas` conta
+    essas ocorrências.
+
+    Os metadados e o índice (passo e tempo de cada quadro) são atualizados a
+    cada bloco completo e em `fechar`, de modo que uma gravação interrompida
+    continua legível até o último bloco completo.
+    """
+    def __init__(self, diretorio, intervalo=1, dtype='float32', passos_por_bloco=64, buffers=8):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype deve ser um de {DTYPES}")
+        if intervalo < 1 or passos_por_bloco < 1 or buffers < 1:
+            raise ValueError("intervalo, passos_por_bloco e buffers devem ser positivos")
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self.dtype = np.dtype(dtype)
+        self.passos_por_bloco = passos_por_bloco
+        self.n_buffers = buffers
+        self.forma = None
+        self.quadros = 0
+        self.esperas = 0
+
+        self._livres = queue.Queue()
+        self._fila = queue.Queue()
+        self._indice = []  # (passo, t) de cada quadro gravado
+        self._bloco = None
+        self._erro = None
+        self._escritor = None
+        self._limite = None
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _iniciar(self, estado: Estado):
+        self.forma = (len(CAMPOS_QUADRO),) + estado.dados.shape[1:]
+        # Conversão para um tipo de menor alcance: verificar a faixa a cada quadro
+        if np.finfo(self.dtype).max < np.finfo(estado.dados.dtype).max:
+            self._limite = float(np.finfo(self.dtype).max)
+        for _ in range(self.n_buffers):
+            self._livres.put(np.empty(self.forma, dtype=self.dtype))
+        self._escritor = threading.Thread(target=self._escrever, daemon=True)
+        self._escritor.start()
+
+    def __call__(self, estado: Estado, passo):
+        if passo % self.intervalo:
+            return
+        if self._escritor is None:
+            self._iniciar(estado)
+        if self._erro is not None:
+            raise RuntimeError("Falha na thread de gravação") from self._erro
+        if self._limite is not None:
+            for nome, indice in zip(CAMPOS_QUADRO, _INDICES_GRAVADOS):
+                maximo = float(np.max(np.abs(estado.dados[indice])))
+                if self._limite < maximo < np.inf:
+                    raise ValueError(f"{nome} = {maximo:g} no passo {passo} não cabe em "
+                                     f"{self.dtype.name} (máximo {self._limite:g}); use dtype='float32'")
+        try:
+            buffer = self._livres.get_nowait()
+        except queue.Empty:
+            self.esperas += 1
+            buffer = self._livres.get()
+        for j, indice in enumerate(_INDICES_GRAVADOS):
+            np.copyto(buffer[j], estado.dados[indice], casting='unsafe')
+        self._fila.put((buffer, passo, float(np.max(estado.t))))
+
+    def _escrever(self):
+        while True:
+            item = self._fila.get()
+            if item is None:
+                break
+            buffer, passo, t = item
+            try:
+                if self._erro is None:
+                    self._gravar(buffer, passo, t)
+            except Exception as erro:  # reportado ao laço na próxima chamada
+                self._erro = erro
+            finally:
+                self._livres.put(buffer)
+        if self._erro is None and self._bloco is not None:
+            self._bloco.flush()
+            self._bloco = None
+            self._salvar_indice()
+
+    def _gravar(self, buffer, passo, t):
+        posicao = self.quadros % self.passos_por_bloco
+        if posicao == 0:
+            caminho = os.path.join(self.diretorio, _nome_bloco(self.quadros // self.passos_por_bloco))
+            self._bloco = np.lib.format.open_memmap(
+                caminho, mode='w+', dtype=self.dtype, shape=(self.passos_por_bloco,) + self.forma)
+        self._bloco[posicao] = buffer
+        self._indice.append((passo, t))
+        self.quadros += 1
+        if posicao == self.passos_por_bloco - 1:
+            self._bloco.flush()
+            self._bloco = None
+            self._salvar_indice()
+
+    def _salvar_indice(self):
+        # Escritas atômicas: uma interrupção no meio mantém a versão anterior legível
+        caminho = os.path.join(self.diretorio, 'indice.npy')
+        with open(caminho + '.tmp', 'wb') as f:
+            np.save(f, np.array(self._indice, dtype=np.float64))
+        os.replace(caminho + '.tmp', caminho)
+        metadados = {'campos': list(CAMPOS_QUADRO), 'forma': list(self.forma),
+                     'dtype': self.dtype.name, 'intervalo': self.intervalo,
+                     'passos_por_bloco': self.passos_por_bloco, 'quadros': self.quadros}
+        caminho = os.path.join(self.diretorio, 'metadados.json')
+        with open(caminho + '.tmp', 'w') as f:
+            json.dump(metadados, f, indent=2)
+        os.replace(caminho + '.tmp', caminho)
+
+    def fechar(self):
+        """Espera a fila esvaziar e finaliza os arquivos."""
+        if self._escritor is not None:
+            self._fila.put(None)
+            self._escritor.join()
+            self._escritor = None
+        if self._erro is not None:
+            raise RuntimeError("Falha na thread de gravação") from self._erro
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+class LeitorTrajetoria:
+    """
+    Lê uma trajetória gravada por `GravadorTrajetoria` sem carregá-la inteira.
+
+    Os blocos são abertos por memmap sob demanda. `quadro(i)` devolve um
+    `Quadro` (aceito por `Visualizacao.atualizar`); `buscar(passo)` localiza o
+    último quadro gravado até aquele passo; `serie(nome, inicio, fim)` monta a
+    série temporal de um campo para análise.
+    """
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        with open(os.path.join(diretorio, 'metadados.json')) as f:
+            self.metadados = json.load(f)
+        self.campos = tuple(self.metadados['campos'])
+        self.passos_por_bloco = self.metadados['passos_por_bloco']
+        indice = np.load(os.path.join(diretorio, 'indice.npy')).reshape(-1, 2)
+        indice = indice[:self.metadados['quadros']]
+        self.passos = indice[:, 0].astype(np.int64)
+        self.tempos = indice[:, 1]
+        self._blocos = {}
+
+    def __len__(self):
+        return len(self.passos)
+
+    def _bloco(self, numero):
+        bloco = self._blocos.get(numero)
+        if bloco is None:
+            bloco = np.load(os.path.join(self.diretorio, _nome_bloco(numero)), mmap_mode='r')
+            self._blocos[numero] = bloco
+        return bloco
+
+    def dados(self, i):
+        """Array (campos, ...) do quadro `i`, como vista do memmap."""
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"Quadro {i} fora da gravação ({len(self)} quadros)")
+        i %= len(self)
+        return self._bloco(i // self.passos_por_bloco)[i % self.passos_por_bloco]
+
+    def quadro(self, i):
+        i %= max(1, len(self))
+        return Quadro(dados=self.dados(i), passo=int(self.passos[i]), t=float(self.tempos[i]))
+
+    def buscar(self, passo):
+        """Quadro mais recente gravado no passo `passo` ou antes dele."""
+        i = int(np.searchsorted(self.passos, passo, side='right')) - 1
+        if i < 0:
+            raise IndexError(f"Nenhum quadro gravado até o passo {passo}")
+        return self.quadro(i)
+
+    def serie(self, nome, inicio=0, fim=None):
+        """Série (quadros, ...) do campo `nome` entre os quadros `inicio` e `fim`."""
+        j = self.campos.index(nome)
+        inicio, fim, _ = slice(inicio, fim).indices(len(self))
+        partes = []
+        for numero in range(inicio // self.passos_por_bloco, (fim - 1) // self.passos_por_bloco + 1):
+            base = numero * self.passos_por_bloco
+            a, b = max(inicio, base) - base, min(fim, base + self.passos_por_bloco) - base
+            if a < b:
+                partes.append(self._bloco(numero)[a:b, j])
+        if not partes:
+            return np.empty((0,) + tuple(self.metadados['forma'][1:]), dtype=self.metadados['dtype'])
+        return np.concatenate(partes)
@@ -0,0 +1,111 @@
+import math
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from ..model.parametros import Parametros
+from ..model.estado import Estado
+from ..model.dinamica import Dinamica
+from ..model.transferencia import restringir, prolongar
+
+
+def _por_nivel(valor, niveis, nome):
+    """Expande um valor escalar (ou None) para uma lista com um valor por nível."""
+    if valor is None or np.ndim(valor) == 0:
+        return [valor] * niveis
+    valor = list(valor)
+    if len(valor) != niveis:
+        raise ValueError(f"'{nome}' tem {len(valor)} valores, esperado {niveis} (um por nível)")
+    return valor
+
+
+class Multiresolucao:
+    """
+    Partida a quente de grades finas a partir de grades grossas.
+
+    O estado inicial é restringido à grade mais grossa (a resolução alvo
+    dividida por `razao` a cada nível), onde os transientes de grande escala
+    são resolvidos a baixo custo; o resultado é prolongado para o nível
+    seguinte, e assim até a grade de `params`. A transferência entre níveis é
+    conservativa (`model.transferencia`).
+
+    Orçamento por nível (do mais grosso ao mais fino; um escalar vale para
+    todos): `tempos` em tempo simulado e `segundos` em tempo de parede. Um
+    nível termina ao esgotar qualquer um deles ou, com `tol`, quando a norma
+    RMS das tendências (verificada a cada `intervalo` passos) cai abaixo de
+    `tol`. `dts` permite um passo de tempo por nível (padrão: `params.dt`).
+    """
+    def __init__(self, params: Parametros, niveis=3, razao=2, tempos=None, segundos=None,
+                 tol=None, intervalo=50, dts=None, resolucao_min=4):
+        if tempos is None and segundos is None and tol is None:
+            raise ValueError("Defina ao menos um orçamento por nível: tempos, segundos ou tol")
+        self.params = params
+        self.niveis = niveis
+        self.razao = razao
+        self.tempos = _por_nivel(tempos, niveis, 'tempos')
+        self.segundos = _por_nivel(segundos, niveis, 'segundos')
+        self.dts = _por_nivel(dts, niveis, 'dts')
+        self.tol = tol
+        self.intervalo = intervalo
+        self.resolucao_min = resolucao_min
+
+    def formas(self):
+        """Formas de grade (Nx, Ny) de cada nível, da mais grossa à mais fina."""
+        formas = []
+        for k in range(self.niveis - 1, -1, -1):
+            fator = self.razao ** k
+            formas.append(tuple(max(min(self.resolucao_min, n), math.ceil(n / fator))
+                                for n in (self.params.Nx, self.params.Ny)))
+        return formas
+
+    def _residuo(self, dinamica, estado):
+        derivadas = dinamica.tendencias(estado).derivadas
+        return float(np.sqrt(np.vdot(derivadas, derivadas) / derivadas.size))
+
+    def _avancar(self, nivel, dinamica, estado):
+        """Avança um nível até esgotar o orçamento; retorna o relatório do nível."""
+        tempo, segundos = self.tempos[nivel], self.segundos[nivel]
+        t0, inicio = float(np.max(estado.t)), time.perf_counter()
+        passos, residuo = 0, None
+        while True:
+            if tempo is not None and float(np.max(estado.t)) - t0 >= tempo - 1e-12:
+                break
+            if segundos is not None and time.perf_counter() - inicio >= segundos:
+                break
+            if self.tol is not None and passos % self.intervalo == 0:
+                residuo = self._residuo(dinamica, estado)
+                if residuo <= self.tol:
+                    break
+            dinamica.passo(estado)
+            passos += 1
+        if self.tol is not None and passos % self.intervalo:
+            residuo = self._residuo(dinamica, estado)
+        Nx, Ny = estado.K.shape[-2:]
+        return {'Nx': Nx, 'Ny': Ny, 'passos': passos, 't': float(np.max(estado.t)) - t0,
+                'segundos': time.perf_counter() - inicio, 'residuo': residuo}
+
+    def executar(self, estado: Estado):
+        """
+        Parte de `estado` (na grade alvo, alterado in-place) e retorna a lista
+        de relatórios por nível, do mais grosso ao mais fino.
+        """
+        formas = self.formas()
+        relatorio = []
+        dados = restringir(estado.dados, formas[0]) if formas[0] != estado.K.shape[-2:] else estado.dados
+        t = estado.t
+        for nivel, (Nx, Ny) in enumerate(formas):
+            params = replace(self.params, Nx=Nx, Ny=Ny)
+            if self.dts[nivel] is not None:
+                params = replace(params, dt=self.dts[nivel])
+            atual = Estado(params)
+            atual.dados[...] = dados if dados.shape[-2:] == (Nx, Ny) else prolongar(dados, (Nx, Ny))
+            # A interpolação pode criar valores negativos junto a gradientes fortes
+            np.maximum(atual.prognosticos, 0, out=atual.prognosticos)
+            atual.t = t
+            relatorio.append(self._avancar(nivel, Dinamica(params), atual))
+            dados, t = atual.dados, atual.t
+        estado.dados[...] = dados
+        estado.zerar_compensacao()
+        estado.t = t
+        return relatorio
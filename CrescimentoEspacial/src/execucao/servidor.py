@@ -0,0 +1,446 @@
+"""
+Servidor local que transmite a simulação para vários visualizadores.
+
+O servidor é dono de um par `Estado`/`Dinamica`, avançado por um
+`TrabalhadorSimulacao` em sua própria thread, de modo que os clientes nunca
+atrasam os passos. Um laço asyncio lê o `BufferQuadros` a até `fps`
+quadros por segundo. Cada quadro é codificado uma única vez e enviado a
+todos os clientes conectados por TCP.
+
+Protocolo: mensagens com prefixo de 4 bytes (tamanho, big-endian) seguido
+de um byte de tipo.
+- 'Q' (servidor -> cliente): quadro dos campos de `CAMPOS_QUADRO`.
+- 'J' (nos dois sentidos): JSON. Do cliente: {"parametro": nome, "valor": v}
+  ou {"comando": "pausar" | "retomar"}. Do servidor: {"erro": mensagem},
+  para um comando inválido ou, a todos os clientes, se a simulação parar
+  por um erro.
+
+Codificação dos quadros: cada campo é quantizado em `bits` bits (8 ou 16)
+e os códigos são comprimidos com zlib. Um quadro-chave carrega os campos;
+os demais carregam a diferença entre seus códigos e os do último
+quadro-chave (ver `CodificadorQuadros`). Como todas as diferenças se
+referem ao quadro-chave (e não ao quadro anterior), um cliente lento pode
+perder quadros intermediários sem perder a capacidade de decodificar os
+seguintes.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import struct
+import zlib
+from dataclasses import fields
+
+import numpy as np
+
+from ..model.parametros import Parametros, CAMPOS_GEOMETRIA
+from ..model.estado import Estado
+from ..model.dinamica import Dinamica, INTEGRADORES
+from .trabalhador import TrabalhadorSimulacao, Quadro, CAMPOS_QUADRO
+
+TAMANHO = struct.Struct('!I')
+# numero, chave de referência, passo, t, bits, dimensões
+CABECALHO = struct.Struct('!IIQdBB')
+# Por campo: códigos em diferença?, mínimo, escala e bytes comprimidos
+FAIXA = struct.Struct('!?ddI')
+
+QUADRO, JSON = b'Q', b'J'
+
+
+class CodificadorQuadros:
+    """
+    Codifica quadros em mensagens 'Q'.
+
+    Em um quadro-chave (a cada `intervalo_chave` quadros), cada campo é
+    quantizado entre seu mínimo e máximo, alargados por `margem` (fração da
+    amplitude) de cada lado. Nos demais, um campo que continua dentro dessa
+    faixa é quantizado com a mesma escala, e vai a menor das duas formas
+    comprimidas: os códigos ou a diferença (módulo 2**bits) para os códigos
+    do quadro-chave, que é zero onde o campo mudou menos que um degrau.
+    Um campo que saiu da faixa, ou cuja amplitude caiu abaixo da metade da
+    do quadro-chave (o erro relativo dobraria), ganha faixa própria.
+    """
+    def __init__(self, bits=8, intervalo_chave=30, margem=0.25, nivel=1):
+        if bits not in (8, 16):
+            raise ValueError("bits deve ser 8 ou 16")
+        self.bits = bits
+        self.intervalo_chave = intervalo_chave
+        self.margem = margem
+        self.nivel = nivel
+        self.dtype = np.dtype('>u1' if bits == 8 else '>u2')
+        self.numero = 0
+        self.chave = None  # número do último quadro-chave
+        self._faixas_chave = None
+        self._codigos_chave = self._codigos = self._escalados = None
+
+    def _escalar(self, Z, minimo, escala, destino):
+        np.subtract(Z, minimo, out=destino)
+        destino /= escala
+        np.rint(destino, out=destino)
+        return destino
+
+    def _campo(self, i, Z, chave):
+        """Retorna (em diferença?, mínimo, escala, bytes comprimidos) de um campo."""
+        maximo_codigo = 2 ** self.bits - 1
+        codigos, escalados = self._codigos[i], self._escalados
+        if not chave:
+            minimo, escala = self._faixas_chave[i]
+            self._escalar(Z, minimo, escala, escalados)
+            menor, maior = escalados.min(), escalados.max()
+            if menor >= 0 and maior <= maximo_codigo and \
+                    maior - menor >= 0.5 * maximo_codigo / (1 + 2 * self.margem):
+                np.copyto(codigos, escalados, casting='unsafe')
+                completo = zlib.compress(codigos.tobytes(), self.nivel)
+                # Diferença dos códigos, módulo 2**bits
+                np.subtract(escalados, self._codigos_chave[i], out=escalados)
+                np.copyto(codigos, np.mod(escalados, maximo_codigo + 1, out=escalados), casting='unsafe')
+                diferenca = zlib.compress(codigos.tobytes(), self.nivel)
+                if len(diferenca) < len(completo):
+                    return True, minimo, escala, diferenca
+                return False, minimo, escala, completo
+        minimo, maximo = float(Z.min()), float(Z.max())
+        folga = self.margem * (maximo - minimo) if chave else 0.0
+        minimo -= folga
+        escala = (maximo + folga - minimo) / maximo_codigo or 1.0
+        np.copyto(codigos, self._escalar(Z, minimo, escala, escalados), casting='unsafe')
+        if chave:
+            self._faixas_chave.append((minimo, escala))
+            np.copyto(self._codigos_chave[i], codigos)
+        return False, minimo, escala, zlib.compress(codigos.tobytes(), self.nivel)
+
+    def codificar(self, quadro: Quadro, chave=False):
+        """Retorna (mensagem, é quadro-chave)."""
+        dados = quadro.dados
+        if self._codigos is None or self._codigos.shape != dados.shape:
+            self._codigos = np.empty(dados.shape, dtype=self.dtype)
+            self._codigos_chave = np.empty(dados.shape, dtype=np.int64)
+            self._escalados = np.empty(dados.shape[1:])
+            chave = True
+        self.numero += 1
+        chave = chave or self.chave is None or self.numero - self.chave >= self.intervalo_chave
+        if chave:
+            self.chave = self.numero
+            self._faixas_chave = []
+        campos = [self._campo(i, dados[i], chave) for i in range(dados.shape[0])]
+        cabecalho = CABECALHO.pack(self.numero, self.chave, quadro.passo, float(np.max(quadro.t)),
+                                   self.bits, dados.ndim)
+        forma = struct.pack(f'!{dados.ndim}I', *dados.shape)
+        faixas = b''.join(FAIXA.pack(d, m, e, len(c)) for d, m, e, c in campos)
+        return b''.join([QUADRO, cabecalho, forma, faixas] + [c for *_, c in campos]), chave
+
+
+class DecodificadorQuadros:
+    """Reconstrói os quadros de um fluxo de mensagens 'Q' (do lado do cliente)."""
+    def __init__(self):
+        self.chave = None
+        self._codigos_chave = None
+        self.descartados = 0  # diferenças recebidas sem o quadro-chave correspondente
+
+    def decodificar(self, mensagem):
+        """Retorna um `Quadro` (float64), ou None se falta o quadro-chave de referência."""
+        if mensagem[:1] != QUADRO:
+            raise ValueError("Mensagem não é um quadro")
+        posicao = 1
+        numero, chave, passo, t, bits, ndim = CABECALHO.unpack_from(mensagem, posicao)
+        posicao += CABECALHO.size
+        forma = struct.unpack_from(f'!{ndim}I', mensagem, posicao)
+        posicao += 4 * ndim
+        faixas = [FAIXA.unpack_from(mensagem, posicao + i * FAIXA.size) for i in range(forma[0])]
+        posicao += FAIXA.size * forma[0]
+        if numero != chave and self.chave != chave:
+            self.descartados += 1
+            return None
+        dtype = '>u1' if bits == 8 else '>u2'
+        codigos = np.empty(forma, dtype=np.int64)
+        dados = np.empty(forma)
+        for i, (diferenca, minimo, escala, tamanho) in enumerate(faixas):
+            bruto = zlib.decompress(mensagem[posicao:posicao + tamanho])
+            posicao += tamanho
+            codigos[i] = np.frombuffer(bruto, dtype=dtype).reshape(forma[1:])
+            if diferenca:
+                codigos[i] += self._codigos_chave[i]
+                codigos[i] %= 2 ** bits
+            np.multiply(codigos[i], escala, out=dados[i])
+            dados[i] += minimo
+        if numero == chave:
+            self.chave, self._codigos_chave = chave, codigos
+        quadro = Quadro(dados=dados, passo=passo, t=t)
+        quadro.numero = numero
+        return quadro
+
+
+def mensagem_json(objeto):
+    return JSON + json.dumps(objeto).encode()
+
+
+async def ler_mensagem(reader: asyncio.StreamReader):
+    """Lê uma mensagem com prefixo de tamanho (IncompleteReadError ao fechar)."""
+    tamanho, = TAMANHO.unpack(await reader.readexactly(TAMANHO.size))
+    return await reader.readexactly(tamanho)
+
+
+def _enviar(writer: asyncio.StreamWriter, mensagem):
+    writer.write(TAMANHO.pack(len(mensagem)) + mensagem)
+
+
+class FilaCliente:
+    """
+    Fila limitada de mensagens de um cliente.
+
+    Cheia, descarta a diferença mais antiga. Um quadro-chave novo torna
+    obsoletos todos os quadros anteriores, que são descartados. Assim, as
+    diferenças na fila sempre têm seu quadro-chave antes delas (ou já
+    entregue).
+    """
+    def __init__(self, tamanho=4):
+        self.tamanho = tamanho
+        self.descartados = 0
+        self._itens = collections.deque()
+        self._evento = asyncio.Event()
+
+    def colocar(self, mensagem, chave=False, quadro=True):
+        if chave:
+            self.descartados += sum(1 for _, _, q in self._itens if q)
+            self._itens = collections.deque(i for i in self._itens if not i[2])
+        elif quadro and len(self._itens) >= self.tamanho:
+            for i, (_, e_chave, e_quadro) in enumerate(self._itens):
+                if e_quadro and not e_chave:
+                    del self._itens[i]
+                    self.descartados += 1
+                    break
+            else:
+                self.descartados += 1
+                return  # só quadros-chave na fila: descartar a diferença nova
+        self._itens.append((mensagem, chave, quadro))
+        self._evento.set()
+
+    async def retirar(self):
+        while not self._itens:
+            self._evento.clear()
+            await self._evento.wait()
+        return self._itens.popleft()[0]
+
+    def __len__(self):
+        return len(self._itens)
+
+
+# Fixos durante a execução: a geometria e a precisão definem os buffers do Estado
+_FIXOS = CAMPOS_GEOMETRIA + ('precisao',)
+# Parâmetros estritamente positivos (passo de tempo e capacidades que dividem);
+# os demais (taxas, difusões, expoentes, mobilidades) só não podem ser negativos
+_POSITIVOS = ('dt', 'A_max', 'L_max')
+
+
+def _converter_parametro(nome, valor):
+    """
+    Valor de um parâmetro recebido de um cliente, no tipo do campo. Recusa
+    (ValueError/TypeError) geometria e precisão, sequências (que ligariam o
+    modo ensemble), valores fora das opções de `integrador` e números fora
+    da faixa (negativos, ou <= 0 em `_POSITIVOS`).
+    """
+    tipos = {f.name: f.type for f in fields(Parametros)}
+    if nome in _FIXOS:
+        raise ValueError(f"Parâmetro {nome!r} não pode ser alterado durante a execução")
+    if nome not in tipos:
+        raise ValueError(f"Parâmetro inválido: {nome!r}")
+    if tipos[nome] is str:
+        opcoes = {'integrador': INTEGRADORES}[nome]
+        if valor not in opcoes:
+            raise ValueError(f"Valor inválido para {nome}: {valor!r} (use {opcoes})")
+        return valor
+    if isinstance(valor, (list, tuple, dict, bool)) or valor is None:
+        raise TypeError(f"Valor inválido para {nome}: {valor!r} (esperado um número)")
+    try:
+        valor = float(valor)
+    except ValueError:
+        raise ValueError(f"Valor inválido para {nome}: {valor!r} (esperado um número)") from None
+    if not np.isfinite(valor):
+        raise ValueError(f"Valor inválido para {nome}: {valor!r} (não finito)")
+    if valor < 0 or (valor == 0 and nome in _POSITIVOS):
+        faixa = "> 0" if nome in _POSITIVOS else ">= 0"
+        raise ValueError(f"Valor inválido para {nome}: {valor!r} (deve ser {faixa})")
+    return valor
+
+
+class ServidorSimulacao:
+    """
+    Servidor asyncio que avança uma simulação e a transmite a vários clientes.
+
+    Cada cliente tem uma `FilaCliente` com até `fila` quadros e uma tarefa
+    de envio própria. `drain()` aplica contrapressão por cliente; enquanto
+    um cliente está lento, sua fila enche e os quadros excedentes são
+    descartados, sem afetar os demais nem o laço de passos. Um cliente que
+    se conecta recebe primeiro o último quadro-chave.
+    """
+    def __init__(self, params: Parametros, host='127.0.0.1', porta=0, fps=30, bits=8,
+                 intervalo_chave=30, fila=4, ruido=0.1):
+        self.params = params
+        self.host = host
+        self.porta = porta
+        self.fps = fps
+        self.fila = fila
+        self.estado = Estado(params)
+        self.estado.inicializar_com_ruido(ruido)
+        self.dinamica = Dinamica(params)
+        self.trabalhador = TrabalhadorSimulacao(self.dinamica, self.estado,
+                                                intervalo_publicacao=1 / fps)
+        self.codificador = CodificadorQuadros(bits, intervalo_chave)
+        self.clientes = {}
+        self.quadros_enviados = 0
+        self._ultima_chave = None
+        self._erro = None
+        self._servidor = None
+        self._transmissao = None
+        self._conexoes = set()
+
+    async def iniciar(self, rodando=True):
+        """Abre o socket e começa os passos e a transmissão; retorna a porta."""
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.porta)
+        self.porta = self._servidor.sockets[0].getsockname()[1]
+        self.trabalhador.start()
+        if rodando:
+            self.trabalhador.retomar()
+        self._transmissao = asyncio.create_task(self._transmitir())
+        return self.porta
+
+    async def encerrar(self):
+        self._transmissao.cancel()
+        self._servidor.close()
+        for writer in list(self.clientes):
+            writer.transport.abort()  # sem esperar o envio do que está no buffer
+        # Esperar as conexões terminarem (elas veem o fim da leitura)
+        await asyncio.gather(*self._conexoes, return_exceptions=True)
+        await self._servidor.wait_closed()
+        await asyncio.to_thread(self.trabalhador.encerrar, 1.0)
+
+    async def servir(self):
+        """Roda até ser cancelado."""
+        await self.iniciar()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.encerrar()
+
+    async def _transmitir(self):
+        periodo = 1 / self.fps
+        while True:
+            if not self.trabalhador.is_alive():
+                # A thread de passos morreu (ex: erro na dinâmica): avisar e parar
+                self._erro = mensagem_json({'erro': f"Simulação interrompida: {self.trabalhador.erro!r}"})
+                for fila in self.clientes.values():
+                    fila.colocar(self._erro, quadro=False)
+                return
+            quadro = self.trabalhador.buffer.ler()
+            if quadro is not None:
+                # Codificado fora do laço de eventos; o quadro lido não muda até a próxima leitura
+                mensagem, chave = await asyncio.to_thread(self.codificador.codificar, quadro)
+                if chave:
+                    self._ultima_chave = mensagem
+                for fila in self.clientes.values():
+                    fila.colocar(mensagem, chave)
+                self.quadros_enviados += 1
+            await asyncio.sleep(periodo)
+
+    def _aplicar(self, comando, fila: FilaCliente):
+        if 'parametro' in comando:
+            nome = comando['parametro']
+            try:
+                valor = _converter_parametro(nome, comando.get('valor'))
+            except (TypeError, ValueError) as erro:
+                fila.colocar(mensagem_json({'erro': str(erro)}), quadro=False)
+                return
+            self.trabalhador.atualizar_parametro(nome, valor)
+        elif comando.get('comando') == 'pausar':
+            self.trabalhador.pausar()
+        elif comando.get('comando') == 'retomar':
+            self.trabalhador.retomar()
+        else:
+            fila.colocar(mensagem_json({'erro': f"Comando desconhecido: {comando!r}"}), quadro=False)
+
+    async def _enviar_fila(self, writer, fila: FilaCliente):
+        while True:
+            _enviar(writer, await fila.retirar())
+            await writer.drain()
+
+    async def _atender(self, reader, writer):
+        tarefa = asyncio.current_task()
+        self._conexoes.add(tarefa)
+        fila = FilaCliente(self.fila)
+        if self._ultima_chave is not None:
+            fila.colocar(self._ultima_chave, chave=True)
+        if self._erro is not None:
+            fila.colocar(self._erro, quadro=False)
+        self.clientes[writer] = fila
+        envio = asyncio.create_task(self._enviar_fila(writer, fila))
+        try:
+            while True:
+                mensagem = await ler_mensagem(reader)
+                if mensagem[:1] == JSON:
+                    self._aplicar(json.loads(mensagem[1:]), fila)
+        except (asyncio.IncompleteReadError, ConnectionError, json.JSONDecodeError):
+            pass
+        finally:
+            envio.cancel()
+            del self.clientes[writer]
+            self._conexoes.discard(tarefa)
+            writer.close()
+
+
+class ClienteSimulacao:
+    """Cliente asyncio: recebe e decodifica quadros e envia parâmetros e comandos."""
+    def __init__(self):
+        self.decodificador = DecodificadorQuadros()
+        self.erros = []
+        self._reader = self._writer = None
+
+    async def conectar(self, host='127.0.0.1', porta=8765):
+        self._reader, self._writer = await asyncio.open_connection(host, porta)
+
+    async def receber(self):
+        """Próximo quadro decodificável (mensagens JSON vão para `erros`)."""
+        while True:
+            mensagem = await ler_mensagem(self._reader)
+            if mensagem[:1] == JSON:
+                self.erros.append(json.loads(mensagem[1:]))
+                continue
+            quadro = self.decodificador.decodificar(mensagem)
+            if quadro is not None:
+                return quadro
+
+    async def _comando(self, objeto):
+        _enviar(self._writer, mensagem_json(objeto))
+        await self._writer.drain()
+
+    async def definir_parametro(self, nome, valor):
+        await self._comando({'parametro': nome, 'valor': valor})
+
+    async def pausar(self):
+        await self._comando({'comando': 'pausar'})
+
+    async def retomar(self):
+        await self._comando({'comando': 'retomar'})
+
+    async def fechar(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de simulação com transmissão de quadros")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--Nx', type=int, default=100)
+    parser.add_argument('--Ny', type=int, default=100)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--bits', type=int, choices=(8, 16), default=8)
+    args = parser.parse_args(argv)
+    servidor = ServidorSimulacao(Parametros(Nx=args.Nx, Ny=args.Ny), args.host, args.porta,
+                                 fps=args.fps, bits=args.bits)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from ..model.estado import Estado, CAMPOS
+from ..model.dinamica import Dinamica
+
+# Campos publicados em cada quadro (os seis painéis da visualização)
+CAMPOS_QUADRO = ('K', 'H', 'A', 'P', 'L', 'Y')
+_INDICES_QUADRO = [CAMPOS.index(c) for c in CAMPOS_QUADRO]
+
+
+class Quadro:
+    """Cópia dos campos exibíveis em um instante da simulação."""
+    def __init__(self, forma=None, dados=None, passo=0, t=0.0, dtype=np.float64):
+        # `dados` (len(CAMPOS_QUADRO), ...) permite envolver um array existente
+        self.dados = (dados if dados is not None
+                      else np.zeros((len(CAMPOS_QUADRO),) + tuple(forma), dtype=dtype))
+        self.passo = passo
+        self.t = t
+        self.numero = 0  # contador de publicação
+
+    def campo(self, nome):
+        return self.dados[CAMPOS_QUADRO.index(nome)]
+
+    def __getattr__(self, nome):
+        # Permite usar quadro.K, quadro.Y, ... como em Estado
+        if nome in CAMPOS_QUADRO:
+            return self.campo(nome)
+        raise AttributeError(nome)
+
+
+class BufferQuadros:
+    """
+    Buffer triplo para passar quadros do trabalhador para a interface.
+
+    O escritor preenche seu quadro de trás e troca com o quadro "pronto"; o
+    leitor troca o seu quadro com o pronto quando há um novo. Nenhum dos
+    dois bloqueia o outro além de uma troca de índices, e o quadro devolvido
+    por `ler` não é modificado até a próxima chamada de `ler`.
+    """
+    def __init__(self, forma, dtype=np.float64):
+        self._quadros = [Quadro(forma, dtype=dtype) for _ in range(3)]
+        self._escrita, self._pronto, self._leitura = 0, 1, 2
+        self._novo = False
+        self._trava = threading.Lock()
+        self.publicados = 0
+
+    def publicar(self, estado: Estado, passo):
+        quadro = self._quadros[self._escrita]
+        np.take(estado.dados, _INDICES_QUADRO, axis=0, out=quadro.dados)
+        quadro.passo = passo
+        quadro.t = estado.t
+        with self._trava:
+            self.publicados += 1
+            quadro.numero = self.publicados
+            self._escrita, self._pronto = self._pronto, self._escrita
+            self._novo = True
+
+    def ler(self):
+        """Retorna o quadro mais recente, ou None se nada novo foi publicado."""
+        with self._trava:
+            if not self._novo:
+                return None
+            self._leitura, self._pronto = self._pronto, self._leitura
+            self._novo = False
+            return self._quadros[self._leitura]
+
+
+class MedidorTaxa:
+    """Taxa de eventos por segundo em janelas de `janela` segundos."""
+    def __init__(self, janela=0.5):
+        self.janela = janela
+        self.taxa = 0.0
+        self._contagem = 0
+        self._inicio = time.perf_counter()
+
+    def registrar(self, n=1):
+        self._contagem += n
+        agora = time.perf_counter()
+        decorrido = agora - self._inicio
+        if decorrido >= self.janela:
+            self.taxa = self._contagem / decorrido
+            self._contagem = 0
+            self._inicio = agora
+
+
+class TrabalhadorSimulacao(threading.Thread):
+    """
+    Avança a simulação continuamente em uma thread própria, desacoplada da
+    renderização.
+
+    Os quadros são publicados em um `BufferQuadros` no máximo a cada
+    `intervalo_publicacao` segundos (a cópia não entra em todo passo).
+    Alterações de parâmetros e comandos (`agendar`) chegam por uma fila e são
+    aplicados entre dois passos, nunca no meio de um. As operações pesadas do NumPy liberam o GIL,
+    então a interface continua responsiva.
+    """
+    def __init__(self, dinamica: Dinamica, estado: Estado, intervalo_publicacao=1 / 60):
+        super().__init__(daemon=True)
+        self.dinamica = dinamica
+        self.estado = estado
+        self.intervalo_publicacao = intervalo_publicacao
+        self.buffer = BufferQuadros(estado.K.shape, estado.dados.dtype)
+        self.passos = 0
+        self.erro = None  # exceção que encerrou a thread, se houver
+        self.taxa_passos = MedidorTaxa()
+        # Observadores chamados após cada passo: f(estado, passo)
+        self.observadores = []
+
+        self._parametros = queue.SimpleQueue()
+        self._rodando = threading.Event()
+        self._encerrar = threading.Event()
+        self._ultima_publicacao = 0.0
+        self.buffer.publicar(estado, 0)
+
+    def atualizar_parametro(self, nome, valor):
+        """Agenda a mudança de um parâmetro para antes do próximo passo (thread-safe)."""
+        self._parametros.put((nome, valor))
+
+    def agendar(self, comando):
+        """Agenda `comando()` para antes do próximo passo (thread-safe), na ordem das alterações."""
+        self._parametros.put((comando, None))
+
+    def _aplicar_parametros(self):
+        while True:
+            try:
+                nome, valor = self._parametros.get_nowait()
+            except queue.Empty:
+                return
+            if callable(nome):
+                nome()
+            else:
+                setattr(self.dinamica.p, nome, valor)
+
+    @property
+    def rodando(self):
+        return self._rodando.is_set()
+
+    def retomar(self):
+        self._rodando.set()
+
+    def pausar(self):
+        self._rodando.clear()
+
+    def encerrar(self, timeout=None):
+        """Para a thread e aplica alterações de parâmetros ainda pendentes."""
+        self._encerrar.set()
+        self._rodando.set()  # acordar se estiver pausado
+        if self.is_alive():
+            self.join(timeout)
+        self._aplicar_parametros()
+
+    def run(self):
+        try:
+            self._executar()
+        except Exception as erro:
+            self.erro = erro
+            raise
+
+    def _executar(self):
+        while not self._encerrar.is_set():
+            if not self._rodando.wait(timeout=0.1):
+                self._aplicar_parametros()
+                continue
+            if self._encerrar.is_set():
+                break
+            self._aplicar_parametros()
+            self.dinamica.passo(self.estado)
+            self.passos += 1
+            self.taxa_passos.registrar()
+            for observador in self.observadores:
+                observador(self.estado, self.passos)
+
+            agora = time.perf_counter()
+            if agora - self._ultima_publicacao >= self.intervalo_publicacao:
+                self.buffer.publicar(self.estado, self.passos)
+                self._ultima_publicacao = agora
@@ -0,0 +1,223 @@
+import itertools
+import json
+import os
+import multiprocessing as mp
+from dataclasses import asdict, fields, replace
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ..model.parametros import Parametros, CAMPOS_GEOMETRIA
+from ..model.estado import Estado, CAMPOS
+from ..model.dinamica import Dinamica
+from .controle import ControladorExecucao
+
+# Campos guardados ao final de cada execução e cujas médias espaciais
+# formam o resumo escalar por passo
+CAMPOS_SAIDA = ('K', 'H', 'A', 'P', 'L', 'Y')
+_INDICES_SAIDA = [CAMPOS.index(c) for c in CAMPOS_SAIDA]
+
+# Contexto de cada processo trabalhador (preenchido pelo inicializador do pool)
+_CONTEXTO = {}
+
+
+def _inicializar_trabalhador(nomes, formas, config):
+    """Anexa os blocos de memória compartilhada no processo trabalhador."""
+    _CONTEXTO.clear()
+    _CONTEXTO.update(config)
+    for chave in ('campos', 'resumos'):
+        shm = shared_memory.SharedMemory(name=nomes[chave])
+        _CONTEXTO['shm_' + chave] = shm  # manter referência viva
+        _CONTEXTO[chave] = np.ndarray(formas[chave], dtype=np.float64, buffer=shm.buf)
+
+
+def executar_simulacao(params: Parametros, passos, semente=0, ruido=0.1, resumo=None,
+                       tol=None, intervalo=10):
+    """
+    Executa uma simulação sem GUI e retorna o estado final. O ruído inicial
+    vem de `np.random.default_rng(semente)`; o gerador global não é tocado.
+
+    Se `resumo` (passos, len(CAMPOS_SAIDA)) for dado, grava nele as médias
+    espaciais de cada campo de saída a cada passo. Com `tol`, um
+    `ControladorExecucao` encerra a simulação ao convergir ou divergir; as
+    linhas do resumo além do último passo válido ficam NaN.
+    """
+    estado = Estado(params)
+    estado.inicializar_com_ruido(ruido, np.random.default_rng(semente))
+    dinamica = Dinamica(params)
+
+    def resumir(estado, passo):
+        for j, indice in enumerate(_INDICES_SAIDA):
+            resumo[passo - 1, j] = estado.dados[indice].mean()
+
+    if tol is None:
+        for n in range(passos):
+            dinamica.passo(estado)
+            if resumo is not None:
+                resumir(estado, n + 1)
+        return estado
+
+    controlador = ControladorExecucao(dinamica, intervalo=intervalo, tol=tol)
+    if resumo is not None:
+        controlador.observadores.append(resumir)
+    executados = controlador.executar(estado, passos).passos
+    if resumo is not None:
+        resumo[executados:] = np.nan
+    return estado
+
+
+def _executar_tarefa(indice):
+    ctx = _CONTEXTO
+    params = replace(ctx['base'], **ctx['combinacoes'][indice])
+    estado = executar_simulacao(params, ctx['passos'], ctx['semente'] + indice,
+                                ctx['ruido'], resumo=ctx['resumos'][indice],
+                                tol=ctx['tol'], intervalo=ctx['intervalo'])
+    ctx['campos'][indice] = estado.dados[_INDICES_SAIDA]
+    return indice
+
+
+class ResultadoVarredura:
+    """Resultados de uma varredura: campos finais, resumos por passo e combinações."""
+    def __init__(self, combinacoes, campos, resumos, concluidos):
+        self.combinacoes = combinacoes
+        self.campos = campos        # (execuções, len(CAMPOS_SAIDA), Nx, Ny)
+        self.resumos = resumos      # (execuções, passos, len(CAMPOS_SAIDA))
+        self.concluidos = concluidos
+
+    def campo(self, indice, nome):
+        """Campo final `nome` da execução `indice`."""
+        return self.campos[indice, CAMPOS_SAIDA.index(nome)]
+
+    def passos_executados(self):
+        """Passos válidos de cada execução (menos que `passos` se parou antes, com `tol`)."""
+        return np.isfinite(self.resumos[:, :, 0]).sum(axis=1)
+
+
+class Varredura:
+    """
+    Varredura de parâmetros sem GUI, distribuída em um pool de processos.
+
+    `grade` mapeia nomes de parâmetros em listas de valores; todas as
+    combinações são executadas a partir de `base`. Os trabalhadores escrevem
+    campos finais e resumos diretamente em blocos de memória compartilhada
+    (nada é serializado de volta além do índice da execução). Com
+    `diretorio`, cada execução concluída é gravada em disco e uma varredura
+    interrompida pode ser retomada chamando `executar` novamente.
+
+    Com `tol`, cada execução para ao convergir (taxa de variação relativa
+    abaixo de `tol`, verificada a cada `intervalo` passos) ou ao divergir;
+    veja `controle.ControladorExecucao`.
+    """
+    def __init__(self, grade, passos, base: Parametros = None, diretorio=None,
+                 semente=0, ruido=0.1, tol=None, intervalo=10):
+        self.base = base if base is not None else Parametros()
+        if self.base.n_membros() is not None:
+            raise ValueError("A varredura não aceita parâmetros base em modo ensemble")
+        for nome in grade:
+            if nome in CAMPOS_GEOMETRIA:
+                raise ValueError(f"'{nome}' define a geometria e não pode ser varrido")
+            if not hasattr(self.base, nome):
+                raise ValueError(f"Parâmetro desconhecido: {nome!r}")
+        # Campos float aceitam valores numéricos em qualquer forma (inclusive texto);
+        # os demais (integrador, precisao) ficam como dados
+        reais = {f.name for f in fields(Parametros) if f.type is float}
+        self.grade = {nome: [float(v) if nome in reais else v for v in valores]
+                      for nome, valores in grade.items()}
+        self.combinacoes = [dict(zip(self.grade, valores))
+                            for valores in itertools.product(*self.grade.values())]
+        self.passos = passos
+        self.diretorio = diretorio
+        self.semente = semente
+        self.ruido = ruido
+        self.tol = tol
+        self.intervalo = intervalo
+
+    @property
+    def formas(self):
+        n = len(self.combinacoes)
+        return {'campos': (n, len(CAMPOS_SAIDA), self.base.Nx, self.base.Ny),
+                'resumos': (n, self.passos, len(CAMPOS_SAIDA))}
+
+    def _metadados(self):
+        metadados = {'grade': self.grade, 'passos': self.passos, 'base': asdict(self.base),
+                     'semente': self.semente, 'ruido': self.ruido, 'campos': list(CAMPOS_SAIDA)}
+        if self.tol is not None:
+            metadados.update(tol=self.tol, intervalo=self.intervalo)
+        return metadados
+
+    def _abrir_disco(self):
+        """Abre (ou cria) os arquivos de resultado; retorna None sem diretório."""
+        if self.diretorio is None:
+            return None
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho_meta = os.path.join(self.diretorio, 'metadados.json')
+        arquivos = {nome: os.path.join(self.diretorio, nome + '.npy')
+                    for nome in ('campos', 'resumos', 'concluidos')}
+        if os.path.exists(caminho_meta):
+            with open(caminho_meta) as f:
+                if json.load(f) != json.loads(json.dumps(self._metadados())):
+                    raise ValueError(f"{self.diretorio} contém uma varredura com outra configuração")
+            return {nome: np.load(caminho, mmap_mode='r+') for nome, caminho in arquivos.items()}
+
+        formas = dict(self.formas, concluidos=(len(self.combinacoes),))
+        disco = {nome: np.lib.format.open_memmap(caminho, mode='w+',
+                                                 dtype=np.int8 if nome == 'concluidos' else np.float64,
+                                                 shape=formas[nome])
+                 for nome, caminho in arquivos.items()}
+        disco['concluidos'][:] = 0
+        disco['concluidos'].flush()
+        # Metadados por último: só existem quando os arquivos estão completos
+        with open(caminho_meta, 'w') as f:
+            json.dump(self._metadados(), f, indent=2)
+        return disco
+
+    def pendentes(self):
+        """Índices das execuções ainda não concluídas (segundo o diretório, se houver)."""
+        disco = self._abrir_disco()
+        if disco is None:
+            return list(range(len(self.combinacoes)))
+        return [int(i) for i in np.flatnonzero(disco['concluidos'] == 0)]
+
+    def executar(self, processos=None):
+        """Executa as combinações pendentes usando `processos` processos (padrão: todos os núcleos)."""
+        disco = self._abrir_disco()
+        formas = self.formas
+        blocos = {chave: shared_memory.SharedMemory(create=True, size=max(1, 8 * int(np.prod(forma))))
+                  for chave, forma in formas.items()}
+        arrays = {}
+        try:
+            arrays.update({chave: np.ndarray(formas[chave], dtype=np.float64, buffer=blocos[chave].buf)
+                           for chave in blocos})
+            concluidos = np.zeros(len(self.combinacoes), dtype=bool)
+            if disco is not None:
+                concluidos[:] = disco['concluidos'] == 1
+                arrays['campos'][concluidos] = disco['campos'][concluidos]
+                arrays['resumos'][concluidos] = disco['resumos'][concluidos]
+            pendentes = np.flatnonzero(~concluidos).tolist()
+
+            if pendentes:
+                config = {'base': self.base, 'combinacoes': self.combinacoes, 'passos': self.passos,
+                          'semente': self.semente, 'ruido': self.ruido,
+                          'tol': self.tol, 'intervalo': self.intervalo}
+                nomes = {chave: bloco.name for chave, bloco in blocos.items()}
+                processos = min(processos or os.cpu_count() or 1, len(pendentes))
+                with mp.Pool(processos, initializer=_inicializar_trabalhador,
+                             initargs=(nomes, formas, config)) as pool:
+                    for indice in pool.imap_unordered(_executar_tarefa, pendentes):
+                        concluidos[indice] = True
+                        if disco is not None:
+                            disco['campos'][indice] = arrays['campos'][indice]
+                            disco['resumos'][indice] = arrays['resumos'][indice]
+                            disco['campos'].flush()
+                            disco['resumos'].flush()
+                            # Marcar como concluída só depois dos dados estarem em disco
+                            disco['concluidos'][indice] = 1
+                            disco['concluidos'].flush()
+
+            return ResultadoVarredura(self.combinacoes, arrays['campos'].copy(),
+                                      arrays['resumos'].copy(), concluidos)
+        finally:
+            arrays.clear()  # liberar as vistas antes de fechar os blocos
+            for bloco in blocos.values():
+                bloco.close()
+                bloco.unlink()
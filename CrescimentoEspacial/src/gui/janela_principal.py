@@ -3,11 +3,14 @@ from tkinter import ttk
 from ..model.parametros import Parametros
 from ..model.estado import Estado
 from ..model.dinamica import Dinamica
+from ..model.perfil import Perfilador
+from ..execucao.trabalhador import TrabalhadorSimulacao, MedidorTaxa
 from .visualizacao import Visualizacao
 from .painel_controle import PainelControle
+from .painel_perfil import PainelPerfil
 
 class JanelaPrincipal(tk.Tk):
-    def __init__(self):
+    def __init__(self, fps=30):
         super().__init__()
         self.title("Simulação de Crescimento Econômico Espacial")
         self.geometry("1200x800")
@@ -20,7 +23,16 @@ class JanelaPrincipal(tk.Tk):
         
         self.rodando = False
         
+        # A simulação roda em uma thread própria; a interface só exibe o
+        # quadro mais recente, a no máximo `fps` quadros por segundo
+        self.fps = fps
+        self.taxa_quadros = MedidorTaxa()
+        self.trabalhador = TrabalhadorSimulacao(self.dinamica, self.estado)
+        self.trabalhador.start()
+        
         self.criar_interface()
+        self.protocol("WM_DELETE_WINDOW", self.fechar)
+        self.loop_exibicao()
         
     def criar_interface(self):
         # Layout Principal usando PanedWindow para permitir redimensionamento
@@ -43,10 +55,17 @@ class JanelaPrincipal(tk.Tk):
         callbacks = {
             'start': self.iniciar_simulacao,
             'stop': self.parar_simulacao,
-            'reset': self.resetar_simulacao
+            'reset': self.resetar_simulacao,
+            'parametro': self.atualizar_parametro,
+            'fps': self.definir_fps,
+            'fps_inicial': self.fps,
+            'perfil': self.alternar_perfil,
+            'zerar_perfil': self.zerar_perfil
         }
         self.painel = PainelControle(frame_controle, self.params, callbacks)
         self.painel.pack(fill=tk.BOTH, expand=True)
+        self.painel_perfil = PainelPerfil(frame_controle, callbacks)
+        self.painel_perfil.pack(fill=tk.BOTH, expand=True)
         
         # Adicionar ao paned com peso menor, mas garantindo espaço
         paned.add(frame_controle, weight=1)
@@ -54,31 +73,63 @@ class JanelaPrincipal(tk.Tk):
     def iniciar_simulacao(self):
         if not self.rodando:
             self.rodando = True
-            self.loop_simulacao()
+            self.trabalhador.retomar()
             
     def parar_simulacao(self):
         self.rodando = False
+        self.trabalhador.pausar()
+        
+    def atualizar_parametro(self, nome, valor):
+        # Aplicado pelo trabalhador entre dois passos
+        self.trabalhador.atualizar_parametro(nome, valor)
+        
+    def alternar_perfil(self, ativo):
+        # Trocado pelo trabalhador entre dois passos: as etapas de um passo
+        # abrem e fecham sempre no mesmo perfilador
+        perfilador = Perfilador() if ativo else None
+        self.trabalhador.agendar(lambda: setattr(self.dinamica, 'perfilador', perfilador))
+        self.painel_perfil.limpar()
+        
+    def zerar_perfil(self):
+        def zerar():
+            if self.dinamica.perfilador is not None:
+                self.dinamica.perfilador.zerar()
+        self.trabalhador.agendar(zerar)
+        self.painel_perfil.limpar()
+        
+    def definir_fps(self, fps):
+        self.fps = fps
         
     def resetar_simulacao(self):
         self.parar_simulacao()
+        self.trabalhador.encerrar()
         self.estado = Estado(self.params)
         self.estado.inicializar_com_ruido()
-        # Precisamos atualizar a referência no visualizador também, ou apenas atualizar os dados
-        # O visualizador mantém referência ao objeto estado. Se recriarmos, precisamos atualizar lá.
-        # Melhor seria ter um método reset no Estado, mas vamos atualizar a ref.
+        # O visualizador mantém referência ao objeto estado; atualizamos a ref.
         self.vis.estado = self.estado
-        self.vis.atualizar()
+        self.trabalhador = TrabalhadorSimulacao(self.dinamica, self.estado)
+        self.trabalhador.start()
         
-    def loop_simulacao(self):
-        if self.rodando:
-            # Executar um passo da dinâmica
-            self.dinamica.passo(self.estado)
-            
-            # Atualizar visualização
-            self.vis.atualizar()
-            
-            # Agendar próximo frame (ex: 50ms)
-            self.after(50, self.loop_simulacao)
+    def loop_exibicao(self):
+        # Renderiza apenas o quadro mais recente; quadros intermediários
+        # publicados desde a última exibição são descartados
+        quadro = self.trabalhador.buffer.ler()
+        if quadro is not None:
+            self.vis.atualizar(quadro)
+            self.taxa_quadros.registrar()
+        else:
+            self.taxa_quadros.registrar(0)
+        self.painel.mostrar_desempenho(self.trabalhador.taxa_passos.taxa if self.rodando else 0.0,
+                                       self.taxa_quadros.taxa if self.rodando else 0.0,
+                                       self.trabalhador.passos)
+        perfilador = self.dinamica.perfilador
+        if perfilador is not None and quadro is not None:
+            self.painel_perfil.atualizar(perfilador.relatorio())
+        self.after(max(1, int(1000 / self.fps)), self.loop_exibicao)
+        
+    def fechar(self):
+        self.trabalhador.encerrar(timeout=1.0)
+        self.destroy()
 
 if __name__ == "__main__":
     app = JanelaPrincipal()
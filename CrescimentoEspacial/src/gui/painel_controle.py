@@ -29,6 +29,42 @@ class PainelControle(ttk.Frame):
         self.criar_slider(frame_params, "Poluição por Prod. (mu)", 'mu', 0.0, 0.1)
         self.criar_slider(frame_params, "Depuração Poluição (nu)", 'nu', 0.0, 0.5)
         self.criar_slider(frame_params, "Mobilidade Pop. (m_L)", 'm_L', 0.0, 1.0)
+
+        # Exibição: taxa de quadros e contadores de desempenho
+        frame_exibicao = ttk.LabelFrame(self, text="Exibição", padding="5")
+        frame_exibicao.pack(fill=tk.X, pady=5)
+
+        subframe = ttk.Frame(frame_exibicao)
+        subframe.pack(fill=tk.X)
+        ttk.Label(subframe, text="Quadros/s máx.").pack(side=tk.LEFT, padx=5)
+        self.var_fps = tk.IntVar(value=self.callbacks.get('fps_inicial', 30))
+        spin = ttk.Spinbox(subframe, from_=1, to=120, width=5, textvariable=self.var_fps,
+                           command=self.alterar_fps)
+        spin.pack(side=tk.LEFT, padx=5)
+        spin.bind('<Return>', lambda event: self.alterar_fps())
+
+        self.lbl_desempenho = ttk.Label(frame_exibicao, text="")
+        self.lbl_desempenho.pack(side=tk.TOP, anchor=tk.W, padx=5, pady=(5, 0))
+
+    def alterar_fps(self):
+        try:
+            fps = int(self.var_fps.get())
+        except (ValueError, tk.TclError):
+            return
+        if 'fps' in self.callbacks:
+            self.callbacks['fps'](max(1, fps))
+
+    def mostrar_desempenho(self, passos_s, quadros_s, passo):
+        self.lbl_desempenho.config(
+            text=f"Passos/s: {passos_s:.1f}   Quadros/s: {quadros_s:.1f}   Passo: {passo}")
+
+    def definir_parametro(self, param_name, val):
+        # Com o trabalhador em segundo plano a alteração é agendada entre dois
+        # passos; sem ele, escreve direto nos parâmetros
+        if 'parametro' in self.callbacks:
+            self.callbacks['parametro'](param_name, val)
+        else:
+            setattr(self.params, param_name, val)
         
     def criar_slider(self, parent, label, param_name, min_val, max_val):
         # Frame container para o item de controle (Label em cima, Slider+Entry embaixo)
@@ -51,7 +87,7 @@ class PainelControle(ttk.Frame):
         
         def update_from_slider(val):
             float_val = float(val)
-            setattr(self.params, param_name, float_val)
+            self.definir_parametro(param_name, float_val)
             current_text = entry.get()
             new_text = f"{float_val:.3f}"
             if current_text != new_text:
@@ -63,7 +99,7 @@ class PainelControle(ttk.Frame):
                 val = float(entry.get())
                 val = max(min_val, min(max_val, val))
                 var.set(val)
-                setattr(self.params, param_name, val)
+                self.definir_parametro(param_name, val)
             except ValueError:
                 pass
 
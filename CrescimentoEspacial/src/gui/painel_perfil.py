@@ -0,0 +1,47 @@
+import tkinter as tk
+from tkinter import ttk
+
+
+class PainelPerfil(ttk.Frame):
+    """Tabela com o tempo por etapa de `Dinamica.passo`, atualizada ao vivo."""
+    COLUNAS = (('chamadas', 'Chamadas', 70), ('ms', 'ms/chamada', 80), ('fracao', '%', 50))
+
+    def __init__(self, parent, callbacks):
+        super().__init__(parent, padding="10")
+        self.callbacks = callbacks
+        self.var_ativo = tk.BooleanVar(value=False)
+        self.criar_widgets()
+
+    def criar_widgets(self):
+        frame = ttk.LabelFrame(self, text="Perfil por Etapa", padding="5")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        barra = ttk.Frame(frame)
+        barra.pack(fill=tk.X)
+        ttk.Checkbutton(barra, text="Medir", variable=self.var_ativo,
+                        command=self.alternar).pack(side=tk.LEFT, padx=5)
+        ttk.Button(barra, text="Zerar", command=self.callbacks['zerar_perfil']).pack(side=tk.LEFT, padx=5)
+
+        self.arvore = ttk.Treeview(frame, columns=[c for c, _, _ in self.COLUNAS], height=12)
+        self.arvore.heading('#0', text="Etapa")
+        self.arvore.column('#0', width=150)
+        for coluna, titulo, largura in self.COLUNAS:
+            self.arvore.heading(coluna, text=titulo)
+            self.arvore.column(coluna, width=largura, anchor=tk.E)
+        self.arvore.pack(fill=tk.BOTH, expand=True, pady=5)
+
+    def alternar(self):
+        self.callbacks['perfil'](self.var_ativo.get())
+
+    def atualizar(self, relatorio):
+        """Mostra um relatório de `Perfilador.relatorio()` (caminhos viram a hierarquia)."""
+        for caminho, m in relatorio.items():
+            pai, _, nome = caminho.rpartition('/')
+            valores = (m['chamadas'], f"{1e3 * m['tempo_medio']:.3f}", f"{100 * m['fracao']:.1f}")
+            if self.arvore.exists(caminho):
+                self.arvore.item(caminho, values=valores)
+            else:
+                self.arvore.insert(pai, tk.END, iid=caminho, text=nome, values=valores, open=True)
+
+    def limpar(self):
+        self.arvore.delete(*self.arvore.get_children())
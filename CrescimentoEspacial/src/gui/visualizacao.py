@@ -5,96 +5,161 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 from ..model.estado import Estado
 
+# (campo, título, mapa de cores) de cada painel, na ordem da grade 2x3
+PAINEIS = (
+    ('K', 'Capital Físico (K)', 'viridis'),
+    ('H', 'Capital Humano (H)', 'plasma'),
+    ('A', 'Tecnologia (A)', 'magma'),
+    ('P', 'Poluição (P)', 'Greys'),
+    ('L', 'População (L)', 'cividis'),
+    ('Y', 'Produto (Y)', 'inferno'),
+)
+
+
+def reduzir_para_tela(Z, altura, largura):
+    """
+    Subamostra Z (por saltos, sem cópia) para no máximo ~altura x largura
+    pontos. O custo fica proporcional ao tamanho na tela, não ao da grade.
+    """
+    f0 = max(1, int(np.ceil(Z.shape[0] / max(1, altura))))
+    f1 = max(1, int(np.ceil(Z.shape[1] / max(1, largura))))
+    return Z[::f0, ::f1]
+
+
 class Visualizacao(ttk.Frame):
-    def __init__(self, parent, estado: Estado):
+    """
+    Os seis painéis de campos.
+
+    No modo rápido (padrão) as imagens são artistas animados desenhados por
+    blitting sobre um fundo em cache (eixos, títulos, barras de cor); os dados
+    são subamostrados até o tamanho do painel em pixels e interpolados por
+    vizinho mais próximo; e a escala de cores só muda quando o máximo sai de
+    uma faixa de histerese (`histerese`, relativa), caso em que a figura
+    inteira é redesenhada. Painéis ocultos não são atualizados.
+    """
+    def __init__(self, parent, estado: Estado, rapido=True, histerese=0.15):
         super().__init__(parent)
         self.estado = estado
-        
+        self.rapido = rapido
+        self.histerese = histerese
+
+        # Painéis visíveis (podem ser alternados na barra superior)
+        self.var_visiveis = {nome: tk.BooleanVar(value=True) for nome, _, _ in PAINEIS}
+        self.var_rapido = tk.BooleanVar(value=rapido)
+        self.criar_barra()
+
         # Configuração da Figura Matplotlib
         self.fig = plt.Figure(figsize=(12, 8), dpi=100, facecolor='black')
         self.axs = self.fig.subplots(2, 3) # 6 subplots
         self.fig.tight_layout(pad=3.0)
-        
+
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
-        self.canvas.draw()
         self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-        
+
+        # Fundo em cache para blitting, recapturado a cada desenho completo
+        self._fundo = None
+        self.canvas.mpl_connect('draw_event', self._ao_desenhar)
+
         # Inicializar plots
-        self.im_K = None
-        self.im_H = None
-        self.im_A = None
-        self.im_P = None
-        self.im_L = None
-        self.im_Y = None
-        
+        self.imagens = {}
+        self.eixos = {}
+        self.barras = {}
         self.inicializar_plots()
+        self.canvas.draw()
+
+    def criar_barra(self):
+        barra = ttk.Frame(self)
+        barra.pack(side=tk.TOP, fill=tk.X)
+        for nome, _, _ in PAINEIS:
+            ttk.Checkbutton(barra, text=nome, variable=self.var_visiveis[nome],
+                            command=self.alterar_visiveis).pack(side=tk.LEFT, padx=3)
+        ttk.Checkbutton(barra, text="Renderização rápida", variable=self.var_rapido,
+                        command=self.alterar_modo).pack(side=tk.RIGHT, padx=5)
 
     def inicializar_plots(self):
         # Estilo Dark para visual premium
         plt.style.use('dark_background')
-        
-        # K - Capital Físico
-        ax = self.axs[0, 0]
-        self.im_K = ax.imshow(self.estado.K, cmap='viridis', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('Capital Físico (K)')
-        ax.axis('off') # Remover eixos para visual mais limpo
-        self.fig.colorbar(self.im_K, ax=ax)
-
-        # H - Capital Humano
-        ax = self.axs[0, 1]
-        self.im_H = ax.imshow(self.estado.H, cmap='plasma', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('Capital Humano (H)')
-        ax.axis('off')
-        self.fig.colorbar(self.im_H, ax=ax)
-
-        # A - Tecnologia
-        ax = self.axs[0, 2]
-        self.im_A = ax.imshow(self.estado.A, cmap='magma', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('Tecnologia (A)')
-        ax.axis('off')
-        self.fig.colorbar(self.im_A, ax=ax)
-
-        # P - Poluição
-        ax = self.axs[1, 0]
-        self.im_P = ax.imshow(self.estado.P, cmap='Greys', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('Poluição (P)')
-        ax.axis('off')
-        self.fig.colorbar(self.im_P, ax=ax)
-
-        # L - População
-        ax = self.axs[1, 1]
-        self.im_L = ax.imshow(self.estado.L, cmap='cividis', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('População (L)')
-        ax.axis('off')
-        self.fig.colorbar(self.im_L, ax=ax)
-        
-        # Y - Produto (Output)
-        ax = self.axs[1, 2]
-        self.im_Y = ax.imshow(self.estado.Y, cmap='inferno', origin='lower', vmin=0, interpolation='bicubic')
-        ax.set_title('Produto (Y)')
-        ax.axis('off')
-        self.fig.colorbar(self.im_Y, ax=ax)
-
-    def atualizar(self):
-        # Atualiza os dados dos plots sem recriar a figura
-        # Removemos autoscale() para evitar "pulos" nos eixos/cores
-        self.im_K.set_data(self.estado.K)
-        # Opcional: atualizar clim se mudar muito, mas por enquanto manter fixo ou manual é mais estável
-        self.im_K.set_clim(vmin=0, vmax=np.max(self.estado.K))
-        
-        self.im_H.set_data(self.estado.H)
-        self.im_H.set_clim(vmin=0, vmax=np.max(self.estado.H))
-        
-        self.im_A.set_data(self.estado.A)
-        self.im_A.set_clim(vmin=0, vmax=np.max(self.estado.A))
-        
-        self.im_P.set_data(self.estado.P)
-        self.im_P.set_clim(vmin=0, vmax=np.max(self.estado.P))
-        
-        self.im_L.set_data(self.estado.L)
-        self.im_L.set_clim(vmin=0, vmax=np.max(self.estado.L))
-        
-        self.im_Y.set_data(self.estado.Y)
-        self.im_Y.set_clim(vmin=0, vmax=np.max(self.estado.Y))
-        
+
+        n0, n1 = self.estado.K.shape[-2:]
+        for (nome, titulo, cmap), ax in zip(PAINEIS, self.axs.flat):
+            Z = getattr(self.estado, nome)
+            # Extensão fixa: dados subamostrados ocupam a mesma área
+            im = ax.imshow(Z, cmap=cmap, origin='lower', vmin=0,
+                           extent=(-0.5, n1 - 0.5, -0.5, n0 - 0.5),
+                           interpolation=self._interpolacao(), animated=self.rapido)
+            im.set_clim(0, self._teto(np.max(Z)))
+            ax.set_title(titulo)
+            ax.axis('off') # Remover eixos para visual mais limpo
+            self.barras[nome] = self.fig.colorbar(im, ax=ax)
+            self.imagens[nome] = im
+            self.eixos[nome] = ax
+            setattr(self, 'im_' + nome, im)
+
+    def _interpolacao(self):
+        return 'nearest' if self.rapido else 'bicubic'
+
+    def _teto(self, vmax):
+        # Limite superior com folga, para absorver pequenas variações
+        vmax = float(vmax) if np.isfinite(vmax) and vmax > 0 else 1.0
+        return vmax * (1.0 + self.histerese / 2) if self.rapido else vmax
+
+    def visiveis(self):
+        return [nome for nome, _, _ in PAINEIS if self.var_visiveis[nome].get()]
+
+    def alterar_visiveis(self):
+        for nome, ax in self.eixos.items():
+            visivel = self.var_visiveis[nome].get()
+            ax.set_visible(visivel)
+            self.barras[nome].ax.set_visible(visivel)
         self.canvas.draw_idle()
+
+    def alterar_modo(self):
+        self.rapido = self.var_rapido.get()
+        for im in self.imagens.values():
+            im.set_animated(self.rapido)
+            im.set_interpolation(self._interpolacao())
+        self.atualizar()
+
+    def _ao_desenhar(self, event):
+        if not self.rapido:
+            return
+        self._fundo = self.canvas.copy_from_bbox(self.fig.bbox)
+        for nome in self.visiveis():
+            self.eixos[nome].draw_artist(self.imagens[nome])
+
+    def atualizar(self, quadro=None):
+        # Atualiza os dados dos plots sem recriar a figura
+        # `quadro` (publicado pelo trabalhador) substitui o estado, se dado
+        fonte = quadro if quadro is not None else self.estado
+        if not self.rapido:
+            for nome in self.visiveis():
+                Z = getattr(fonte, nome)
+                self.imagens[nome].set_data(Z)
+                self.imagens[nome].set_clim(vmin=0, vmax=np.max(Z))
+            self.canvas.draw_idle()
+            return
+
+        redesenhar = self._fundo is None
+        for nome in self.visiveis():
+            im, ax = self.imagens[nome], self.eixos[nome]
+            campo = getattr(fonte, nome)
+            im.set_data(reduzir_para_tela(campo, ax.bbox.height, ax.bbox.width))
+            # Escala de cores com histerese: muda só quando o máximo sai da faixa.
+            # O máximo é o do campo inteiro (picos entre os pontos amostrados
+            # contam, e a escala não depende do tamanho da grade)
+            vmax = np.max(campo)
+            _, atual = im.get_clim()
+            if not (atual * (1.0 - self.histerese) <= vmax <= atual):
+                teto = self._teto(vmax)
+                if teto != atual:
+                    im.set_clim(0, teto)
+                    redesenhar = True
+
+        if redesenhar:
+            # Barras de cor mudaram: desenho completo (recaptura o fundo)
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._fundo)
+        for nome in self.visiveis():
+            self.eixos[nome].draw_artist(self.imagens[nome])
+        self.canvas.blit(self.fig.bbox)
@@ -0,0 +1,175 @@
+"""
+Cache de operadores pré-calculados, compartilhado por todo o processo.
+
+Kernels e espectros de spillover, autovalores do Laplaciano, matrizes de
+transferência entre grades e coordenadas da grade dependem só da geometria
+(L_x, L_y, Nx, Ny, contorno). Eles são guardados aqui, por tipo e chave de
+geometria, e reaproveitados por novas instâncias de `Estado` e `Dinamica`
+(resets da GUI, varreduras, níveis de multirresolução).
+
+O cache é um LRU limitado em bytes. Os arrays guardados são somente leitura,
+porque são compartilhados. Com `diretorio`, as entradas também são gravadas
+em disco e lidas de lá em uma falta (por exemplo, em outro processo ou em
+outra execução).
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_BYTES_PADRAO = 512 * 2 ** 20
+
+
+def _arrays(valor):
+    return valor if isinstance(valor, tuple) else (valor,)
+
+
+def _congelar(valor):
+    for array in _arrays(valor):
+        array.flags.writeable = False
+    return valor
+
+
+def digest(array):
+    """Chave curta para o conteúdo de um array (quando não há chave de geometria)."""
+    array = np.ascontiguousarray(array)
+    h = hashlib.sha1(array.view(np.uint8).reshape(-1))
+    h.update(repr((array.shape, array.dtype.str)).encode())
+    return h.hexdigest()
+
+
+class CacheOperadores:
+    """
+    LRU de arrays (ou tuplas de arrays) indexados por (tipo, chave).
+
+    `obter(tipo, chave, construir)` devolve a entrada guardada ou chama
+    `construir()` e guarda o resultado. As entradas menos usadas são
+    descartadas quando o total passa de `max_bytes`. É seguro usar de mais
+    de uma thread.
+    """
+    def __init__(self, max_bytes=MAX_BYTES_PADRAO, diretorio=None):
+        self.max_bytes = max_bytes
+        self.diretorio = diretorio
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.zerar_estatisticas()
+
+    def zerar_estatisticas(self):
+        self.acertos = 0
+        self.faltas = 0
+        self.lidos_disco = 0
+        self.descartes = 0
+        self._por_tipo = {}
+
+    def _contar(self, tipo, campo):
+        contagem = self._por_tipo.setdefault(tipo, {'acertos': 0, 'faltas': 0})
+        contagem[campo] += 1
+
+    def _arquivo(self, tipo, chave):
+        nome = hashlib.sha1(repr(chave).encode()).hexdigest()[:20]
+        return os.path.join(self.diretorio, f"{tipo}-{nome}.npz")
+
+    def _ler_disco(self, tipo, chave):
+        if not self.diretorio:
+            return None
+        caminho = self._arquivo(tipo, chave)
+        try:
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                if arquivo['chave'].item() != repr(chave):
+                    return None  # colisão de nome: ignorar
+                arrays = tuple(arquivo[f'a{i}'] for i in range(int(arquivo['n'])))
+                tupla = bool(arquivo['tupla'])
+        except (OSError, KeyError, ValueError):
+            return None
+        return arrays if tupla else arrays[0]
+
+    def _gravar_disco(self, tipo, chave, valor):
+        if not self.diretorio:
+            return
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = self._arquivo(tipo, chave)
+        arrays = _arrays(valor)
+        temporario = caminho + f'.{os.getpid()}.tmp'
+        with open(temporario, 'wb') as f:
+            np.savez(f, chave=np.array(repr(chave)), n=len(arrays),
+                     tupla=isinstance(valor, tuple), **{f'a{i}': a for i, a in enumerate(arrays)})
+        os.replace(temporario, caminho)  # escrita atômica
+
+    def obter(self, tipo, chave, construir):
+        """Entrada (tipo, chave), construída com `construir()` na primeira vez."""
+        completa = (tipo, chave)
+        with self._trava:
+            valor = self._entradas.get(completa)
+            if valor is not None:
+                self._entradas.move_to_end(completa)
+                self.acertos += 1
+                self._contar(tipo, 'acertos')
+                return valor
+            self.faltas += 1
+            self._contar(tipo, 'faltas')
+
+        # Construído fora da trava: outras threads não esperam por um FFT grande
+        valor = self._ler_disco(tipo, chave)
+        if valor is not None:
+            self.lidos_disco += 1
+        else:
+            valor = construir()
+            self._gravar_disco(tipo, chave, valor)
+        _congelar(valor)
+
+        tamanho = sum(a.nbytes for a in _arrays(valor))
+        with self._trava:
+            if completa not in self._entradas:
+                self._entradas[completa] = valor
+                self._bytes += tamanho
+                self._descartar()
+            return self._entradas.get(completa, valor)
+
+    def _descartar(self):
+        while self._bytes > self.max_bytes and len(self._entradas) > 1:
+            _, valor = self._entradas.popitem(last=False)
+            self._bytes -= sum(a.nbytes for a in _arrays(valor))
+            self.descartes += 1
+
+    def limpar(self):
+        """Esvazia o cache em memória (os arquivos em disco são mantidos)."""
+        with self._trava:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        """Acertos, faltas, leituras de disco, descartes, ocupação e contagem por tipo."""
+        with self._trava:
+            total = self.acertos + self.faltas
+            return {
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'taxa_acerto': self.acertos / total if total else 0.0,
+                'lidos_disco': self.lidos_disco,
+                'descartes': self.descartes,
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'por_tipo': {tipo: dict(c) for tipo, c in self._por_tipo.items()},
+            }
+
+
+# Instância do processo
+CACHE = CacheOperadores()
+
+
+def obter(tipo, chave, construir):
+    """Atalho para `CACHE.obter`."""
+    return CACHE.obter(tipo, chave, construir)
+
+
+def configurar(max_bytes=None, diretorio=None):
+    """Ajusta o limite de memória e/ou o diretório de persistência do cache do processo."""
+    if max_bytes is not None:
+        CACHE.max_bytes = max_bytes
+        with CACHE._trava:
+            CACHE._descartar()
+    if diretorio is not None:
+        CACHE.diretorio = diretorio or None
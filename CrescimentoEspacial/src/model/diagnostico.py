@@ -0,0 +1,274 @@
+"""
+Diagnósticos agregados calculados durante a simulação.
+
+Um `Diagnostico` ligado a `Dinamica.diagnostico` é chamado em cada passo de
+`Dinamica.passo` e de `ControladorPasso.passo` (uma vez por passo aceito),
+logo depois das tendências no início do passo, enquanto Y, W, U e os fluxos
+de migração ainda estão no `EspacoTrabalho`. `PassoEsparso` não avalia a
+grade inteira a cada passo e recusa uma dinâmica com diagnóstico;
+`DecomposicaoDominio` cria suas próprias dinâmicas e não o usa. Os redutores transformam esses campos em alguns
+escalares por amostra (por membro, em modo ensemble). As séries ficam em
+colunas de capacidade fixa e os histogramas têm tamanho fixo, de modo que a
+memória não cresce com a duração da execução.
+"""
+import numpy as np
+
+_EIXOS = (-2, -1)
+
+
+def _integral(Z, estado):
+    return Z.sum(axis=_EIXOS) * (estado.dx * estado.dy)
+
+
+def _produto_interno(a, b):
+    """sum(a * b) nos dois últimos eixos, sem temporário do tamanho da grade."""
+    return np.einsum('...ij,...ij->...', a, b)
+
+
+class _Buffers:
+    """Buffers do tamanho da grade, criados na primeira amostra (ou ao mudar a forma)."""
+    def __init__(self):
+        self._buffers = {}
+
+    def obter(self, nome, forma, dtype=np.float64):
+        buffer = self._buffers.get(nome)
+        if buffer is None or buffer.shape != forma:
+            buffer = self._buffers[nome] = np.empty(forma, dtype=dtype)
+        return buffer
+
+
+class Histograma:
+    """
+    Histograma de tamanho fixo de um campo, ponderado (tipicamente pela
+    população L). Com `minimo` e `maximo`, as classes são fixas e as
+    contagens podem ser acumuladas ao longo das amostras (`acumular`);
+    valores fora da faixa caem nas classes das pontas. Sem eles, a faixa
+    é a do próprio campo em cada chamada.
+    """
+    def __init__(self, classes, minimo=None, maximo=None):
+        self.classes = classes
+        self.minimo, self.maximo = minimo, maximo
+        self.bordas = np.linspace(minimo, maximo, classes + 1) if minimo is not None else None
+        self.contagens = None
+        self._buffers = _Buffers()
+
+    def classificar(self, Z):
+        """Índice da classe de cada célula (buffer reutilizado), com deslocamento por membro."""
+        valores = self._buffers.obter('valores', Z.shape)
+        indices = self._buffers.obter('indices', Z.shape, np.intp)
+        minimo, maximo = self.minimo, self.maximo
+        if minimo is None:
+            minimo, maximo = float(np.nanmin(Z)), float(np.nanmax(Z))
+        np.subtract(Z, minimo, out=valores)
+        valores *= self.classes / max(maximo - minimo, 1e-300)
+        # fmax/fmin também levam NaN para uma classe válida
+        np.fmax(valores, 0, out=valores)
+        np.fmin(valores, self.classes - 1, out=valores)
+        np.copyto(indices, valores, casting='unsafe')
+        membros = Z.shape[:-2]
+        if membros:
+            indices += (np.arange(int(np.prod(membros))).reshape(membros + (1, 1)) * self.classes)
+        return indices
+
+    def contar(self, indices, pesos):
+        """Soma de `pesos` por classe, com forma (membros..., classes)."""
+        membros = pesos.shape[:-2]
+        n = int(np.prod(membros)) * self.classes
+        soma = np.bincount(indices.reshape(-1), pesos.reshape(-1), minlength=n)
+        return soma.reshape(membros + (self.classes,))
+
+    def acumular(self, contagens):
+        if self.contagens is None:
+            self.contagens = np.zeros_like(contagens)
+        self.contagens += contagens
+
+
+class Producao:
+    """Produto total, população total e produto per capita."""
+    colunas = ('Y_total', 'L_total', 'Y_per_capita')
+
+    def __call__(self, estado, ws):
+        Y = _integral(estado.Y, estado)
+        L = _integral(estado.L, estado)
+        return Y, L, Y / L
+
+
+class Desigualdade:
+    """
+    Desigualdade espacial da renda per capita y = Y / L entre as pessoas
+    (ponderada por L). O índice de Theil é exato. O Gini vem de um
+    histograma de log(y) com `classes` classes na faixa da amostra, com a
+    renda somada exatamente em cada classe: só a desigualdade dentro de uma
+    classe se perde, evitando a ordenação da grade inteira.
+    """
+    colunas = ('gini', 'theil')
+
+    def __init__(self, classes=1024, renda_min=1e-12):
+        self._classes = Histograma(classes)
+        self._log_min = np.log(renda_min)
+        self._buffers = _Buffers()
+
+    def __call__(self, estado, ws):
+        Y, L = estado.Y, estado.L
+        log_y = self._buffers.obter('log_y', Y.shape)
+        np.add(L, 1e-12, out=log_y)
+        np.divide(Y, log_y, out=log_y)
+        with np.errstate(divide='ignore'):
+            np.log(log_y, out=log_y)
+        np.maximum(log_y, self._log_min, out=log_y)
+
+        # Theil: sum(Y ln y) / sum(Y) - ln(media de y)
+        Y_total, L_total = Y.sum(axis=_EIXOS), L.sum(axis=_EIXOS)
+        theil = _produto_interno(Y, log_y) / Y_total - np.log(Y_total / L_total)
+
+        # Gini das classes (ordenadas por renda): 1 - sum p_k (2 S_{k-1} + s_k)
+        indices = self._classes.classificar(log_y)
+        pessoas = self._classes.contar(indices, L)
+        renda = self._classes.contar(indices, Y)
+        p = pessoas / pessoas.sum(axis=-1, keepdims=True)
+        s = renda / renda.sum(axis=-1, keepdims=True)
+        anterior = np.cumsum(s, axis=-1) - s
+        gini = 1.0 - np.sum(p * (2 * anterior + s), axis=-1)
+        return gini, theil
+
+
+class Exposicao:
+    """
+    Exposição à poluição ponderada pela população, sum(L P) / sum(L), e o
+    máximo de P. `histograma` acumula a população por nível de P.
+    """
+    colunas = ('exposicao_P', 'P_max')
+
+    def __init__(self, classes=128, P_max=100.0):
+        self.histograma = Histograma(classes, 0.0, P_max)
+
+    def __call__(self, estado, ws):
+        P, L = estado.P, estado.L
+        self.histograma.acumular(self.histograma.contar(self.histograma.classificar(P), L))
+        return _produto_interno(L, P) / L.sum(axis=_EIXOS), P.max(axis=_EIXOS)
+
+
+class Fluxos:
+    """
+    Magnitude dos fluxos de migração calculados no passo: do capital humano
+    (atraído pelo salário W) e da população (atraída pela utilidade U).
+    Integral de |J| no domínio e máximo de |J|.
+    """
+    colunas = ('fluxo_H', 'fluxo_H_max', 'fluxo_L', 'fluxo_L_max')
+
+    def __init__(self):
+        self._buffers = _Buffers()
+
+    def __call__(self, estado, ws):
+        # sqrt(fx² + fy²) em vez de np.hypot, que é várias vezes mais lento
+        modulo = self._buffers.obter('modulo', ws.fluxo_x.shape, ws.fluxo_x.dtype)
+        quadrado = self._buffers.obter('quadrado', ws.fluxo_x.shape, ws.fluxo_x.dtype)
+        valores = []
+        for fx, fy in ((ws.fluxo_x, ws.fluxo_y), (ws.fluxo_L_x, ws.fluxo_L_y)):
+            np.multiply(fx, fx, out=modulo)
+            np.multiply(fy, fy, out=quadrado)
+            modulo += quadrado
+            np.sqrt(modulo, out=modulo)
+            valores += [_integral(modulo, estado), modulo.max(axis=_EIXOS)]
+        return tuple(valores)
+
+
+def redutores_padrao():
+    return [Producao(), Desigualdade(), Exposicao(), Fluxos()]
+
+
+class Diagnostico:
+    """
+    Etapa de redução ligada a `Dinamica.diagnostico`.
+
+    A cada `intervalo` passos, cada redutor (um objeto com `colunas` e
+    `__call__(estado, ws)` que retorna um valor por coluna, escalar ou por
+    membro) produz uma linha da série. Os valores correspondem ao estado no
+    início do passo (o mesmo de Y, W, U e dos fluxos).
+
+    As séries ficam em um bloco de `capacidade` linhas: ao encher, uma linha
+    em cada duas é descartada e o espaçamento entre amostras dobra, de modo
+    que a série sempre cobre a execução inteira com memória fixa. Mínimo,
+    máximo e média de cada coluna consideram todas as amostras.
+    """
+    def __init__(self, redutores=None, intervalo=1, capacidade=4096):
+        if intervalo < 1 or capacidade < 2:
+            raise ValueError("intervalo deve ser >= 1 e capacidade >= 2")
+        self.redutores = redutores_padrao() if redutores is None else list(redutores)
+        self.colunas = ('passo', 't') + tuple(c for r in self.redutores for c in r.colunas)
+        if len(set(self.colunas)) != len(self.colunas):
+            raise ValueError(f"Colunas repetidas entre os redutores: {self.colunas}")
+        self.intervalo = intervalo
+        self.capacidade = capacidade
+        self.passos = 0
+        self.amostras = 0    # amostras calculadas (inclusive as descartadas)
+        self.espacamento = 1  # amostras por linha guardada
+        self._linhas = 0
+        self._dados = None
+        self._soma = self._minimo = self._maximo = None
+
+    def __call__(self, estado, ws):
+        passo = self.passos
+        self.passos += 1
+        if passo % self.intervalo:
+            return
+        linha = np.empty((len(self.colunas),) + estado.K.shape[:-2])
+        linha[0], linha[1] = passo, estado.t
+        j = 2
+        for redutor in self.redutores:
+            valores = redutor(estado, ws)
+            linha[j:j + len(valores)] = valores
+            j += len(valores)
+        self._registrar(linha)
+
+    def _registrar(self, linha):
+        if self._dados is None:
+            self._dados = np.empty((self.capacidade,) + linha.shape)
+            self._soma = np.zeros_like(linha)
+            self._minimo = np.full_like(linha, np.inf)
+            self._maximo = np.full_like(linha, -np.inf)
+        self._soma += linha
+        np.minimum(self._minimo, linha, out=self._minimo)
+        np.maximum(self._maximo, linha, out=self._maximo)
+        amostra = self.amostras
+        self.amostras += 1
+        if amostra % self.espacamento:
+            return
+        if self._linhas == self.capacidade:
+            # Descartar uma linha em cada duas (as guardadas seguem múltiplas do novo espaçamento)
+            metade = (self._linhas + 1) // 2
+            self._dados[:metade] = self._dados[:self._linhas:2]
+            self._linhas = metade
+            self.espacamento *= 2
+            if amostra % self.espacamento:
+                return
+        self._dados[self._linhas] = linha
+        self._linhas += 1
+
+    def series(self):
+        """Séries por coluna: {nome: array (amostras guardadas, membros...)}."""
+        if self._dados is None:
+            return {nome: np.empty(0) for nome in self.colunas}
+        dados = self._dados[:self._linhas]
+        return {nome: dados[:, j].copy() for j, nome in enumerate(self.colunas)}
+
+    def resumo(self):
+        """Mínimo, máximo e média de cada coluna sobre todas as amostras."""
+        if self._dados is None:
+            return {}
+        return {nome: {'min': self._minimo[j], 'max': self._maximo[j], 'media': self._soma[j] / self.amostras}
+                for j, nome in enumerate(self.colunas) if j >= 2}
+
+    def histogramas(self):
+        """{nome do redutor: (bordas, contagens acumuladas)} dos redutores com histograma."""
+        return {type(r).__name__.lower(): (r.histograma.bordas, r.histograma.contagens)
+                for r in self.redutores if getattr(r, 'histograma', None) is not None
+                and r.histograma.contagens is not None}
+
+    def salvar(self, caminho):
+        """Grava séries (uma coluna por array) e histogramas em um .npz."""
+        arrays = dict(self.series())
+        for nome, (bordas, contagens) in self.histogramas().items():
+            arrays[f'histograma_{nome}'] = contagens
+            arrays[f'bordas_{nome}'] = bordas
+        np.savez(caminho, **arrays)
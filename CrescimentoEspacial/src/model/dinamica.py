@@ -1,24 +1,78 @@
 import numpy as np
-from scipy.ndimage import laplace, convolve
 from .parametros import Parametros
 from .estado import Estado
+from .spillover import SpilloverEspectral
+from .espaco_trabalho import EspacoTrabalho
+from .operadores import laplaciano, derivada
+from .difusao import DifusaoImplicita
+from .perfil import NULO
+from . import cache
+
+INTEGRADORES = ('euler', 'imex')
+
+
+def _ponderar_log(log, expoente, out):
+    """out = expoente * log(Z), respeitando Z**0 == 1 mesmo quando Z == 0."""
+    np.multiply(log, expoente, out=out)
+    if np.ndim(expoente):
+        np.copyto(out, 0.0, where=(expoente == 0))
+    elif expoente == 0:
+        out.fill(0.0)
+    return out
+
 
 class Dinamica:
     """
     Implementa as equações de evolução temporal (EDPs).
+
+    O passo é dividido em etapas (produção, K, H, A, P, L e atualização) que
+    escrevem em um `EspacoTrabalho` pré-alocado; após o primeiro passo para
+    uma dada grade, nenhuma memória é alocada.
+
+    Em modo ensemble os parâmetros por membro são lidos como arrays (M, 1, 1)
+    e todas as operações fazem broadcast sobre o eixo de lote.
+
+    Integradores (`Parametros.integrador`):
+    - 'euler': Euler explícito em todos os termos (dt limitado por dx²/D).
+    - 'imex': reação e migração explícitas; difusão de K, H, A e P implícita,
+      resolvida no espaço da DCT (estável para qualquer dt).
+
+    Precisão (`Parametros.precisao`): os buffers seguem o dtype do estado,
+    exceto a convolução de spillover, sempre em float64 (a FFT float32 do
+    NumPy é mais lenta que a float64). No modo 'misto' (campos em float32)
+    o logaritmo da utilidade é calculado em float64 e a soma de
+    Euler é compensada (Kahan), o que dá à acumulação a exatidão de uma
+    soma em precisão dupla sem guardar cópias float64 dos campos.
+
+    Com `perfilador` (um `perfil.Perfilador`), cada etapa e os termos mais
+    caros (difusão, migração, spillover) são medidos; sem ele, a
+    instrumentação não custa nada além de um `with` vazio por etapa.
+
+    Com `diagnostico` (um `diagnostico.Diagnostico`), cada passo entrega ao
+    diagnóstico o estado e o espaço de trabalho logo após as tendências,
+    enquanto Y, W, U e os fluxos de migração ainda estão em memória.
     """
     def __init__(self, params: Parametros):
         self.p = params
-        # Kernel para spillovers globais (pré-calculado seria melhor, mas faremos simples aqui)
-        # Para eficiência, usaremos uma aproximação ou um kernel pequeno se a grade for grande.
+        # Kernel para spillovers globais (do tamanho da grade).
         # Aqui, criamos um kernel gaussiano/exponencial para convolução.
-        self.kernel_spillover = self._criar_kernel_spillover()
+        # Kernel e espectro vêm do cache do processo (um cálculo por geometria)
+        geometria = (params.L_x, params.L_y, params.Nx, params.Ny)
+        self.kernel_spillover = cache.obter('kernel_spillover', geometria, self._criar_kernel_spillover)
+        # Convolução via FFT: o espectro do kernel é calculado uma vez por geometria
+        self.spillover = SpilloverEspectral(self.kernel_spillover, params.contorno_spillover,
+                                            chave=geometria)
+        self.ws = None
+        self._coef = params
+        self._com_difusao = True
+        self.difusao = DifusaoImplicita()
+        self.perfilador = None
+        self.diagnostico = None
 
     def _criar_kernel_spillover(self):
         # Cria um kernel 2D para aproximar a integral global
         # Integral exp(-|x-y|)
-        # Limitamos o tamanho do kernel para desempenho (ex: 11x11 ou tamanho da grade)
-        # Se a grade for pequena (50x50), podemos usar full.
+        # Usamos o kernel completo: a convolução é feita no espaço espectral.
         range_x = np.linspace(-self.p.L_x/2, self.p.L_x/2, self.p.Nx)
         range_y = np.linspace(-self.p.L_y/2, self.p.L_y/2, self.p.Ny)
         XX, YY = np.meshgrid(range_x, range_y)
@@ -26,99 +80,274 @@ class Dinamica:
         kernel = np.exp(-dist)
         return kernel / np.sum(kernel) # Normalizar para manter escala controlada
 
+    def _etapa(self, nome):
+        perfilador = self.perfilador
+        return NULO if perfilador is None else perfilador.etapa(nome)
+
+    def espaco_trabalho(self, estado: Estado):
+        """Retorna os buffers de trabalho para a grade do estado (criados sob demanda)."""
+        duplo = self.p.precisao == 'misto'
+        if self.ws is None or not self.ws.compativel(estado.dados, duplo):
+            self.ws = EspacoTrabalho(estado.dados.shape[1:], estado.dados.dtype, duplo)
+        return self.ws
+
     def calcular_derivadas_espaciais(self, Z, dx, dy):
         """Calcula Laplaciano e Gradiente."""
         # Laplaciano (Diferenças Finitas centrais)
-        # scipy.ndimage.laplace usa padding, precisamos cuidar das bordas se necessário.
-        # Aqui assumimos condições de contorno reflexivas (mode='nearest')
-        lap = laplace(Z, mode='nearest') / (dx * dy) # Aproximação simples assumindo dx=dy
-        
-        # Gradiente
-        grad_y, grad_x = np.gradient(Z, dy, dx)
-        
+        # Condições de contorno reflexivas (equivalente a mode='nearest')
+        lap = laplaciano(Z, dx, dy) # Aproximação simples assumindo dx=dy
+
+        # Gradiente (eixo 0 -> y, eixo 1 -> x), como np.gradient(Z, dy, dx)
+        grad_x = derivada(Z, -1, dx)
+        grad_y = derivada(Z, -2, dy)
+
         return lap, grad_x, grad_y
 
-    def passo(self, estado: Estado):
-        p = self.p
-        dt = p.dt
-        dx, dy = estado.dx, estado.dy
-        
-        # 1. Calcular Produção Y
+    def _fluxo(self, potencial, densidade, coef, fluxo_x, fluxo_y, dx, dy):
+        """Fluxo J = coef * densidade * grad(potencial)."""
+        derivada(potencial, -1, dx, out=fluxo_x)
+        fluxo_x *= densidade
+        fluxo_x *= coef
+        derivada(potencial, -2, dy, out=fluxo_y)
+        fluxo_y *= densidade
+        fluxo_y *= coef
+
+    def _divergente(self, fluxo_x, fluxo_y, dx, dy, out, tmp):
+        """div(J) = d(fluxo_x)/dx + d(fluxo_y)/dy."""
+        derivada(fluxo_x, -1, dx, out=out)
+        derivada(fluxo_y, -2, dy, out=tmp)
+        out += tmp
+
+    def _somar_difusao(self, Z, D, destino, estado: Estado, ws: EspacoTrabalho):
+        """destino += D lap(Z), exceto quando a difusão é tratada implicitamente."""
+        if not self._com_difusao:
+            return
+        with self._etapa('difusao'):
+            laplaciano(Z, estado.dx, estado.dy, out=ws.lap)
+            ws.lap *= D
+            destino += ws.lap
+
+    def _producao(self, estado: Estado, ws: EspacoTrabalho):
         # Y = A^alpha * K^beta * H^gamma * L^(1-alpha-beta-gamma) * B^phi
+        # Calculado no domínio logarítmico: os logs são reaproveitados pelas
+        # demais potências do passo (A^sigma, H^psi, K^omega, ...).
+        p = self._coef
+        with np.errstate(divide='ignore'):
+            np.log(estado.K, out=ws.log_K)
+            np.log(estado.H, out=ws.log_H)
+            np.log(estado.A, out=ws.log_A)
+            np.log(estado.L, out=ws.log_L)
+            np.log(estado.B, out=ws.log_B)
+
         # Assumindo retornos constantes de escala se phi não for dado explicitamente para fechar em 1
         expoente_L = 1.0 - p.alpha - p.beta - p.gamma
-        Y = (estado.A ** p.alpha) * (estado.K ** p.beta) * (estado.H ** p.gamma) * (estado.L ** expoente_L) * (estado.B ** p.phi)
-        estado.Y = Y # Atualiza para visualização
-        
-        # 2. Dinâmica do Capital Físico (K)
+        Y = estado.Y # Atualiza para visualização
+        _ponderar_log(ws.log_A, p.alpha, Y)
+        Y += _ponderar_log(ws.log_K, p.beta, ws.tmp)
+        Y += _ponderar_log(ws.log_H, p.gamma, ws.tmp)
+        Y += _ponderar_log(ws.log_L, expoente_L, ws.tmp)
+        Y += _ponderar_log(ws.log_B, p.phi, ws.tmp)
+        np.exp(Y, out=Y)
+
+    def _capital_fisico(self, estado: Estado, ws: EspacoTrabalho):
         # dK/dt = s(Y) - delta K + D_K lap(K) - eta K P
-        lap_K, _, _ = self.calcular_derivadas_espaciais(estado.K, dx, dy)
-        dK = (p.s_rate * Y) - (p.delta_K * estado.K) + (p.D_K * lap_K) - (p.eta * estado.K * estado.P)
-        
-        # 3. Dinâmica do Capital Humano (H)
+        p = self._coef
+        dK, tmp = ws.dK, ws.tmp
+        np.multiply(estado.Y, p.s_rate, out=dK)
+        np.multiply(estado.K, p.delta_K, out=tmp)
+        dK -= tmp
+        self._somar_difusao(estado.K, p.D_K, dK, estado, ws)
+        np.multiply(estado.K, estado.P, out=tmp)
+        tmp *= p.eta
+        dK -= tmp
+
+    def _capital_humano(self, estado: Estado, ws: EspacoTrabalho):
+        p = self._coef
+        dH, tmp = ws.dH, ws.tmp
+        dx, dy = estado.dx, estado.dy
+
         # Salário w = dY/dH = gamma * Y / H
-        w = p.gamma * Y / (estado.H + 1e-6) # Evitar divisão por zero
-        estado.W = w
-        
+        w = estado.W
+        np.add(estado.H, 1e-6, out=tmp) # Evitar divisão por zero
+        np.multiply(estado.Y, p.gamma, out=w)
+        w /= tmp
+
         # Termo de migração: - div(v_H * H * grad(w))
-        # = - v_H * [ grad(H).grad(w) + H * lap(w) ]
-        # Ou numericamente: calcular fluxo J = v_H * H * grad(w) e depois -div(J)
-        _, grad_w_x, grad_w_y = self.calcular_derivadas_espaciais(w, dx, dy)
-        fluxo_x = p.v_H * estado.H * grad_w_x
-        fluxo_y = p.v_H * estado.H * grad_w_y
-        # Divergente do fluxo
-        # Divergente do fluxo
-        # np.gradient retorna (grad_axis_0, grad_axis_1) -> (grad_y, grad_x)
-        _, div_fluxo_x = np.gradient(fluxo_x, dy, dx) # queremos d(fluxo_x)/dx
-        div_fluxo_y, _ = np.gradient(fluxo_y, dy, dx) # queremos d(fluxo_y)/dy
-        migracao_H = -(div_fluxo_x + div_fluxo_y)
-        
-        lap_H, _, _ = self.calcular_derivadas_espaciais(estado.H, dx, dy)
-        dH = (p.lam * estado.H * (estado.A ** p.sigma) * (estado.H ** (1-p.sigma))) + \
-             (p.D_H * lap_H) + migracao_H - (p.delta_H * estado.H)
-
-        # 4. Dinâmica Tecnológica (A)
+        # Numericamente: calcular fluxo J = v_H * H * grad(w) e depois -div(J)
+        with self._etapa('migracao'):
+            self._fluxo(w, estado.H, p.v_H, ws.fluxo_x, ws.fluxo_y, dx, dy)
+            self._divergente(ws.fluxo_x, ws.fluxo_y, dx, dy, ws.div, tmp)
+
+        # dH/dt = lambda H A^sigma H^(1-sigma) + D_H lap(H) - div(J) - delta_H H
+        _ponderar_log(ws.log_A, p.sigma, dH)
+        dH += _ponderar_log(ws.log_H, 1 - p.sigma, tmp)
+        np.exp(dH, out=dH)
+        dH *= estado.H
+        dH *= p.lam
+        self._somar_difusao(estado.H, p.D_H, dH, estado, ws)
+        dH -= ws.div
+        np.multiply(estado.H, p.delta_H, out=tmp)
+        dH -= tmp
+
+    def _tecnologia(self, estado: Estado, ws: EspacoTrabalho):
+        p = self._coef
+        dA, tmp = ws.dA, ws.tmp
+
         # Spillovers globais: integral
-        # Usando convolução via FFT para rapidez se o kernel for grande, ou direta.
-        # Aqui usamos scipy.ndimage.convolve com o kernel pré-calculado
+        # Convolução via FFT com o espectro do kernel em cache (O(N² log N)),
+        # equivalente a scipy.ndimage.convolve(A, kernel, mode='nearest').
         # O termo é chi * integral. A integral é a convolução.
-        spillover = convolve(estado.A, self.kernel_spillover, mode='nearest')
-        
-        lap_A, _, _ = self.calcular_derivadas_espaciais(estado.A, dx, dy)
-        inovacao = p.xi * (estado.H ** p.psi) * (estado.K ** p.omega) * (1 - estado.A / p.A_max)
-        dA = inovacao + (p.D_A * lap_A) + (p.chi * spillover)
-        
-        # 5. Dinâmica da Poluição (P)
-        lap_P, _, _ = self.calcular_derivadas_espaciais(estado.P, dx, dy)
-        dP = (p.mu * Y) + (p.D_P * lap_P) - (p.nu * estado.P) - (p.kappa * (estado.P ** 2))
-        
-        # 6. Dinâmica Populacional (L)
+        with self._etapa('spillover'):
+            # Sempre em float64: a FFT float32 do NumPy é mais lenta que a float64
+            self.spillover.aplicar(estado.A, out=ws.spillover, dtype=np.float64)
+
+        # Inovação: xi * H^psi * K^omega * (1 - A/A_max)
+        _ponderar_log(ws.log_H, p.psi, dA)
+        dA += _ponderar_log(ws.log_K, p.omega, tmp)
+        np.exp(dA, out=dA)
+        np.divide(estado.A, p.A_max, out=tmp)
+        np.subtract(1.0, tmp, out=tmp)
+        dA *= tmp
+        dA *= p.xi
+
+        self._somar_difusao(estado.A, p.D_A, dA, estado, ws)
+        np.multiply(ws.spillover, p.chi, out=tmp)
+        dA += tmp
+
+    def _poluicao(self, estado: Estado, ws: EspacoTrabalho):
+        # dP/dt = mu Y + D_P lap(P) - nu P - kappa P^2
+        p = self._coef
+        dP, tmp = ws.dP, ws.tmp
+        np.multiply(estado.Y, p.mu, out=dP)
+        self._somar_difusao(estado.P, p.D_P, dP, estado, ws)
+        np.multiply(estado.P, p.nu, out=tmp)
+        dP -= tmp
+        np.multiply(estado.P, estado.P, out=tmp)
+        tmp *= p.kappa
+        dP -= tmp
+
+    def _populacao(self, estado: Estado, ws: EspacoTrabalho):
+        p = self._coef
+        dL, tmp = ws.dL, ws.tmp
+        dx, dy = estado.dx, estado.dy
+
         # Utilidade u = ln(Y/L) - theta * P
-        renda_per_capita = Y / (estado.L + 1e-6)
-        u = np.log(renda_per_capita + 1e-6) - (p.theta * estado.P)
-        estado.U = u
-        
+        u = estado.U
+        # Em precisão mista, o log é calculado em float64 (ws.tmp64)
+        renda = ws.tmp64 if ws.duplo else u
+        np.add(estado.L, 1e-6, out=renda, dtype=renda.dtype)
+        np.divide(estado.Y, renda, out=renda) # renda per capita
+        renda += 1e-6
+        np.log(renda, out=renda)
+        if ws.duplo:
+            np.copyto(u, renda)
+        np.multiply(estado.P, p.theta, out=tmp)
+        u -= tmp
+
         # Migração por utilidade: - div(m_L * L * grad(u))
-        _, grad_u_x, grad_u_y = self.calcular_derivadas_espaciais(u, dx, dy)
-        fluxo_L_x = p.m_L * estado.L * grad_u_x
-        fluxo_L_y = p.m_L * estado.L * grad_u_y
-        # Divergente
-        _, div_fluxo_L_x = np.gradient(fluxo_L_x, dy, dx)
-        div_fluxo_L_y, _ = np.gradient(fluxo_L_y, dy, dx)
-        migracao_L = -(div_fluxo_L_x + div_fluxo_L_y)
-        
-        dL = (p.r * estado.L * (1 - estado.L / p.L_max)) + migracao_L
-        
-        # Atualização de Euler (Simples)
-        estado.K += dK * dt
-        estado.H += dH * dt
-        estado.A += dA * dt
-        estado.P += dP * dt
-        estado.L += dL * dt
-        
-        # Garantir não-negatividade
-        estado.K = np.maximum(estado.K, 0)
-        estado.H = np.maximum(estado.H, 0)
-        estado.A = np.maximum(estado.A, 0)
-        estado.P = np.maximum(estado.P, 0)
-        estado.L = np.maximum(estado.L, 0)
+        with self._etapa('migracao'):
+            self._fluxo(u, estado.L, p.m_L, ws.fluxo_L_x, ws.fluxo_L_y, dx, dy)
+            self._divergente(ws.fluxo_L_x, ws.fluxo_L_y, dx, dy, ws.div, tmp)
+
+        # dL/dt = r L (1 - L/L_max) - div(J_L)
+        np.divide(estado.L, p.L_max, out=dL)
+        np.subtract(1.0, dL, out=dL)
+        dL *= estado.L
+        dL *= p.r
+        dL -= ws.div
+
+    def tendencias(self, estado: Estado, difusao=True):
+        """
+        Calcula dK, dH, dA, dP e dL (em `ws.derivadas`) sem alterar as variáveis
+        prognósticas. Também atualiza os campos derivados Y, W e U do estado.
+        Com `difusao=False`, os termos D lap(.) são omitidos.
+        """
+        ws = self.espaco_trabalho(estado)
+        self._com_difusao = difusao
+        # Relido a cada passo: os parâmetros podem mudar (ex: sliders da GUI)
+        self._coef = self.p.vetorizado()
+        with self._etapa('tendencias'):
+            with self._etapa('producao'):
+                self._producao(estado, ws)
+            with self._etapa('capital_fisico'):
+                self._capital_fisico(estado, ws)
+            with self._etapa('capital_humano'):
+                self._capital_humano(estado, ws)
+            with self._etapa('tecnologia'):
+                self._tecnologia(estado, ws)
+            with self._etapa('poluicao'):
+                self._poluicao(estado, ws)
+            with self._etapa('populacao'):
+                self._populacao(estado, ws)
+        return ws
+
+    def _avancar_explicito(self, estado: Estado, ws: EspacoTrabalho):
+        # Atualização de Euler (Simples), campo a campo para preservar as derivadas
+        dt = self._coef.dt
+        if ws.duplo and (estado.compensacao is None or estado.compensacao.shape != estado.prognosticos.shape):
+            estado.compensacao = np.zeros_like(estado.prognosticos)
+        for i, (campo, d) in enumerate(zip(estado.prognosticos, ws.derivadas)):
+            np.multiply(d, dt, out=ws.tmp)
+            if not ws.duplo:
+                campo += ws.tmp
+                continue
+            # Soma compensada (Kahan): c guarda a parte do incremento perdida
+            # no arredondamento e a devolve no passo seguinte
+            c, novo = estado.compensacao[i], ws.lap
+            ws.tmp -= c
+            np.add(campo, ws.tmp, out=novo)
+            np.subtract(novo, campo, out=c)
+            c -= ws.tmp
+            np.copyto(campo, novo)
+        estado.avancar_tempo(dt)
+
+    def _limitar(self, estado: Estado, ws: EspacoTrabalho):
+        if ws.duplo:
+            # Onde o corte abaixo atua, o incremento não foi aplicado: nada a compensar
+            for campo, c in zip(estado.prognosticos, estado.compensacao):
+                np.heaviside(campo, 1, out=ws.tmp)
+                c *= ws.tmp
+        # Garantir não-negatividade (K, H, A, P, L de uma só vez)
+        np.maximum(estado.prognosticos, 0, out=estado.prognosticos)
+
+    def _atualizar(self, estado: Estado, ws: EspacoTrabalho):
+        self._avancar_explicito(estado, ws)
+        self._limitar(estado, ws)
+
+    def _atualizar_imex(self, estado: Estado, ws: EspacoTrabalho):
+        # Passo IMEX (Euler implícito-explícito): u* = u + dt R(u) com a parte
+        # explícita e, em seguida, (I - dt D lap) u_novo = u* para cada campo
+        # com difusão. L não tem difusão e fica só com a parte explícita.
+        p = self._coef
+        self._avancar_explicito(estado, ws)
+        with self._etapa('difusao_implicita'):
+            for i, (campo, D) in enumerate(((estado.K, p.D_K), (estado.H, p.D_H),
+                                            (estado.A, p.D_A), (estado.P, p.D_P))):
+                if not ws.duplo:
+                    self.difusao.resolver(campo, D, p.dt, estado.dx, estado.dy)
+                    continue
+                # Precisão mista: a solução implícita reescreve o campo, então
+                # resolvemos em float64 a partir do valor compensado (campo - c)
+                # e a compensação passa a ser o arredondamento do resultado
+                c, u = estado.compensacao[i], ws.tmp64
+                np.subtract(campo, c, out=u, dtype=np.float64)
+                self.difusao.resolver(u, D, p.dt, estado.dx, estado.dy)
+                np.copyto(campo, u, casting='same_kind')
+                np.subtract(campo, u, out=u)
+                np.copyto(c, u, casting='same_kind')
+        self._limitar(estado, ws)
+
+    def passo(self, estado: Estado):
+        integrador = self.p.integrador
+        if integrador not in INTEGRADORES:
+            raise ValueError(f"Integrador desconhecido: {integrador!r} (use {INTEGRADORES})")
+        with self._etapa('passo'):
+            ws = self.tendencias(estado, difusao=(integrador == 'euler'))
+            if self.diagnostico is not None:
+                with self._etapa('diagnostico'):
+                    self.diagnostico(estado, ws)
+            with self._etapa('atualizacao'):
+                if integrador == 'euler':
+                    self._atualizar(estado, ws)
+                else:
+                    self._atualizar_imex(estado, ws)
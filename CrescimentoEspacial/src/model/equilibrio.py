@@ -0,0 +1,194 @@
+from dataclasses import dataclass, field
+import numpy as np
+from .estado import Estado
+from .dinamica import Dinamica
+
+# Campos cujo logaritmo entra no resíduo (precisam continuar positivos): K, H, A, L
+_POSITIVOS = (0, 1, 2, 4)
+_INDICE_P = 3
+
+
+@dataclass
+class ResultadoEquilibrio:
+    """Resultado de `SolverEquilibrio.resolver`."""
+    convergiu: bool
+    residuo: float
+    iteracoes: int
+    avaliacoes: int  # chamadas ao RHS (Dinamica.tendencias)
+    historico: list = field(default_factory=list)
+
+
+class SolverEquilibrio:
+    """
+    Equilíbrio espacial de longo prazo por Newton–Krylov sem Jacobiana.
+
+    O resíduo F é o lado direito completo de `Dinamica` (dK, dH, dA, dP, dL,
+    com difusão). Cada iteração resolve (I/tau - J) delta = F com GMRES: os
+    produtos J v são diferenças finitas de F, e o precondicionador é a
+    inversa exata, no espaço da DCT, de (1/tau + deslocamento) I - D lap para
+    cada campo (L, sem difusão, fica só com o termo diagonal).
+
+    Com tau infinito é o método de Newton, com busca linear no resíduo.
+    Quando Newton não reduz o resíduo com um passo de pelo menos
+    `alfa_newton`, o solver passa à continuação pseudo-transiente: tau
+    começa em `tau_inicial` (padrão: dt) e cresce a cada passo completo
+    pela razão entre resíduos sucessivos (SER), pelo menos por
+    `crescimento`; ao passar de `tau_max`, a iteração volta a ser Newton.
+    Os passos são cortados para manter K, H, A e L positivos (seus
+    logaritmos entram em F); P é truncado em zero.
+
+    O estado é alterado in-place; ao final, Y, W e U correspondem ao
+    equilíbrio encontrado.
+    """
+    def __init__(self, dinamica: Dinamica, tol=1e-8, rtol=0.0, max_iter=100,
+                 forcing=1e-2, max_krylov=50, deslocamento=None, tau_inicial=None,
+                 tau_max=1e8, crescimento=1.5, alfa_newton=0.25, alfa_min=1e-4, fronteira=0.9):
+        self.dinamica = dinamica
+        self.tol = tol
+        self.rtol = rtol
+        self.max_iter = max_iter
+        self.forcing = forcing
+        self.max_krylov = max_krylov
+        self.deslocamento = deslocamento
+        self.tau_inicial = tau_inicial
+        self.tau_max = tau_max
+        self.crescimento = crescimento
+        self.alfa_newton = alfa_newton
+        self.alfa_min = alfa_min
+        self.fronteira = fronteira
+        self.avaliacoes = 0
+
+    def residuo(self, estado: Estado):
+        """F(y) com difusão explícita; retorna a vista `ws.derivadas`."""
+        self.avaliacoes += 1
+        return self.dinamica.tendencias(estado, difusao=True).derivadas
+
+    @staticmethod
+    def norma(F):
+        """Norma RMS do resíduo."""
+        return float(np.sqrt(np.vdot(F, F).real / F.size))
+
+    def _deslocamento(self):
+        # Escala típica da parte de reação de -J: as taxas de decaimento do modelo
+        if self.deslocamento is not None:
+            return self.deslocamento
+        p = self.dinamica.p
+        return float(np.mean([np.max(p.delta_K), np.max(p.delta_H), np.max(p.nu), np.max(p.r)]))
+
+    def _precondicionador(self, estado: Estado, tau, forma):
+        """Aplica [(1/tau + deslocamento) I - D lap]^-1 campo a campo."""
+        p = self.dinamica.p.vetorizado()
+        h = 1.0 / (1.0 / tau + self._deslocamento())
+        difusivos = (p.D_K, p.D_H, p.D_A, p.D_P)
+        difusao = self.dinamica.difusao
+
+        def aplicar(v):
+            u = np.array(v, dtype=np.float64).reshape(forma)
+            for i, D in enumerate(difusivos):
+                difusao.resolver(u[i], D, h, estado.dx, estado.dy)
+            u *= h
+            return u.ravel()
+        return aplicar
+
+    def _direcao(self, estado: Estado, y0, F, tau):
+        """Resolve (I/tau - J) delta = F com GMRES e retorna (delta, iterações de Krylov)."""
+        from scipy.sparse.linalg import LinearOperator, gmres
+        y = estado.prognosticos
+        forma = y.shape
+        inv_tau = 0.0 if np.isinf(tau) else 1.0 / tau
+        escala = np.sqrt(np.finfo(y.dtype).eps) * (1.0 + self.norma(y0))
+        iteracoes = [0]
+
+        def jv(v):
+            v = v.reshape(forma)
+            nv = self.norma(v)
+            if nv == 0:
+                return np.zeros(v.size)
+            # Perturbação limitada para não tornar K, H, A ou L negativos
+            eps = self._fracao_fronteira(y0, v, escala / nv)
+            np.multiply(v, eps, out=y)
+            np.add(y, y0, out=y)
+            Jv = (self.residuo(estado) - F) / eps
+            np.copyto(y, y0)
+            Jv -= inv_tau * v
+            return -Jv.ravel()
+
+        def contar(_):
+            iteracoes[0] += 1
+
+        n = F.size
+        operador = LinearOperator((n, n), matvec=jv, dtype=np.float64)
+        M = LinearOperator((n, n), matvec=self._precondicionador(estado, tau, forma), dtype=np.float64)
+        delta, _ = gmres(operador, F.ravel().astype(np.float64), rtol=self.forcing,
+                         restart=self.max_krylov, maxiter=1, M=M,
+                         callback=contar, callback_type='pr_norm')
+        return delta.reshape(forma), iteracoes[0]
+
+    def _fracao_fronteira(self, y0, delta, alfa=1.0):
+        """Maior passo <= alfa que mantém K, H, A e L positivos (fração `fronteira` da distância)."""
+        for i in _POSITIVOS:
+            negativos = delta[i] < 0
+            if negativos.any():
+                alfa = min(alfa, self.fronteira * float(np.min(-y0[i][negativos] / delta[i][negativos])))
+        return alfa
+
+    def resolver(self, estado: Estado):
+        """Busca F(y) = 0 a partir do estado atual e retorna um `ResultadoEquilibrio`."""
+        self.avaliacoes = 0
+        y = estado.prognosticos
+        y0 = np.empty_like(y)
+        F = self.residuo(estado).copy()
+        norma = self.norma(F)
+        limite = max(self.tol, self.rtol * norma)
+        tau = np.inf
+        historico = [{'iteracao': 0, 'residuo': norma, 'tau': tau, 'alfa': None, 'krylov': 0}]
+
+        iteracao = 0
+        while norma > limite and iteracao < self.max_iter and np.isfinite(norma):
+            iteracao += 1
+            np.copyto(y0, y)
+            delta, krylov = self._direcao(estado, y0, F, tau)
+
+            # Busca linear: em Newton exige redução do resíduo (Armijo) com
+            # alfa >= alfa_newton; na continuação pseudo-transiente basta um
+            # resíduo finito
+            newton = np.isinf(tau)
+            alfa = self._fracao_fronteira(y0, delta)
+            aceito = False
+            while alfa >= (self.alfa_newton if newton else self.alfa_min):
+                np.multiply(delta, alfa, out=y)
+                y += y0
+                np.maximum(y[_INDICE_P], 0, out=y[_INDICE_P])
+                F_novo = self.residuo(estado)
+                norma_nova = self.norma(F_novo)
+                if np.isfinite(norma_nova) and (not newton or
+                                                norma_nova <= (1 - 1e-4 * alfa) * norma):
+                    aceito = True
+                    break
+                alfa *= 0.5
+
+            if aceito:
+                if not newton:
+                    # SER, mas sem encolher tau quando o resíduo cresce: no
+                    # transiente o resíduo pode subir antes de cair
+                    tau *= max(norma / max(norma_nova, 1e-300), self.crescimento) if alfa == 1.0 else 0.5
+                    if tau >= self.tau_max:
+                        tau = np.inf
+                np.copyto(F, F_novo)
+                norma = norma_nova
+            else:
+                np.copyto(y, y0)
+                if newton:
+                    # Newton estagnou: começar a continuação pseudo-transiente
+                    tau = self.tau_inicial or float(np.max(self.dinamica.p.dt))
+                else:
+                    tau *= 0.1
+            historico.append({'iteracao': iteracao, 'residuo': norma, 'tau': tau,
+                              'alfa': alfa if aceito else 0.0, 'krylov': krylov})
+
+        # Campos derivados (Y, W, U) consistentes com o estado final
+        F = self.residuo(estado)
+        norma = self.norma(F)
+        return ResultadoEquilibrio(convergiu=bool(norma <= limite), residuo=norma,
+                                   iteracoes=iteracao, avaliacoes=self.avaliacoes,
+                                   historico=historico)
@@ -0,0 +1,52 @@
+import numpy as np
+from .estado import N_PROGNOSTICOS
+
+
+class EspacoTrabalho:
+    """
+    Buffers intermediários reutilizados por `Dinamica.passo`.
+
+    Alocado uma vez por forma de grade; depois disso o passo roda só com
+    ufuncs in-place (`out=`) e não aloca memória. Com `duplo=True` (precisão
+    mista) há também um temporário em float64. A compensação da soma de Euler
+    fica no `Estado`, porque acompanha os valores dele.
+    """
+    def __init__(self, forma, dtype=np.float64, duplo=False):
+        self.forma = tuple(forma)
+        self.dtype = np.dtype(dtype)
+        self.duplo = duplo
+
+        def novo():
+            return np.empty(self.forma, dtype=self.dtype)
+
+        # Logaritmos dos campos, reaproveitados por todas as potências
+        # (A**alpha, A**sigma, H**gamma, H**psi, K**beta, K**omega, ...)
+        self.log_K = novo()
+        self.log_H = novo()
+        self.log_A = novo()
+        self.log_L = novo()
+        self.log_B = novo()
+
+        # Derivadas temporais das variáveis prognósticas, em um único bloco
+        self.derivadas = np.empty((N_PROGNOSTICOS,) + self.forma, dtype=self.dtype)
+        self.dK, self.dH, self.dA, self.dP, self.dL = self.derivadas
+
+        # Operadores espaciais
+        self.lap = novo()
+
+        # Fluxos de migração (salarial para H, por utilidade para L) e seu divergente
+        self.fluxo_x = novo()
+        self.fluxo_y = novo()
+        self.fluxo_L_x = novo()
+        self.fluxo_L_y = novo()
+        self.div = novo()
+
+        self.spillover = novo()
+
+        # Temporário genérico
+        self.tmp = novo()
+        self.tmp64 = np.empty(self.forma) if duplo else None
+
+    def compativel(self, dados, duplo=False):
+        """Verifica se os buffers servem para o bloco de dados de um Estado."""
+        return dados.shape[1:] == self.forma and dados.dtype == self.dtype and duplo == self.duplo
@@ -1,45 +1,117 @@
 import numpy as np
 from .parametros import Parametros
+from . import cache
+
+# Ordem dos campos no bloco contíguo de dados. Os cinco primeiros são as
+# variáveis prognósticas (evoluem pela dinâmica); os demais são fixos ou derivados.
+CAMPOS = ('K', 'H', 'A', 'P', 'L', 'B', 'Y', 'W', 'U')
+N_PROGNOSTICOS = 5
+
+
+def _campo(indice, doc):
+    """Propriedade que expõe uma fatia do bloco contíguo como se fosse um array próprio."""
+    def obter(self):
+        return self._vistas[indice]
+
+    def definir(self, valor):
+        # Atribuições (ex: estado.K = np.maximum(...)) copiam para o bloco,
+        # preservando a contiguidade e as vistas existentes.
+        self._vistas[indice][...] = valor
+
+    return property(obter, definir, doc=doc)
+
+
+def _coordenadas(params):
+    x = np.linspace(0, params.L_x, params.Nx)
+    y = np.linspace(0, params.L_y, params.Ny)
+    return (x, y) + tuple(np.meshgrid(x, y))
+
 
 class Estado:
     """
     Armazena o estado atual do sistema (grades 2D para todas as variáveis).
+
+    Todas as grades vivem em um único bloco contíguo `dados` com forma
+    (campos, Nx, Ny); os atributos K, H, A, ... são vistas desse bloco.
+    Em modo ensemble (parâmetros com valores por membro) o bloco ganha um
+    eixo de lote: (campos, M, Nx, Ny). Com `lote`, o eixo de lote existe
+    mesmo com parâmetros escalares (pedaços da grade avançados juntos).
     """
-    def __init__(self, params: Parametros):
+    K = _campo(0, "Capital Físico")
+    H = _campo(1, "Capital Humano")
+    A = _campo(2, "Tecnologia")
+    P = _campo(3, "Poluição")
+    L = _campo(4, "População")
+    B = _campo(5, "Recursos Naturais (Fixo por enquanto)")
+    Y = _campo(6, "Produto")
+    W = _campo(7, "Salário")
+    U = _campo(8, "Utilidade")
+
+    def __init__(self, params: Parametros, lote=None):
         self.params = params
+        self.t = 0.0  # Tempo simulado
+        self.n_membros = params.n_membros()
         shape = (params.Nx, params.Ny)
-        
+        if self.n_membros is not None:
+            shape = (self.n_membros,) + shape
+        elif lote is not None:
+            shape = (lote,) + shape
+
+        self.dados = np.zeros((len(CAMPOS),) + shape, dtype=params.tipo())
+        self._vistas = tuple(self.dados[i] for i in range(len(CAMPOS)))
+        # Vista das variáveis prognósticas (K, H, A, P, L) para atualizações em bloco
+        self.prognosticos = self.dados[:N_PROGNOSTICOS]
+        # Compensação da soma de Euler em precisão mista (criada pela Dinamica)
+        self.compensacao = None
+
         # Inicialização das grades (Condições Iniciais)
         # Podemos adicionar ruído ou condições específicas depois
-        self.K = np.ones(shape) * 1.0  # Capital Físico
-        self.H = np.ones(shape) * 1.0  # Capital Humano
-        self.A = np.ones(shape) * 1.0  # Tecnologia
-        self.P = np.zeros(shape)       # Poluição
-        self.L = np.ones(shape) * 1.0  # População
-        self.B = np.ones(shape) * 1.0  # Recursos Naturais (Fixo por enquanto)
-        
-        # Variáveis derivadas (para visualização/cálculo)
-        self.Y = np.zeros(shape)       # Produto
-        self.W = np.zeros(shape)       # Salário
-        self.U = np.zeros(shape)       # Utilidade
-        
-        # Configurar grade espacial
+        self.K = 1.0  # Capital Físico
+        self.H = 1.0  # Capital Humano
+        self.A = 1.0  # Tecnologia
+        self.P = 0.0  # Poluição
+        self.L = 1.0  # População
+        self.B = 1.0  # Recursos Naturais (Fixo por enquanto)
+        # Variáveis derivadas (Y, W, U) começam em zero (para visualização/cálculo)
+
+        # Configurar grade espacial (coordenadas somente leitura, do cache do processo)
         self.dx = params.L_x / params.Nx
         self.dy = params.L_y / params.Ny
-        self.x = np.linspace(0, params.L_x, params.Nx)
-        self.y = np.linspace(0, params.L_y, params.Ny)
-        self.X, self.Y_grid = np.meshgrid(self.x, self.y)
+        self.x, self.y, self.X, self.Y_grid = cache.obter(
+            'coordenadas', (params.L_x, params.L_y, params.Nx, params.Ny), lambda: _coordenadas(params))
 
-    def inicializar_com_ruido(self, nivel=0.1):
-        """Adiciona uma perturbação aleatória às condições iniciais."""
+    def inicializar_com_ruido(self, nivel=0.1, rng=None):
+        """
+        Adiciona uma perturbação aleatória às condições iniciais, sorteada de
+        `rng` (um `np.random.Generator`) ou, sem ele, do gerador global.
+        """
+        rng = np.random if rng is None else rng
         shape = self.K.shape
-        self.K += np.random.normal(0, nivel, shape)
-        self.H += np.random.normal(0, nivel, shape)
-        self.A += np.random.normal(0, nivel, shape)
-        self.L += np.random.normal(0, nivel, shape)
-        
+        self.K += rng.normal(0, nivel, shape)
+        self.H += rng.normal(0, nivel, shape)
+        self.A += rng.normal(0, nivel, shape)
+        self.L += rng.normal(0, nivel, shape)
+
         # Garantir positividade
-        self.K = np.maximum(self.K, 0.1)
-        self.H = np.maximum(self.H, 0.1)
-        self.A = np.maximum(self.A, 0.1)
-        self.L = np.maximum(self.L, 0.1)
+        np.maximum(self.K, 0.1, out=self.K)
+        np.maximum(self.H, 0.1, out=self.H)
+        np.maximum(self.A, 0.1, out=self.A)
+        np.maximum(self.L, 0.1, out=self.L)
+
+    def zerar_compensacao(self):
+        """Descarta a compensação de Euler; chamar ao sobrescrever `dados` por fora da dinâmica."""
+        if self.compensacao is not None:
+            self.compensacao[...] = 0
+
+    def avancar_tempo(self, dt):
+        """Avança o relógio da simulação (um tempo por membro se dt variar no ensemble)."""
+        self.t = self.t + (np.ravel(dt) if np.ndim(dt) else dt)
+
+    def membro(self, i):
+        """Extrai (copiando) o estado do i-ésimo membro do ensemble."""
+        if self.n_membros is None:
+            raise ValueError("Estado não está em modo ensemble")
+        estado = Estado(self.params.membro(i))
+        estado.dados[...] = self.dados[:, i]
+        estado.t = self.t[i] if np.ndim(self.t) else self.t
+        return estado
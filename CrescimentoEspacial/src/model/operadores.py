@@ -0,0 +1,76 @@
+"""
+Operadores de diferenças finitas que escrevem em buffers pré-alocados.
+
+Todos operam nos dois últimos eixos (eixo -2 = y, eixo -1 = x), de modo que
+funcionam tanto para uma grade (Nx, Ny) quanto para um lote (M, Nx, Ny).
+Os estênceis são aplicados sobre a vista achatada (1D e contígua) do array e
+as bordas são corrigidas em seguida: assim o NumPy não precisa de buffers
+internos de iteração e o passo não aloca memória.
+"""
+import numpy as np
+
+
+def _preparar(Z, out):
+    Z = np.ascontiguousarray(Z)
+    if out is None:
+        out = np.empty_like(Z)
+    elif not out.flags['C_CONTIGUOUS'] or out.shape != Z.shape:
+        raise ValueError("O buffer de saída deve ser C-contíguo e ter a forma da entrada")
+    return Z, out
+
+
+def laplaciano(Z, dx, dy, out=None):
+    """
+    Laplaciano de 5 pontos com bordas replicadas, equivalente a
+    `scipy.ndimage.laplace(Z, mode='nearest') / (dx * dy)`.
+    """
+    Z, out = _preparar(Z, out)
+    n1 = Z.shape[-1]
+    Zf, Of = Z.reshape(-1), out.reshape(-1)
+    # Vista (lote, n0, n1), com lote = 1 para uma única grade
+    Z3, O3 = Z.reshape((-1,) + Z.shape[-2:]), out.reshape((-1,) + Z.shape[-2:])
+
+    np.multiply(Zf, -4.0, out=Of)
+    # Vizinhos acima/abaixo: deslocamento de uma linha (para uma única grade,
+    # as fatias abaixo são blocos contíguos). A primeira/última linha recebe
+    # a célula-fantasma, que é ela mesma.
+    O3[:, 1:, :] += Z3[:, :-1, :]
+    O3[:, :-1, :] += Z3[:, 1:, :]
+    O3[:, 0, :] += Z3[:, 0, :]
+    O3[:, -1, :] += Z3[:, -1, :]
+    # Vizinhos à esquerda/direita: deslocamento de um elemento dentro de cada
+    # grade achatada; a primeira/última coluna recebeu o valor da linha
+    # vizinha, que trocamos pela célula-fantasma.
+    Z2, O2 = Zf.reshape(Z3.shape[0], -1), Of.reshape(Z3.shape[0], -1)
+    O2[:, 1:] += Z2[:, :-1]
+    O2[:, :-1] += Z2[:, 1:]
+    O2[:, n1::n1] -= Z2[:, n1 - 1:-1:n1]
+    O2[:, n1 - 1:-1:n1] -= Z2[:, n1::n1]
+    O3[:, :, 0] += Z3[:, :, 0]
+    O3[:, :, -1] += Z3[:, :, -1]
+
+    Of /= (dx * dy)
+    return out
+
+
+def derivada(Z, eixo, h, out=None):
+    """
+    Derivada parcial de primeira ordem ao longo de `eixo` (-2 ou -1), idêntica
+    a `np.gradient`: diferenças centrais no interior e laterais nas bordas.
+    """
+    Z, out = _preparar(Z, out)
+    passo = Z.shape[-1] if eixo in (-2, Z.ndim - 2) else 1
+    Zf, Of = Z.reshape(-1), out.reshape(-1)
+
+    # Diferenças centrais na vista achatada; as bordas (contaminadas pela
+    # linha/grade vizinha) são reescritas com as diferenças laterais.
+    np.subtract(Zf[2 * passo:], Zf[:-2 * passo], out=Of[passo:-passo])
+    Of[passo:-passo] /= (2.0 * h)
+
+    Zm = np.moveaxis(Z, eixo, -1)
+    Om = np.moveaxis(out, eixo, -1)
+    np.subtract(Zm[..., 1], Zm[..., 0], out=Om[..., 0])
+    Om[..., 0] /= h
+    np.subtract(Zm[..., -1], Zm[..., -2], out=Om[..., -1])
+    Om[..., -1] /= h
+    return out
@@ -1,9 +1,23 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
+import numpy as np
+
+# Parâmetros que definem a geometria da grade: precisam ser iguais para todos
+# os membros de um ensemble.
+CAMPOS_GEOMETRIA = ('L_x', 'L_y', 'Nx', 'Ny', 'contorno_spillover')
+
+# Modos de precisão: 'float64' (referência); 'float32' (tudo em precisão
+# simples); 'misto' (campos em float32, mas spillover, acumulação de Euler e
+# logaritmo da utilidade com precisão dupla)
+PRECISOES = ('float64', 'float32', 'misto')
 
 @dataclass
 class Parametros:
     """
     Classe que armazena todos os parâmetros do modelo EDP de Crescimento Econômico Espacial.
+
+    Modo ensemble: qualquer parâmetro que não seja de geometria pode receber
+    uma sequência de valores (um por membro). Estado e Dinamica então carregam
+    um eixo de lote à frente da grade e avançam todos os membros de uma vez.
     """
     # Dimensões e Espaço
     L_x: float = 100.0  # Tamanho do domínio em X
@@ -11,6 +25,9 @@ class Parametros:
     Nx: int = 50        # Pontos da grade em X
     Ny: int = 50        # Pontos da grade em Y
     dt: float = 0.1     # Passo de tempo
+    integrador: str = 'euler' # 'euler' (explícito) ou 'imex' (difusão implícita)
+    contorno_spillover: str = 'nearest' # Contorno da integral global: 'nearest' ou 'periodico'
+    precisao: str = 'float64' # 'float64', 'float32' ou 'misto' (ver PRECISOES)
     
     # Função de Produção (Cobb-Douglas Generalizada)
     alpha: float = 0.3  # Elasticidade Tecnologia
@@ -51,3 +68,43 @@ class Parametros:
     L_max: float = 100.0 # Capacidade de suporte local
     m_L: float = 0.2    # Mobilidade populacional por utilidade
     theta: float = 1.0  # Peso da poluição na desutilidade
+
+    def tipo(self):
+        """dtype dos campos de Estado para o modo de precisão escolhido."""
+        if self.precisao not in PRECISOES:
+            raise ValueError(f"Precisão desconhecida: {self.precisao!r} (use {PRECISOES})")
+        return np.dtype(np.float64 if self.precisao == 'float64' else np.float32)
+
+    def n_membros(self):
+        """Número de membros do ensemble, ou None se todos os parâmetros forem escalares."""
+        n = None
+        for campo in fields(self):
+            valor = getattr(self, campo.name)
+            if np.ndim(valor) == 0:
+                continue
+            if campo.name in CAMPOS_GEOMETRIA:
+                raise ValueError(f"O parâmetro de geometria '{campo.name}' não pode variar entre membros")
+            if np.ndim(valor) != 1:
+                raise ValueError(f"'{campo.name}' deve ser escalar ou uma sequência 1D")
+            if n is None:
+                n = len(valor)
+            elif len(valor) != n:
+                raise ValueError(f"'{campo.name}' tem {len(valor)} valores, esperado {n}")
+        return n
+
+    def membro(self, i):
+        """Parâmetros escalares do i-ésimo membro do ensemble."""
+        valores = {campo.name: np.asarray(getattr(self, campo.name))[i].item()
+                   for campo in fields(self) if np.ndim(getattr(self, campo.name)) == 1}
+        return replace(self, **valores)
+
+    def vetorizado(self):
+        """
+        Cópia com os valores por membro como arrays (M, 1, 1), prontos para
+        broadcast contra campos (M, Nx, Ny). Sem ensemble, retorna o próprio objeto.
+        """
+        if self.n_membros() is None:
+            return self
+        valores = {campo.name: np.asarray(getattr(self, campo.name), dtype=float).reshape(-1, 1, 1)
+                   for campo in fields(self) if np.ndim(getattr(self, campo.name)) == 1}
+        return replace(self, **valores)
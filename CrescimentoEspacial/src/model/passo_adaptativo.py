@@ -0,0 +1,176 @@
+import numpy as np
+from .estado import Estado
+from .dinamica import Dinamica
+from .operadores import derivada
+
+
+class ControladorPasso:
+    """
+    Passo de tempo adaptativo em torno de `Dinamica`.
+
+    Usa o par embutido Euler/Heun (RK 1(2)): a diferença entre as duas
+    soluções estima o erro local, e o passo é aceito quando a norma RMS
+    ponderada por `atol + rtol |y|` não passa de 1. Antes de cada tentativa,
+    o passo também é limitado por estimativas de estabilidade calculadas
+    dos campos no início do passo (as mesmas em todas as tentativas): número de CFL das velocidades de migração
+    (v_H |grad w| e m_L |grad u|) e número de difusão dt D / (dx dy).
+
+    A integração é sempre explícita (o RHS completo, com difusão), qualquer
+    que seja `Parametros.integrador`. Em modo ensemble todos os membros
+    compartilham o mesmo dt. Um `Dinamica.diagnostico` é chamado uma vez
+    por passo aceito, com as tendências no início do passo. Após um passo aceito, os campos derivados
+    (Y, W, U) do estado refletem a avaliação do preditor.
+    """
+    def __init__(self, dinamica: Dinamica, rtol=1e-3, atol=1e-6, dt_inicial=None,
+                 dt_min=1e-10, dt_max=None, cfl=0.5, numero_difusao=0.25,
+                 seguranca=0.9, fator_min=0.2, fator_max=5.0):
+        self.dinamica = dinamica
+        self.rtol = rtol
+        self.atol = atol
+        self.dt = dt_inicial if dt_inicial is not None else float(np.max(dinamica.p.dt))
+        self.dt_min = dt_min
+        self.dt_max = dt_max
+        self.cfl = cfl
+        self.numero_difusao = numero_difusao
+        self.seguranca = seguranca
+        self.fator_min = fator_min
+        self.fator_max = fator_max
+
+        # Contabilidade
+        self.aceitos = 0
+        self.rejeitados = 0
+        self.avaliacoes = 0      # chamadas ao RHS (Dinamica.tendencias)
+        self.limitados = 0       # tentativas cujo dt foi cortado pela estabilidade
+
+        self._buffers = None
+        self._k1_valido = False
+        self._estavel = np.inf  # limite de estabilidade em y0 (calculado junto com k1)
+
+    def _preparar(self, estado: Estado):
+        forma = estado.prognosticos.shape
+        if self._buffers is None or self._buffers[0].shape != forma:
+            self._buffers = tuple(np.empty(forma, dtype=estado.dados.dtype) for _ in range(3))
+            self._k1_valido = False
+        return self._buffers
+
+    def _avaliar(self, estado: Estado, destino):
+        ws = self.dinamica.tendencias(estado)
+        self.avaliacoes += 1
+        np.copyto(destino, ws.derivadas)
+        return ws
+
+    def dt_estavel(self, estado: Estado):
+        """Maior dt permitido pelas estimativas de CFL e de número de difusão."""
+        p = self.dinamica.p
+        ws = self.dinamica.espaco_trabalho(estado)
+        h = min(estado.dx, estado.dy)
+        limite = np.inf
+
+        # Velocidades de migração calculadas dos potenciais w e u atuais
+        for potencial, coef in ((estado.W, p.v_H), (estado.U, p.m_L)):
+            coef = float(np.max(np.abs(coef)))
+            if coef == 0:
+                continue
+            v_max = 0.0
+            for eixo, passo in ((-1, estado.dx), (-2, estado.dy)):
+                derivada(potencial, eixo, passo, out=ws.tmp)
+                v_max = max(v_max, float(np.max(np.abs(ws.tmp))))
+            if v_max > 0:
+                limite = min(limite, self.cfl * h / (coef * v_max))
+
+        D_max = max(float(np.max(np.abs(D))) for D in (p.D_K, p.D_H, p.D_A, p.D_P))
+        if D_max > 0:
+            limite = min(limite, self.numero_difusao * estado.dx * estado.dy / D_max)
+        return limite
+
+    def passo(self, estado: Estado, t_limite=None):
+        """
+        Avança um passo aceito (repetindo as tentativas rejeitadas) e
+        retorna o dt usado. `t_limite` impede que o passo ultrapasse esse tempo.
+        """
+        y0, k1, erro = self._preparar(estado)
+        y = estado.prognosticos
+        np.copyto(y0, y)
+        if not self._k1_valido:
+            ws = self._avaliar(estado, k1)
+            if self.dinamica.diagnostico is not None:
+                self.dinamica.diagnostico(estado, ws)
+            # W e U ainda são os de y0; o preditor os sobrescreve
+            self._estavel = self.dt_estavel(estado)
+            self._k1_valido = True
+
+        while True:
+            dt = self.dt
+            if self._estavel < dt:
+                dt = self._estavel
+                self.limitados += 1
+            if self.dt_max is not None:
+                dt = min(dt, self.dt_max)
+            dt = max(dt, self.dt_min)
+            cortado = False
+            if t_limite is not None:
+                # Por último: nunca ultrapassar t_limite (em ensemble, t é um array)
+                restante = float(np.min(t_limite - estado.t))
+                cortado = restante < dt
+                dt = min(dt, restante)
+
+            # Preditor de Euler (com a mesma garantia de não-negatividade do passo)
+            np.multiply(k1, dt, out=erro)
+            np.add(y0, erro, out=y)
+            np.maximum(y, 0, out=y)
+            ws = self.dinamica.tendencias(estado)
+            self.avaliacoes += 1
+            k2 = ws.derivadas
+
+            # Heun: y0 + dt/2 (k1 + k2); erro local = dt/2 (k2 - k1)
+            np.subtract(k2, k1, out=erro)
+            erro *= 0.5 * dt
+            np.add(k1, k2, out=y)
+            y *= 0.5 * dt
+            y += y0
+            norma = self._norma(erro, y0, y, ws.tmp)
+
+            if norma <= 1.0:
+                np.maximum(y, 0, out=y)
+                estado.avancar_tempo(dt)
+                self.aceitos += 1
+                self._k1_valido = False
+                # Um passo encurtado para chegar a t_limite não reduz a proposta seguinte
+                proposta = self.dt
+                self.dt = dt * self._fator(norma)
+                if cortado:
+                    self.dt = max(self.dt, proposta)
+                return dt
+
+            # Rejeitado: restaurar o estado e reduzir o passo
+            np.copyto(y, y0)
+            self.rejeitados += 1
+            if dt <= self.dt_min:
+                raise FloatingPointError(f"Passo mínimo ({self.dt_min}) não atinge a tolerância")
+            self.dt = max(dt * self._fator(norma), self.dt_min)
+
+    def _norma(self, erro, y0, y, tmp):
+        """Norma RMS do erro ponderada por atol + rtol max(|y0|, |y|), campo a campo."""
+        soma = 0.0
+        for e, a, b in zip(erro, y0, y):
+            np.abs(a, out=tmp)
+            np.maximum(tmp, np.abs(b), out=tmp)
+            tmp *= self.rtol
+            tmp += self.atol
+            np.divide(e, tmp, out=tmp)
+            soma += float(np.vdot(tmp, tmp))
+        norma = np.sqrt(soma / erro.size)
+        return norma if np.isfinite(norma) else np.inf
+
+    def _fator(self, norma):
+        if norma == 0:
+            return self.fator_max
+        return min(self.fator_max, max(self.fator_min, self.seguranca * norma ** -0.5))
+
+    def avancar_ate(self, estado: Estado, t_final):
+        """Integra até o tempo `t_final` e retorna o número de passos aceitos."""
+        aceitos = 0
+        while float(np.min(t_final - estado.t)) > 1e-12 * max(1.0, abs(t_final)):
+            self.passo(estado, t_limite=t_final)
+            aceitos += 1
+        return aceitos
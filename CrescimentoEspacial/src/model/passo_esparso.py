@@ -0,0 +1,230 @@
+from dataclasses import replace
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .estado import Estado, CAMPOS, N_PROGNOSTICOS
+from .dinamica import Dinamica
+
+# Largura do halo de cada bloco: a divergência do fluxo de migração aplica
+# duas derivadas centrais seguidas, que juntas alcançam duas células
+HALO = 2
+
+_DERIVADOS = slice(CAMPOS.index('Y'), len(CAMPOS))
+
+
+class _SpilloverJanelas:
+    """Substitui o spillover da dinâmica do lote: copia as janelas do campo global já convoluído."""
+    def __init__(self, janelas):
+        self.janelas = janelas
+
+    def aplicar(self, Z, out=None, dtype=None):
+        np.copyto(out, self.janelas)
+        return out
+
+
+class PassoEsparso:
+    """
+    Passo de Euler explícito que só avalia os blocos da grade ainda ativos.
+
+    A grade é dividida em blocos de `tamanho_bloco` células. Um bloco é ativo
+    quando alguma derivada (dK, dH, dA, dP ou dL) passou de `tol` no último
+    passo em que foi avaliado; os demais ficam congelados. A máscara ativa é
+    dilatada por `dilatacao` blocos, para que frentes de difusão e migração
+    avancem para os vizinhos e os reativem. Os blocos ativos (com um halo
+    de HALO células, ou encostados na borda do domínio) são avaliados juntos
+    como um lote de `lote` janelas; em cada bloco, o resultado é o de
+    `Dinamica.passo` na grade inteira (a menos do arredondamento de log/exp
+    vetorizados, que depende do tamanho do array).
+
+    A convolução de spillover é global: é recalculada a cada passo ou, com
+    `tol_spillover`, só quando A mudou mais que isso desde o último cálculo
+    (blocos onde chi * spillover variou mais que `tol` são reativados). A
+    cada `revisao` passos é dado um passo completo, que reavalia todos os
+    blocos.
+
+    Só o integrador 'euler' é suportado (a difusão implícita do IMEX é
+    global), sem ensemble e sem a soma compensada do modo 'misto'.
+    """
+    def __init__(self, dinamica: Dinamica, tamanho_bloco=32, tol=1e-6, dilatacao=1,
+                 revisao=100, tol_spillover=None, lote=16):
+        p = dinamica.p
+        if p.integrador != 'euler':
+            raise ValueError("PassoEsparso só suporta o integrador 'euler'")
+        if p.n_membros() is not None:
+            raise ValueError("PassoEsparso não suporta modo ensemble")
+        if p.precisao == 'misto':
+            raise ValueError("PassoEsparso não suporta a precisão 'misto'")
+        self.dinamica = dinamica
+        self.tamanho_bloco = tamanho_bloco
+        self.tol = tol
+        self.dilatacao = dilatacao
+        self.revisao = revisao
+        self.tol_spillover = tol_spillover
+        self.lote = lote
+
+        # Estatísticas
+        self.passos = 0
+        self.passos_completos = 0
+        self.blocos_avaliados = 0
+        self.blocos_pulados = 0
+        self.recalculos_spillover = 0
+
+        self._forma = None
+
+    # ------------------------------------------------------------------
+    # Geometria dos blocos
+    # ------------------------------------------------------------------
+    def _inicios(self, n, t):
+        """Início dos blocos ao longo de um eixo (o último é recuado para caber)."""
+        inicios = list(range(0, n - t, t)) + [n - t]
+        return np.array(sorted(set(inicios)))
+
+    def _preparar(self, estado: Estado):
+        forma = estado.K.shape
+        if self._forma == forma:
+            return
+        self._forma = forma
+        t = self.tamanho_bloco
+        janela = t + 2 * HALO
+        # Grade pequena demais para janelas com halo: só passos completos
+        self._esparso = all(n >= janela for n in forma)
+        if not self._esparso:
+            return
+        self._blocos = [self._inicios(n, t) for n in forma]
+        # Janela de cada bloco: halo dos dois lados, ou encostada na borda do
+        # domínio (onde os operadores já aplicam o contorno da grade inteira).
+        # O último bloco, recuado, só escreve as células que o anterior não cobre.
+        self._janelas = [np.clip(b - HALO, 0, n - janela) for b, n in zip(self._blocos, forma)]
+        self._faixas = []
+        for b, j in zip(self._blocos, self._janelas):
+            escrita = np.maximum(b, np.concatenate([[0], b[:-1] + t]))
+            # Por bloco: (início da janela, fatia na janela, fatia no bloco, fatia na grade)
+            self._faixas.append([(int(jj), slice(e - jj, bb + t - jj), slice(e - bb, t), slice(e, bb + t))
+                                 for bb, jj, e in zip(b.tolist(), j.tolist(), escrita.tolist())])
+        n0, n1 = len(self._blocos[0]), len(self._blocos[1])
+        self.atividade = np.full((n0, n1), np.inf)
+        self._derivadas = np.empty((N_PROGNOSTICOS, n0 * n1, t, t), dtype=estado.dados.dtype)
+        self._spillover = np.empty(forma, dtype=estado.dados.dtype)
+        self._spillover_anterior = np.empty_like(self._spillover)
+        self._variacao_A = 0.0
+
+        p = replace(self.dinamica.p, Nx=janela, Ny=janela)
+        self._estado_lote = Estado(p, lote=self.lote)
+        self._estado_lote.dx, self._estado_lote.dy = estado.dx, estado.dy
+        self._dinamica_lote = Dinamica(p)
+        self._dinamica_lote.kernel_spillover = None
+        self._janelas_spillover = np.empty((self.lote, janela, janela), dtype=estado.dados.dtype)
+        self._dinamica_lote.spillover = _SpilloverJanelas(self._janelas_spillover)
+
+    def _maximo_por_bloco(self, Z):
+        """max(Z) em cada bloco (Z tem a forma da grade)."""
+        t = self.tamanho_bloco
+        blocos = sliding_window_view(Z, (t, t))[np.ix_(*self._blocos)]
+        return blocos.max(axis=(-2, -1))
+
+    # ------------------------------------------------------------------
+    # Passos
+    # ------------------------------------------------------------------
+    def _passo_completo(self, estado: Estado):
+        dinamica = self.dinamica
+        ws = dinamica.tendencias(estado)
+        if self._esparso:
+            np.abs(ws.derivadas).max(axis=0, out=ws.tmp)
+            self.atividade = self._maximo_por_bloco(ws.tmp)
+            # O spillover copiado é o de A antes do passo; a atualização abaixo
+            # ainda muda A em até max|dA| dt, que conta para o próximo recálculo
+            np.copyto(self._spillover, ws.spillover)
+            np.abs(ws.dA, out=ws.tmp)
+            self._variacao_A = float(ws.tmp.max()) * float(dinamica._coef.dt)
+        dinamica._atualizar(estado, ws)
+        self.passos_completos += 1
+
+    def _atualizar_spillover(self, estado: Estado):
+        """Recalcula a convolução global quando A mudou mais que `tol_spillover`."""
+        # _variacao_A (soma dos maiores incrementos de A) limita quanto A mudou
+        # desde o último cálculo
+        if self.tol_spillover is not None and self._variacao_A <= self.tol_spillover:
+            return
+        anterior = self._spillover_anterior
+        np.copyto(anterior, self._spillover)
+        self.dinamica.spillover.aplicar(estado.A, out=self._spillover, dtype=np.float64)
+        self._variacao_A = 0.0
+        self.recalculos_spillover += 1
+        # Blocos onde o termo chi * spillover mudou além de tol voltam a ser ativos
+        anterior -= self._spillover
+        np.abs(anterior, out=anterior)
+        anterior *= np.max(np.abs(self.dinamica.p.chi))
+        mudou = self._maximo_por_bloco(anterior) > self.tol
+        self.atividade[mudou] = np.inf
+
+    def _passo_esparso(self, estado: Estado):
+        ativos = self.atividade > self.tol
+        if self.dilatacao:
+            from scipy import ndimage
+            ativos = ndimage.binary_dilation(ativos, np.ones((3, 3), bool), self.dilatacao)
+        k0, k1 = np.nonzero(ativos)
+        m = len(k0)
+        self.blocos_avaliados += m
+        self.blocos_pulados += ativos.size - m
+        if m:
+            self._avaliar(estado, k0, k1)
+        estado.avancar_tempo(self.dinamica.p.dt)
+
+    def _avaliar(self, estado: Estado, k0, k1):
+        janela = self.tamanho_bloco + 2 * HALO
+        self._atualizar_spillover(estado)
+        dinamica, local = self._dinamica_lote, self._estado_lote
+        dinamica.p = self.dinamica.p
+        dinamica.perfilador = self.dinamica.perfilador
+        faixas = [(self._faixas[0][i], self._faixas[1][j]) for i, j in zip(k0.tolist(), k1.tolist())]
+        derivadas = self._derivadas
+        dados = estado.dados
+
+        for a in range(0, len(faixas), self.lote):
+            lote = faixas[a:a + self.lote]
+            for m, ((j0, _, _, _), (j1, _, _, _)) in enumerate(lote):
+                local.dados[:, m] = dados[:, j0:j0 + janela, j1:j1 + janela]
+                self._janelas_spillover[m] = self._spillover[j0:j0 + janela, j1:j1 + janela]
+            ws = dinamica.tendencias(local)
+            for m, ((_, w0, b0, g0), (_, w1, b1, g1)) in enumerate(lote):
+                derivadas[:, a + m, b0, b1] = ws.derivadas[:, m, w0, w1]
+                # Campos derivados (Y, W, U) do bloco, para visualização
+                dados[_DERIVADOS, g0, g1] = local.dados[_DERIVADOS, m, w0, w1]
+
+        # Euler nos blocos avaliados (todos a partir do estado anterior ao passo)
+        dt = dinamica._coef.dt
+        prognosticos = estado.prognosticos
+        variacao_A = 0.0
+        for m, ((_, _, b0, g0), (_, _, b1, g1)) in enumerate(faixas):
+            d = derivadas[:, m, b0, b1]
+            d *= dt
+            campo = prognosticos[:, g0, g1]
+            campo += d
+            np.maximum(campo, 0, out=campo)
+            np.abs(d, out=d)
+            self.atividade[k0[m], k1[m]] = d.max() / dt
+            variacao_A = max(variacao_A, float(d[2].max()))
+        self._variacao_A += variacao_A
+
+    def passo(self, estado: Estado):
+        """Avança um passo de tempo, avaliando só os blocos ativos."""
+        if self.dinamica.diagnostico is not None:
+            raise ValueError("PassoEsparso não suporta Dinamica.diagnostico (os blocos "
+                             "congelados não são avaliados); use Dinamica.passo")
+        self._preparar(estado)
+        if not self._esparso or self.passos % self.revisao == 0:
+            self._passo_completo(estado)
+        else:
+            self._passo_esparso(estado)
+        self.passos += 1
+
+    def estatisticas(self):
+        """Contadores e fração de blocos pulados nos passos esparsos."""
+        total = self.blocos_avaliados + self.blocos_pulados
+        return {
+            'passos': self.passos,
+            'passos_completos': self.passos_completos,
+            'blocos': int(np.size(self.atividade)) if self._forma and self._esparso else 0,
+            'blocos_ativos': int(np.sum(self.atividade > self.tol)) if self._forma and self._esparso else 0,
+            'fracao_pulada': self.blocos_pulados / total if total else 0.0,
+            'recalculos_spillover': self.recalculos_spillover,
+        }
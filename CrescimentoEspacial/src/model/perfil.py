@@ -0,0 +1,115 @@
+import contextlib
+import threading
+import time
+import tracemalloc
+
+# Contexto vazio usado quando não há perfilador: o custo da instrumentação
+# desligada é um teste `is None` e um `with` sem efeito por etapa
+NULO = contextlib.nullcontext()
+
+
+class _Medicao:
+    __slots__ = ('chamadas', 'tempo', 'bytes')
+
+    def __init__(self):
+        self.chamadas = 0
+        self.tempo = 0.0
+        self.bytes = 0  # maior pico de memória alocada dentro da etapa
+
+
+class Perfilador:
+    """
+    Mede tempo de parede, chamadas e (com `memoria=True`) pico de bytes
+    alocados por etapa nomeada.
+
+    As etapas podem ser aninhadas; o nome registrado é o caminho completo
+    ('passo/tendencias/tecnologia/spillover'). A memória é medida com
+    `tracemalloc`, que é iniciado pelo perfilador se ainda não estiver ativo e
+    deixa o código mais lento: use-a para contar alocações, não junto com as
+    medições de tempo.
+    """
+    def __init__(self, memoria=False):
+        self.memoria = memoria
+        self._medicoes = {}
+        self._pilha = []
+        self._trava = threading.Lock()
+        self._iniciou_tracemalloc = False
+        if memoria and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._iniciou_tracemalloc = True
+
+    @contextlib.contextmanager
+    def etapa(self, nome):
+        caminho = self._pilha[-1][0] + '/' + nome if self._pilha else nome
+        medicao = self._medicoes.get(caminho)
+        if medicao is None:
+            # Registrada na entrada, para o relatório listar pais antes dos filhos
+            with self._trava:
+                medicao = self._medicoes.setdefault(caminho, _Medicao())
+        if self.memoria:
+            atual, pico = tracemalloc.get_traced_memory()
+            if self._pilha:
+                self._pilha[-1][2] = max(self._pilha[-1][2], pico)
+            tracemalloc.reset_peak()
+            entrada = [caminho, atual, atual]
+        else:
+            entrada = [caminho, 0, 0]
+        self._pilha.append(entrada)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            decorrido = time.perf_counter() - inicio
+            self._pilha.pop()
+            alocado = 0
+            if self.memoria:
+                pico = max(entrada[2], tracemalloc.get_traced_memory()[1])
+                alocado = pico - entrada[1]
+                if self._pilha:
+                    self._pilha[-1][2] = max(self._pilha[-1][2], pico)
+                tracemalloc.reset_peak()
+            with self._trava:
+                medicao.chamadas += 1
+                medicao.tempo += decorrido
+                medicao.bytes = max(medicao.bytes, alocado)
+
+    def relatorio(self):
+        """
+        Dicionário caminho -> {'chamadas', 'tempo_total', 'tempo_medio',
+        'fracao', 'bytes'}, na ordem de primeira execução. `fracao` é relativa
+        ao tempo da etapa-raiz correspondente; `bytes` é None sem `memoria`.
+        """
+        with self._trava:
+            itens = [(c, m.chamadas, m.tempo, m.bytes) for c, m in self._medicoes.items() if m.chamadas]
+        raizes = {c: t for c, _, t, _ in itens if '/' not in c}
+        relatorio = {}
+        for caminho, chamadas, tempo, alocado in itens:
+            total_raiz = raizes.get(caminho.split('/')[0], 0.0)
+            relatorio[caminho] = {
+                'chamadas': chamadas,
+                'tempo_total': tempo,
+                'tempo_medio': tempo / chamadas,
+                'fracao': tempo / total_raiz if total_raiz > 0 else 0.0,
+                'bytes': alocado if self.memoria else None,
+            }
+        return relatorio
+
+    def tabela(self):
+        """Relatório formatado como texto."""
+        linhas = [f"{'etapa':<36}{'chamadas':>10}{'ms/chamada':>12}{'%':>8}{'bytes':>12}"]
+        for caminho, m in self.relatorio().items():
+            nome = '  ' * caminho.count('/') + caminho.rsplit('/', 1)[-1]
+            alocado = '-' if m['bytes'] is None else str(m['bytes'])
+            linhas.append(f"{nome:<36}{m['chamadas']:>10}{1e3 * m['tempo_medio']:>12.3f}"
+                          f"{100 * m['fracao']:>8.1f}{alocado:>12}")
+        return '\n'.join(linhas)
+
+    def zerar(self):
+        with self._trava:
+            self._medicoes.clear()
+
+    def encerrar(self):
+        """Para o tracemalloc se foi o perfilador que o iniciou."""
+        if self._iniciou_tracemalloc:
+            tracemalloc.stop()
+            self._iniciou_tracemalloc = False
@@ -0,0 +1,70 @@
+"""
+Transferência de campos entre grades de resoluções diferentes.
+
+As grades são tratadas como células de mesmo tamanho cobrindo o mesmo
+domínio, de modo que a razão entre resoluções pode ser qualquer (não só 2).
+Ambos os operadores são conservativos: a integral de cada campo (soma dos
+valores vezes a área da célula) é preservada. Como `operadores`, atuam nos
+dois últimos eixos e servem para uma grade, um lote ou o bloco `Estado.dados`.
+As matrizes de cada par de resoluções ficam no `cache` do processo.
+"""
+import numpy as np
+from . import cache
+
+
+def _matriz_restricao(n_fino, n_grosso):
+    """(n_grosso, n_fino): média das células finas ponderada pela sobreposição."""
+    def construir():
+        fino = np.linspace(0.0, 1.0, n_fino + 1)
+        grosso = np.linspace(0.0, 1.0, n_grosso + 1)
+        inicio = np.maximum(grosso[:-1, None], fino[None, :-1])
+        fim = np.minimum(grosso[1:, None], fino[None, 1:])
+        return np.clip(fim - inicio, 0.0, None) * n_grosso
+    return cache.obter('restricao', (n_fino, n_grosso), construir)
+
+
+def _matrizes_prolongamento(n_grosso, n_fino):
+    """
+    Interpolação linear entre centros de células (extrapolada linearmente
+    até a borda) e a correção G = R^T (R R^T)^-1, que restaura exatamente as
+    médias grossas.
+    """
+    def construir():
+        # Centros grossos com uma célula-fantasma de cada lado
+        centros_grossos = (np.arange(-1, n_grosso + 1) + 0.5) / n_grosso
+        centros_finos = (np.arange(n_fino) + 0.5) / n_fino
+        base = np.eye(n_grosso)
+        base = np.vstack([2 * base[0] - base[min(1, n_grosso - 1)], base,
+                          2 * base[-1] - base[max(n_grosso - 2, 0)]])
+        I = np.stack([np.interp(centros_finos, centros_grossos, e) for e in base.T], axis=1)
+        R = _matriz_restricao(n_fino, n_grosso)
+        G = np.linalg.solve(R @ R.T, R).T
+        return (I, G)
+    I, G = cache.obter('prolongamento', (n_grosso, n_fino), construir)
+    return I, _matriz_restricao(n_fino, n_grosso), G
+
+
+def _aplicar(M0, Z, M1):
+    """M0 @ Z @ M1^T nos dois últimos eixos."""
+    return np.matmul(np.matmul(M0, Z), M1.T)
+
+
+def restringir(Z, forma):
+    """Média conservativa de Z (..., n0, n1) para a grade mais grossa `forma`."""
+    n0, n1 = Z.shape[-2:]
+    return _aplicar(_matriz_restricao(n0, forma[0]), Z, _matriz_restricao(n1, forma[1]))
+
+
+def prolongar(Z, forma):
+    """
+    Interpola Z (..., n0, n1) para a grade mais fina `forma`.
+
+    A interpolação bilinear é corrigida para que a restrição do resultado
+    devolva Z exatamente (prolongamento conservativo).
+    """
+    n0, n1 = Z.shape[-2:]
+    I0, R0, G0 = _matrizes_prolongamento(n0, forma[0])
+    I1, R1, G1 = _matrizes_prolongamento(n1, forma[1])
+    fino = _aplicar(I0, Z, I1)
+    fino += _aplicar(G0, Z - _aplicar(R0, fino, R1), G1)
+    return fino
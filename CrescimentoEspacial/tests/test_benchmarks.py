@@ -0,0 +1,41 @@
+import unittest
+import sys
+import os
+
+# Adicionar diretório raiz ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.desempenho import medir, comparar, SENTIDO
+from benchmarks.precisao import validar
+
+class TestBenchmarks(unittest.TestCase):
+    def test_medir_grade_pequena(self):
+        resultado = medir([12], tempo_min=0.001, repeticoes=1, visualizacao=False)
+        metricas = resultado['resultados']['12']
+        self.assertEqual(set(metricas), set(SENTIDO))
+        self.assertGreater(metricas['passos_por_segundo'], 0)
+        self.assertGreater(metricas['pico_memoria_primeiro_passo'], metricas['pico_memoria_passo'])
+        self.assertIsNone(metricas['tempo_visualizacao'])
+
+    def test_comparar_respeita_sentido_e_limite(self):
+        base = {'resultados': {'64': {'passos_por_segundo': 100.0, 'tempo_spillover': 1.0,
+                                      'tempo_migracao': 1.0}}}
+        atual = {'resultados': {'64': {'passos_por_segundo': 80.0, 'tempo_spillover': 1.1,
+                                       'tempo_migracao': 0.5, 'tempo_visualizacao': None},
+                                '128': {'passos_por_segundo': 1.0}}}
+        regressoes = comparar(atual, base, limite=0.15)
+        self.assertEqual([r['metrica'] for r in regressoes], ['passos_por_segundo'])
+        self.assertAlmostEqual(regressoes[0]['variacao'], -0.2)
+        self.assertEqual(len(comparar(atual, base, limite=0.05)), 2)
+
+    def test_validar_precisao(self):
+        resultado = validar(12, passos=6, intervalo=3, integrador='euler')
+        self.assertEqual(set(resultado['resultados']), {'float64', 'float32', 'misto'})
+        misto = resultado['resultados']['misto']
+        self.assertEqual([d['passo'] for d in misto['desvio']], [3, 6])
+        self.assertLess(misto['desvio'][-1]['campos']['K']['max_rel'], 1e-5)
+        self.assertEqual(misto['bytes_estado'] * 2, resultado['resultados']['float64']['bytes_estado'])
+        self.assertTrue(misto['finito'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,491 @@
+import unittest
+import tempfile
+import subprocess
+import contextlib
+import io
+import json
+import numpy as np
+import sys
+import os
+import time
+import asyncio
+import threading
+import socket
+
+# Adicionar diretório raiz ao path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.model.parametros import Parametros
+from src.model.estado import Estado
+from src.model.dinamica import Dinamica
+from src.model.perfil import Perfilador
+from src.execucao.varredura import Varredura, executar_simulacao, CAMPOS_SAIDA
+from src.execucao.trabalhador import TrabalhadorSimulacao, BufferQuadros
+from src.execucao.gravacao import GravadorTrajetoria, LeitorTrajetoria
+from src.execucao.decomposicao import DecomposicaoDominio
+from src.execucao.multiresolucao import Multiresolucao
+from src.execucao.controle import ControladorExecucao, Evento, carregar_checkpoint
+from src.execucao.servidor import (ServidorSimulacao, ClienteSimulacao, CodificadorQuadros,
+                                   DecodificadorQuadros, FilaCliente)
+
+class TestVarredura(unittest.TestCase):
+    def setUp(self):
+        self.base = Parametros(Nx=12, Ny=10)
+        self.grade = {'s_rate': [0.1, 0.3], 'mu': [0.02, 0.05]}
+
+    def _referencia(self, varredura, indice):
+        from dataclasses import replace
+        params = replace(self.base, **varredura.combinacoes[indice])
+        return executar_simulacao(params, varredura.passos, varredura.semente + indice)
+
+    def test_resultados_iguais_a_execucao_direta(self):
+        """Os resultados do pool coincidem com execuções sequenciais equivalentes."""
+        varredura = Varredura(self.grade, passos=5, base=self.base)
+        resultado = varredura.executar(processos=2)
+        self.assertTrue(resultado.concluidos.all())
+        self.assertEqual(resultado.resumos.shape, (4, 5, len(CAMPOS_SAIDA)))
+        for i in range(4):
+            estado = self._referencia(varredura, i)
+            np.testing.assert_array_equal(resultado.campo(i, 'K'), estado.K)
+            np.testing.assert_array_equal(resultado.campo(i, 'Y'), estado.Y)
+            self.assertAlmostEqual(resultado.resumos[i, -1, CAMPOS_SAIDA.index('P')], estado.P.mean())
+
+    def test_retomar_varredura(self):
+        """Uma varredura interrompida só reexecuta as combinações pendentes."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            varredura = Varredura(self.grade, passos=3, base=self.base, diretorio=diretorio)
+            completo = varredura.executar(processos=2)
+
+            # Simular interrupção: duas execuções perdidas
+            concluidos = np.load(os.path.join(diretorio, 'concluidos.npy'), mmap_mode='r+')
+            concluidos[[1, 3]] = 0
+            concluidos.flush()
+            del concluidos
+            self.assertEqual(varredura.pendentes(), [1, 3])
+
+            retomado = Varredura(self.grade, passos=3, base=self.base, diretorio=diretorio).executar(processos=2)
+            np.testing.assert_array_equal(retomado.campos, completo.campos)
+            self.assertEqual(varredura.pendentes(), [])
+
+            with self.assertRaises(ValueError):
+                Varredura(self.grade, passos=4, base=self.base, diretorio=diretorio).executar()
+
+    def test_parada_por_convergencia(self):
+        base = Parametros(Nx=12, Ny=10, sigma=1.5, chi=0.005, integrador='imex', dt=2.0)
+        varredura = Varredura({'s_rate': [0.2, 0.25]}, passos=2000, base=base, tol=1e-5, intervalo=20)
+        resultado = varredura.executar(processos=2)
+        executados = resultado.passos_executados()
+        self.assertTrue(np.all(executados < 2000))
+        for i, n in enumerate(executados):
+            self.assertTrue(np.all(np.isnan(resultado.resumos[i, n:])))
+            self.assertAlmostEqual(resultado.resumos[i, n - 1, CAMPOS_SAIDA.index('K')],
+                                   resultado.campo(i, 'K').mean())
+
+    def test_campos_nao_numericos_e_semente_local(self):
+        varredura = Varredura({'integrador': ['euler', 'imex'], 's_rate': ['0.2']}, passos=3, base=self.base)
+        self.assertEqual(varredura.combinacoes, [{'integrador': 'euler', 's_rate': 0.2},
+                                                 {'integrador': 'imex', 's_rate': 0.2}])
+        np.random.seed(7)
+        esperado = np.random.random()
+        np.random.seed(7)
+        resultado = varredura.executar(processos=1)
+        for i in range(2):
+            np.testing.assert_array_equal(resultado.campo(i, 'K'), self._referencia(varredura, i).K)
+        self.assertEqual(np.random.random(), esperado)  # gerador global intacto
+
+    def test_geometria_nao_varre(self):
+        with self.assertRaises(ValueError):
+            Varredura({'Nx': [10, 20]}, passos=1)
+
+
+class TestTrabalhador(unittest.TestCase):
+    def test_buffer_entrega_quadro_mais_recente(self):
+        """O leitor recebe só o último quadro publicado, e None sem novidades."""
+        params = Parametros(Nx=8, Ny=6)
+        estado = Estado(params)
+        buffer = BufferQuadros(estado.K.shape)
+        self.assertIsNone(buffer.ler())
+        for passo in range(1, 4):
+            estado.K[...] = passo
+            buffer.publicar(estado, passo)
+        quadro = buffer.ler()
+        self.assertEqual(quadro.passo, 3)
+        np.testing.assert_array_equal(quadro.K, 3.0)
+        self.assertIsNone(buffer.ler())
+        # Publicações seguintes não alteram o quadro em leitura
+        estado.K[...] = 9
+        buffer.publicar(estado, 4)
+        np.testing.assert_array_equal(quadro.K, 3.0)
+
+    def test_trabalhador_aplica_parametros_entre_passos(self):
+        """A thread avança a simulação e aplica alterações de parâmetros."""
+        params = Parametros(Nx=10, Ny=10)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        trabalhador = TrabalhadorSimulacao(Dinamica(params), estado, intervalo_publicacao=0.0)
+        trabalhador.start()
+        trabalhador.atualizar_parametro('s_rate', 0.42)
+        perfilador = Perfilador()
+        trabalhador.agendar(lambda: setattr(trabalhador.dinamica, 'perfilador', perfilador))
+        trabalhador.retomar()
+        inicio = time.perf_counter()
+        while trabalhador.passos < 5 and time.perf_counter() - inicio < 10:
+            time.sleep(0.01)
+        trabalhador.encerrar()
+        self.assertFalse(trabalhador.is_alive())
+        self.assertGreaterEqual(trabalhador.passos, 5)
+        self.assertEqual(params.s_rate, 0.42)
+        self.assertIs(trabalhador.dinamica.perfilador, perfilador)
+        self.assertEqual(perfilador.relatorio()['passo']['chamadas'], trabalhador.passos)
+        quadro = trabalhador.buffer.ler()
+        self.assertEqual(quadro.passo, trabalhador.passos)
+        np.testing.assert_array_equal(quadro.Y, estado.Y)
+
+class TestGravacao(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=9, Ny=7)
+        np.random.seed(3)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+        self.dinamica = Dinamica(self.params)
+
+    def _gravar(self, diretorio, passos, **opcoes):
+        referencia = {}
+        with GravadorTrajetoria(diretorio, **opcoes) as gravador:
+            for passo in range(1, passos + 1):
+                self.dinamica.passo(self.estado)
+                gravador(self.estado, passo)
+                referencia[passo] = (self.estado.K.copy(), self.estado.Y.copy())
+        return referencia
+
+    def test_gravar_e_reproduzir(self):
+        """Os quadros lidos (em vários blocos) coincidem com a simulação."""
+        with tempfile.TemporaryDirectory() as diretorio:
+            referencia = self._gravar(diretorio, 10, intervalo=2, passos_por_bloco=3,
+                                      dtype='float64', buffers=2)
+            leitor = LeitorTrajetoria(diretorio)
+            self.assertEqual(list(leitor.passos), [2, 4, 6, 8, 10])
+            for i, passo in enumerate(leitor.passos):
+                quadro = leitor.quadro(i)
+                np.testing.assert_array_equal(quadro.K, referencia[passo][0])
+                np.testing.assert_array_equal(quadro.Y, referencia[passo][1])
+            self.assertEqual(leitor.buscar(7).passo, 6)
+            serie = leitor.serie('K', 1, 5)
+            self.assertEqual(serie.shape, (4, 9, 7))
+            np.testing.assert_array_equal(serie[-1], referencia[10][0])
+
+    def test_compressao_float16(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            referencia = self._gravar(diretorio, 4, dtype='float16', passos_por_bloco=64)
+            leitor = LeitorTrajetoria(diretorio)
+            self.assertEqual(len(leitor), 4)
+            self.assertEqual(leitor.dados(-1).dtype, np.float16)
+            np.testing.assert_allclose(leitor.quadro(-1).K, referencia[4][0], rtol=1e-3)
+
+    def test_float16_fora_da_faixa(self):
+        with tempfile.TemporaryDirectory() as diretorio:
+            gravador = GravadorTrajetoria(diretorio, dtype='float16', passos_por_bloco=1)
+            gravador(self.estado, 1)
+            self.estado.K[0, 0] = 1e5
+            with self.assertRaises(ValueError):
+                gravador(self.estado, 2)
+            gravador.fechar()
+            leitor = LeitorTrajetoria(diretorio)
+            self.assertEqual(list(leitor.passos), [1])
+            self.assertFalse(os.path.exists(os.path.join(diretorio, 'indice.npy.tmp')))
+
+class TestDecomposicao(unittest.TestCase):
+    def _comparar(self, params, passos=5, processos=3):
+        np.random.seed(11)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        referencia = Estado(params)
+        referencia.dados[...] = estado.dados
+        dinamica = Dinamica(params)
+        for _ in range(passos):
+            dinamica.passo(referencia)
+        with DecomposicaoDominio(params, processos=processos) as decomposicao:
+            decomposicao.avancar(estado, passos - 2)
+            decomposicao.avancar(estado, 2)
+        np.testing.assert_array_equal(estado.dados, referencia.dados)
+        self.assertAlmostEqual(estado.t, referencia.t)
+
+    def test_identico_ao_processo_unico(self):
+        """As faixas com halo e o spillover distribuído reproduzem o passo serial bit a bit."""
+        self._comparar(Parametros(Nx=26, Ny=18))
+        self._comparar(Parametros(Nx=26, Ny=18, contorno_spillover='periodico'))
+
+    def test_identico_ao_processo_unico_imex(self):
+        self._comparar(Parametros(Nx=22, Ny=20, integrador='imex', dt=0.3), processos=2)
+
+    def test_geometria_fixa(self):
+        params = Parametros(Nx=12, Ny=12)
+        estado = Estado(params)
+        with DecomposicaoDominio(params, processos=2) as decomposicao:
+            params.integrador = 'imex'
+            with self.assertRaises(ValueError):
+                decomposicao.avancar(estado)
+
+class TestMultiresolucao(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=40, Ny=30, sigma=1.5, chi=0.005, integrador='imex', dt=1.0)
+        np.random.seed(6)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+
+    def test_formas_e_orcamentos(self):
+        multi = Multiresolucao(self.params, niveis=3, tempos=[5.0, 3.0, 2.0])
+        self.assertEqual(multi.formas(), [(10, 8), (20, 15), (40, 30)])
+        relatorio = multi.executar(self.estado)
+        self.assertEqual([r['passos'] for r in relatorio], [5, 3, 2])
+        self.assertAlmostEqual(self.estado.t, 10.0)
+        self.assertTrue(np.isfinite(self.estado.dados).all())
+        with self.assertRaises(ValueError):
+            Multiresolucao(self.params, niveis=3, tempos=[1.0, 2.0])
+
+    def test_converge_ao_mesmo_estado(self):
+        """A partida a quente chega ao mesmo equilíbrio da integração só na grade fina."""
+        referencia = Estado(self.params)
+        referencia.dados[...] = self.estado.dados
+        Multiresolucao(self.params, niveis=1, tol=1e-6, intervalo=25).executar(referencia)
+        relatorio = Multiresolucao(self.params, niveis=3, tol=1e-6, intervalo=25).executar(self.estado)
+        self.assertLess(relatorio[-1]['residuo'], 1e-6)
+        np.testing.assert_allclose(self.estado.prognosticos, referencia.prognosticos, rtol=1e-6)
+
+class TestControle(unittest.TestCase):
+    def _estado(self, params):
+        np.random.seed(2)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        return estado
+
+    def test_convergencia(self):
+        params = Parametros(Nx=16, Ny=12, sigma=1.5, chi=0.005, integrador='imex', dt=2.0)
+        estado = self._estado(params)
+        resultado = ControladorExecucao(Dinamica(params), intervalo=20, tol=1e-6).executar(estado, 5000)
+        self.assertEqual(resultado.motivo, 'convergencia')
+        self.assertLess(resultado.passos, 5000)
+        self.assertLessEqual(resultado.variacao, 1e-6)
+        np.testing.assert_allclose(estado.K, 94.2587, rtol=1e-4)
+
+    def test_divergencia_reduz_dt(self):
+        # Euler explícito instável pela difusão de H: dt * D_H / dx^2 > 1/4
+        params = Parametros(Nx=16, Ny=12, sigma=1.5, chi=0.005, dt=1.0, D_H=20.0)
+        estado = self._estado(params)
+        controlador = ControladorExecucao(Dinamica(params), intervalo=10)
+        with np.errstate(all='ignore'):
+            resultado = controlador.executar(estado, 200)
+        self.assertEqual(resultado.motivo, 'divergencia')
+        self.assertTrue(np.all(np.isfinite(estado.dados)))  # estado da última verificação
+
+        estado = self._estado(params)
+        dinamica = Dinamica(params)
+        with np.errstate(all='ignore'):
+            resultado = ControladorExecucao(dinamica, intervalo=10, ao_divergir='reduzir_dt').executar(estado, 200)
+        self.assertEqual(resultado.motivo, 'passos')
+        self.assertEqual(resultado.dt, 0.5)
+        self.assertEqual(params.dt, 1.0)  # a redução não vaza para os parâmetros
+        self.assertEqual([o['nome'] for o in resultado.ocorrencias], ['divergencia'])
+        self.assertTrue(np.all(np.isfinite(estado.dados)))
+
+    def test_eventos(self):
+        params = Parametros(Nx=16, Ny=12, sigma=1.5, chi=0.005, integrador='imex', dt=1.0)
+        estado = self._estado(params)
+        with tempfile.TemporaryDirectory() as diretorio:
+            eventos = [Evento('poluicao', 'P_max', 5.0, acao='checkpoint'),
+                       Evento('produto', 'Y_total', 1e6)]
+            resultado = ControladorExecucao(Dinamica(params), intervalo=5, eventos=eventos,
+                                            diretorio=diretorio).executar(estado, 5000)
+            self.assertEqual(resultado.motivo, 'evento:produto')
+            self.assertGreater(estado.Y.sum() * estado.dx * estado.dy, 1e6)
+            self.assertEqual([o['nome'] for o in resultado.ocorrencias], ['poluicao', 'produto'])
+            self.assertEqual(len(resultado.checkpoints), 1)
+
+            restaurado = Estado(params)
+            passo = carregar_checkpoint(resultado.checkpoints[0], restaurado)
+            self.assertEqual(passo, resultado.ocorrencias[0]['passo'])
+            self.assertGreater(restaurado.P.max(), 5.0)
+            self.assertEqual(restaurado.t, float(passo))
+
+
+class TestServidor(unittest.TestCase):
+    def test_codificacao_com_perda_de_quadros(self):
+        """Diferenças decodificam com o erro de quantização mesmo pulando quadros intermediários."""
+        params = Parametros(Nx=24, Ny=20, integrador='imex', dt=0.1)
+        np.random.seed(0)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        dinamica = Dinamica(params)
+        buffer = BufferQuadros(estado.K.shape)
+        codificador = CodificadorQuadros(bits=8, intervalo_chave=5)
+        decodificador = DecodificadorQuadros()
+        chaves = 0
+        for passo in range(12):
+            dinamica.passo(estado)
+            buffer.publicar(estado, passo)
+            quadro = buffer.ler()
+            mensagem, chave = codificador.codificar(quadro)
+            chaves += chave
+            if passo % 5 in (1, 2) and not chave:
+                continue  # cliente lento: perdeu este quadro
+            decodificado = decodificador.decodificar(mensagem)
+            self.assertEqual(decodificado.passo, passo)
+            for j in range(quadro.dados.shape[0]):
+                amplitude = np.ptp(quadro.dados[j]) or 1.0
+                np.testing.assert_array_less(np.abs(decodificado.dados[j] - quadro.dados[j]),
+                                             amplitude * 2.5 / 255)
+        self.assertEqual(chaves, 3)
+
+        # Sem o quadro-chave de referência a diferença é recusada
+        mensagem, chave = codificador.codificar(quadro)
+        self.assertFalse(chave)
+        self.assertIsNone(DecodificadorQuadros().decodificar(mensagem))
+
+    def test_fila_descarta_diferencas(self):
+        async def cenario():
+            fila = FilaCliente(tamanho=3)
+            fila.colocar(b'k1', chave=True)
+            for i in range(5):
+                fila.colocar(b'd%d' % i)
+            self.assertEqual(fila.descartados, 3)
+            fila.colocar(b'erro', quadro=False)
+            fila.colocar(b'k2', chave=True)
+            return [await fila.retirar() for _ in range(len(fila))]
+        self.assertEqual(asyncio.run(cenario()), [b'erro', b'k2'])
+
+    def test_varios_clientes(self):
+        async def cenario():
+            servidor = ServidorSimulacao(Parametros(Nx=16, Ny=12), fps=100)
+            porta = await servidor.iniciar()
+            clientes = [ClienteSimulacao() for _ in range(3)]
+            for cliente in clientes:
+                await cliente.conectar(porta=porta)
+            quadros = await asyncio.wait_for(asyncio.gather(*(c.receber() for c in clientes)), 10)
+            await clientes[0].definir_parametro('theta', 0.25)
+            await clientes[1].definir_parametro('Nx', 3)
+            while not clientes[1].erros:
+                await asyncio.wait_for(clientes[1].receber(), 10)
+            await clientes[2].pausar()
+            await asyncio.sleep(0.2)
+            pausado = servidor.trabalhador.rodando
+            for cliente in clientes:
+                await cliente.fechar()
+            await servidor.encerrar()
+            return servidor, quadros, clientes[1].erros, pausado
+        servidor, quadros, erros, rodando = asyncio.run(cenario())
+        self.assertEqual(servidor.params.theta, 0.25)
+        self.assertFalse(rodando)
+        self.assertEqual(len(erros), 1)
+        for quadro in quadros:
+            self.assertEqual(quadro.dados.shape, (6, 16, 12))
+
+    def test_valores_invalidos_e_falha_da_simulacao(self):
+        async def cenario():
+            servidor = ServidorSimulacao(Parametros(Nx=16, Ny=12), fps=100)
+            porta = await servidor.iniciar()
+            cliente = ClienteSimulacao()
+            await cliente.conectar(porta=porta)
+            invalidos = (('alpha', 'abc'), ('alpha', [0.2, 0.3]), ('integrador', 'rk4'),
+                         ('dt', 0), ('D_H', -1.0), ('precisao', 'misto'))
+            for nome, valor in invalidos:
+                await cliente.definir_parametro(nome, valor)
+            await cliente.definir_parametro('theta', '0.25')
+            while len(cliente.erros) < len(invalidos):
+                await asyncio.wait_for(cliente.receber(), 10)
+            await asyncio.sleep(0.1)
+            vivo = servidor.trabalhador.is_alive()
+            # Uma falha na thread de passos é informada aos clientes
+            servidor.trabalhador.agendar(lambda: 1 / 0)
+            async def receber_sempre():
+                while True:
+                    await cliente.receber()
+            recepcao = asyncio.create_task(receber_sempre())
+            inicio = time.perf_counter()
+            while len(cliente.erros) <= len(invalidos) and time.perf_counter() - inicio < 10:
+                await asyncio.sleep(0.01)
+            recepcao.cancel()
+            await cliente.fechar()
+            await servidor.encerrar()
+            return servidor, cliente.erros, vivo, len(invalidos)
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: None  # a falha provocada é esperada
+        try:
+            servidor, erros, vivo, n_invalidos = asyncio.run(cenario())
+        finally:
+            threading.excepthook = excepthook
+        self.assertTrue(vivo)
+        self.assertEqual(servidor.params.theta, 0.25)
+        self.assertEqual(servidor.params.alpha, Parametros().alpha)
+        self.assertIn('(deve ser > 0)', erros[3]['erro'])
+        self.assertIn('(deve ser >= 0)', erros[4]['erro'])
+        self.assertIn("'precisao'", erros[5]['erro'])
+        self.assertEqual(servidor.params.dt, Parametros().dt)
+        self.assertIn('ZeroDivisionError', erros[n_invalidos]['erro'])
+        self.assertIsInstance(servidor.trabalhador.erro, ZeroDivisionError)
+
+
+class TestEntrada(unittest.TestCase):
+    def test_importacao_sem_gui_e_rapida(self):
+        # Em um processo novo: o modelo e os comandos sem GUI não devem
+        # carregar scipy, tkinter nem matplotlib (numpy já carregado fora da conta)
+        codigo = (
+            "import sys, time, numpy; t = time.perf_counter(); "
+            "import main, src.model.dinamica, src.execucao.varredura, src.execucao.controle; "
+            "print(time.perf_counter() - t); "
+            "print(' '.join(sorted({m.split('.')[0] for m in sys.modules} & {'scipy', 'tkinter', 'matplotlib'})))"
+        )
+        raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, capture_output=True,
+                               text=True, check=True).stdout.splitlines()
+        self.assertLess(float(saida[0]), 0.5)
+        self.assertEqual(saida[1:], [''])
+
+    def test_executar_sem_gui(self):
+        import main
+        with tempfile.TemporaryDirectory() as diretorio, contextlib.redirect_stdout(io.StringIO()) as saida:
+            caminho = os.path.join(diretorio, 'estado.npz')
+            resultado = main.main(['executar', '--Nx', '12', '--Ny', '10', '--passos', '20',
+                                   '--param', 'sigma=1.5', '--param', 'integrador=imex', '--saida', caminho])
+            with np.load(caminho) as arquivo:
+                dados = arquivo['dados']
+
+        params = Parametros(Nx=12, Ny=10, sigma=1.5, integrador='imex')
+        referencia = executar_simulacao(params, 20)
+        np.testing.assert_array_equal(dados, referencia.dados)
+        self.assertEqual(resultado.passos, 20)
+        self.assertEqual(json.loads(saida.getvalue())['motivo'], 'passos')
+
+    def test_servidor_com_opcoes(self):
+        """As opções depois de `servidor` chegam ao parser do servidor."""
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            porta = s.getsockname()[1]
+        raiz = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        processo = subprocess.Popen([sys.executable, os.path.join(raiz, 'main.py'), 'servidor',
+                                     '--porta', str(porta), '--Nx', '8', '--Ny', '6'],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        async def cenario():
+            cliente = ClienteSimulacao()
+            inicio = time.perf_counter()
+            while True:
+                try:
+                    await cliente.conectar(porta=porta)
+                    break
+                except OSError:
+                    if processo.poll() is not None or time.perf_counter() - inicio > 10:
+                        raise
+                    await asyncio.sleep(0.05)
+            quadro = await asyncio.wait_for(cliente.receber(), 10)
+            await cliente.fechar()
+            return quadro
+        try:
+            quadro = asyncio.run(cenario())
+        finally:
+            processo.kill()
+            processo.wait()
+        self.assertEqual(quadro.dados.shape, (6, 8, 6))
+
+
+if __name__ == '__main__':
+    unittest.main()
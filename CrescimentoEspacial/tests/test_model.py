@@ -1,7 +1,9 @@
 import unittest
+import tracemalloc
 import numpy as np
 import sys
 import os
+from dataclasses import replace
 
 # Adicionar diretório raiz ao path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -9,6 +11,16 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.model.parametros import Parametros
 from src.model.estado import Estado
 from src.model.dinamica import Dinamica
+from src.model.spillover import SpilloverEspectral
+from src.model.difusao import DifusaoImplicita
+from src.model.operadores import laplaciano
+from src.model.passo_adaptativo import ControladorPasso
+from src.model.perfil import Perfilador
+from src.model.equilibrio import SolverEquilibrio
+from src.model.transferencia import restringir, prolongar
+from src.model.passo_esparso import PassoEsparso
+from src.model.cache import CacheOperadores
+from src.model.diagnostico import Diagnostico, Desigualdade
 
 class TestModelo(unittest.TestCase):
     def setUp(self):
@@ -44,5 +56,515 @@ class TestModelo(unittest.TestCase):
             
         self.assertTrue(np.all(np.isfinite(self.estado.K)), "Explosão numérica em K")
 
+class TestBufferContiguo(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=64, Ny=48)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+        self.dinamica = Dinamica(self.params)
+
+    def test_campos_sao_vistas_do_bloco(self):
+        """Os campos compartilham memória com o bloco contíguo (campos, Nx, Ny)."""
+        self.assertTrue(self.estado.dados.flags['C_CONTIGUOUS'])
+        self.assertEqual(self.estado.dados.shape, (9, 64, 48))
+        self.estado.K = np.full((64, 48), 3.0)
+        self.assertTrue(np.shares_memory(self.estado.K, self.estado.dados))
+        self.assertTrue(np.all(self.estado.dados[0] == 3.0))
+
+    def test_operadores_equivalentes(self):
+        """Laplaciano e gradiente in-place coincidem com scipy.ndimage.laplace e np.gradient."""
+        from scipy.ndimage import laplace
+        Z = np.random.default_rng(2).random((64, 48))
+        dx, dy = self.estado.dx, self.estado.dy
+        lap, grad_x, grad_y = self.dinamica.calcular_derivadas_espaciais(Z, dx, dy)
+        ref_y, ref_x = np.gradient(Z, dy, dx)
+        np.testing.assert_allclose(lap, laplace(Z, mode='nearest') / (dx * dy), atol=1e-12)
+        np.testing.assert_array_equal(grad_x, ref_x)
+        np.testing.assert_array_equal(grad_y, ref_y)
+
+    def test_passo_sem_alocacao(self):
+        """Após o aquecimento, o passo não aloca memória proporcional à grade."""
+        self.dinamica.passo(self.estado)
+        tracemalloc.start()
+        try:
+            self.dinamica.passo(self.estado)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(pico, self.estado.K.nbytes // 4)
+
+class TestEnsemble(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=20, Ny=16, s_rate=[0.1, 0.2, 0.4],
+                                 mu=[0.02, 0.05, 0.0], m_L=[0.2, 0.0, 0.5])
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+        self.dinamica = Dinamica(self.params)
+
+    def test_forma_do_lote(self):
+        self.assertEqual(self.params.n_membros(), 3)
+        self.assertEqual(self.estado.K.shape, (3, 20, 16))
+
+    def test_membros_identicos_ao_caminho_escalar(self):
+        """Cada membro do lote evolui exatamente como uma execução escalar isolada."""
+        membros = [self.estado.membro(i) for i in range(3)]
+        dinamicas = [Dinamica(m.params) for m in membros]
+        for _ in range(20):
+            self.dinamica.passo(self.estado)
+            for m, d in zip(membros, dinamicas):
+                d.passo(m)
+        for i, m in enumerate(membros):
+            np.testing.assert_array_equal(self.estado.membro(i).dados, m.dados)
+
+    def test_geometria_nao_pode_variar(self):
+        with self.assertRaises(ValueError):
+            Parametros(Nx=[10, 20]).n_membros()
+        with self.assertRaises(ValueError):
+            Parametros(mu=[0.1, 0.2], nu=[0.1, 0.2, 0.3]).n_membros()
+
+class TestIMEX(unittest.TestCase):
+    def _executar(self, params, passos):
+        np.random.seed(0)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        dinamica = Dinamica(params)
+        for _ in range(passos):
+            dinamica.passo(estado)
+        return estado
+
+    def test_resolve_sistema_implicito(self):
+        """A solução via DCT satisfaz (I - dt D lap) u = b com o Laplaciano do modelo."""
+        b = np.random.default_rng(3).random((18, 14))
+        u = DifusaoImplicita().resolver(b.copy(), 2.0, 0.5, 0.7, 0.7)
+        np.testing.assert_allclose(u - 0.5 * 2.0 * laplaciano(u, 0.7, 0.7), b, atol=1e-12)
+
+    def test_concorda_com_euler_em_dt_pequeno(self):
+        params = Parametros(Nx=30, Ny=30, dt=0.01)
+        euler = self._executar(params, 100)
+        params.integrador = 'imex'
+        imex = self._executar(params, 100)
+        for i in range(5):
+            escala = np.max(np.abs(euler.dados[i])) or 1.0
+            self.assertLess(np.max(np.abs(imex.dados[i] - euler.dados[i])) / escala, 1e-3)
+
+    def test_estavel_alem_do_limite_explicito(self):
+        """Em grade fina, dt acima de dx²/(4 D_P) explode com Euler mas não com IMEX."""
+        params = Parametros(Nx=100, Ny=100, dt=0.5)
+        with np.errstate(all='ignore'):
+            euler = self._executar(params, 40)
+        self.assertFalse(np.all(np.isfinite(euler.prognosticos)))
+        params.integrador = 'imex'
+        imex = self._executar(params, 40)
+        self.assertTrue(np.all(np.isfinite(imex.prognosticos)))
+
+class TestPassoAdaptativo(unittest.TestCase):
+    def _novo_estado(self, params):
+        np.random.seed(0)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        return estado
+
+    def test_precisao_com_poucas_avaliacoes(self):
+        """Atinge o tempo alvo com erro controlado e menos avaliações que o dt fixo padrão."""
+        params = Parametros(Nx=20, Ny=20, dt=0.001)
+        referencia = self._novo_estado(params)
+        dinamica = Dinamica(params)
+        for _ in range(2000):
+            dinamica.passo(referencia)
+
+        estado = self._novo_estado(params)
+        controlador = ControladorPasso(Dinamica(params), rtol=1e-3, dt_inicial=0.1)
+        controlador.avancar_ate(estado, 2.0)
+        self.assertAlmostEqual(estado.t, 2.0, places=12)
+        self.assertLess(controlador.avaliacoes, 20)  # dt fixo de 0.1: 20 avaliações
+        for i in range(5):
+            erro = np.max(np.abs(estado.dados[i] - referencia.dados[i])) / np.max(np.abs(referencia.dados[i]))
+            self.assertLess(erro, 2e-3)
+
+    def test_rejeita_passos_grandes(self):
+        """Sem os limites de estabilidade, um dt inicial enorme é rejeitado e reduzido."""
+        params = Parametros(Nx=20, Ny=20)
+        estado = self._novo_estado(params)
+        controlador = ControladorPasso(Dinamica(params), dt_inicial=50.0, cfl=np.inf,
+                                       numero_difusao=np.inf)
+        with np.errstate(all='ignore'):
+            dt = controlador.passo(estado)
+        self.assertGreater(controlador.rejeitados, 0)
+        self.assertLess(dt, 50.0)
+        self.assertTrue(np.all(np.isfinite(estado.prognosticos)))
+
+    def test_limite_de_estabilidade(self):
+        params = Parametros(Nx=100, Ny=100)
+        estado = self._novo_estado(params)
+        dinamica = Dinamica(params)
+        dinamica.tendencias(estado)
+        controlador = ControladorPasso(dinamica)
+        # Número de difusão: 0.25 * dx * dy / D_P
+        self.assertLessEqual(controlador.dt_estavel(estado), 0.25 * estado.dx * estado.dy / params.D_P)
+
+    def test_t_limite_com_dt_min_e_ensemble(self):
+        """O passo não ultrapassa t_limite, mesmo abaixo de dt_min, também em ensemble."""
+        params = Parametros(Nx=12, Ny=10, s_rate=[0.2, 0.3])
+        estado = self._novo_estado(params)
+        controlador = ControladorPasso(Dinamica(params), dt_inicial=0.05, dt_min=0.01)
+        controlador.avancar_ate(estado, 0.1)
+        proposta = controlador.dt
+        dt = controlador.passo(estado, t_limite=0.105)
+        self.assertAlmostEqual(dt, 0.005, places=12)
+        np.testing.assert_allclose(estado.t, 0.105, rtol=0, atol=1e-12)
+        # O passo curto até t_limite não encolhe a proposta para o próximo
+        self.assertGreaterEqual(controlador.dt, proposta)
+
+class TestSpillover(unittest.TestCase):
+    def _comparar(self, A, kernel, modo, modo_scipy):
+        from scipy.ndimage import convolve
+        esperado = convolve(A, kernel, mode=modo_scipy)
+        obtido = SpilloverEspectral(kernel, modo).aplicar(A)
+        erro = np.max(np.abs(obtido - esperado)) / np.max(np.abs(esperado))
+        self.assertLess(erro, SpilloverEspectral.TOLERANCIA)
+
+    def test_equivalente_convolucao_direta(self):
+        """A convolução espectral reproduz scipy.ndimage.convolve (nearest e wrap)."""
+        rng = np.random.default_rng(0)
+        for forma_kernel in [(7, 5), (6, 9), (20, 20)]:
+            A = rng.random((20, 15))
+            kernel = rng.random(forma_kernel)
+            self._comparar(A, kernel, 'nearest', 'nearest')
+            self._comparar(A, kernel, 'periodico', 'wrap')
+
+    def test_kernel_do_modelo(self):
+        """O kernel completo da Dinamica dá o mesmo spillover que a convolução direta."""
+        params = Parametros(Nx=24, Ny=24)
+        dinamica = Dinamica(params)
+        A = np.random.default_rng(1).random((24, 24))
+        self._comparar(A, dinamica.kernel_spillover, 'nearest', 'nearest')
+
+class TestPerfil(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=24, Ny=20)
+        np.random.seed(5)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+
+    def test_relatorio_por_etapa(self):
+        """As etapas são contadas por passo e o perfilador não altera o resultado."""
+        referencia = Estado(self.params)
+        referencia.dados[...] = self.estado.dados
+        Dinamica(self.params).passo(referencia)
+        Dinamica(self.params).passo(referencia)
+
+        dinamica = Dinamica(self.params)
+        dinamica.perfilador = Perfilador()
+        dinamica.passo(self.estado)
+        dinamica.passo(self.estado)
+        np.testing.assert_array_equal(self.estado.dados, referencia.dados)
+
+        relatorio = dinamica.perfilador.relatorio()
+        self.assertEqual(list(relatorio)[0], 'passo')
+        self.assertEqual(relatorio['passo']['chamadas'], 2)
+        self.assertEqual(relatorio['passo/tendencias/tecnologia/spillover']['chamadas'], 2)
+        self.assertEqual(relatorio['passo/tendencias/populacao/migracao']['chamadas'], 2)
+        self.assertAlmostEqual(relatorio['passo']['fracao'], 1.0)
+        self.assertLessEqual(relatorio['passo/atualizacao']['fracao'], 1.0)
+        self.assertIsNone(relatorio['passo']['bytes'])
+
+    def test_memoria_por_etapa(self):
+        params = Parametros(Nx=64, Ny=64)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        dinamica = Dinamica(params)
+        dinamica.passo(estado)  # alocar o espaço de trabalho antes de medir
+        dinamica.perfilador = Perfilador(memoria=True)
+        try:
+            dinamica.passo(estado)
+        finally:
+            dinamica.perfilador.encerrar()
+        relatorio = dinamica.perfilador.relatorio()
+        # Passo sem alocações de campos: só o custo fixo da instrumentação
+        self.assertGreater(relatorio['passo']['bytes'], 0)
+        self.assertLess(relatorio['passo']['bytes'], estado.K.nbytes // 2)
+
+class TestPrecisao(unittest.TestCase):
+    def _rodar(self, precisao, passos=200):
+        params = Parametros(Nx=24, Ny=20, precisao=precisao)
+        np.random.seed(11)
+        estado = Estado(params)
+        estado.inicializar_com_ruido()
+        dinamica = Dinamica(params)
+        for _ in range(passos):
+            dinamica.passo(estado)
+        return estado, dinamica
+
+    def test_float32_roda_em_float32(self):
+        estado, dinamica = self._rodar('float32', passos=2)
+        self.assertEqual(estado.dados.dtype, np.float32)
+        self.assertEqual(dinamica.espaco_trabalho(estado).tmp.dtype, np.float32)
+        self.assertEqual(estado.Y.dtype, np.float32)
+        with self.assertRaises(ValueError):
+            Parametros(precisao='float16').tipo()
+
+    def test_misto_mais_proximo_da_referencia(self):
+        referencia = self._rodar('float64')[0].dados
+        erro = {}
+        for precisao in ('float32', 'misto'):
+            dados = self._rodar(precisao)[0].dados
+            erro[precisao] = np.abs(dados - referencia).max() / np.abs(referencia).max()
+        self.assertLess(erro['float32'], 1e-5)
+        self.assertLess(erro['misto'], erro['float32'])
+
+    def test_misto_imex(self):
+        """Com IMEX, a compensação sobrevive à solução implícita: misto bem mais perto do float64."""
+        def rodar(precisao):
+            params = Parametros(Nx=24, Ny=20, precisao=precisao, integrador='imex', dt=0.5,
+                                sigma=1.5, chi=0.005)
+            np.random.seed(11)
+            estado = Estado(params)
+            estado.inicializar_com_ruido()
+            dinamica = Dinamica(params)
+            for _ in range(200):
+                dinamica.passo(estado)
+            return estado.prognosticos
+        referencia = rodar('float64')
+        escala = np.abs(referencia).max(axis=(1, 2))
+        erro = {precisao: np.abs(rodar(precisao) - referencia).max(axis=(1, 2)) / escala
+                for precisao in ('float32', 'misto')}
+        np.testing.assert_array_less(erro['misto'], erro['float32'] / 4)
+
+    def test_misto_reusar_dinamica(self):
+        """A compensação de Euler pertence ao estado: reusar a Dinamica (reset da GUI) não a herda."""
+        _, dinamica = self._rodar('misto', passos=20)
+        reusado = self._rodar('misto', passos=0)[0]
+        novo, outra = self._rodar('misto', passos=0)
+        for _ in range(20):
+            dinamica.passo(reusado)
+            outra.passo(novo)
+        np.testing.assert_array_equal(reusado.dados, novo.dados)
+
+        # Voltar os dados (como no rollback do controlador) zera a compensação
+        novo.zerar_compensacao()
+        self.assertFalse(np.any(novo.compensacao))
+
+class TestEquilibrio(unittest.TestCase):
+    def setUp(self):
+        # sigma > 1 e spillover fraco: parâmetros com equilíbrio estável
+        self.params = Parametros(Nx=16, Ny=12, sigma=1.5, chi=0.005, integrador='imex', dt=1.0)
+        np.random.seed(2)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido()
+
+    def test_equilibrio_e_estacionario(self):
+        """Longe do equilíbrio o solver usa a continuação e converge para um estado estacionário."""
+        resultado = SolverEquilibrio(Dinamica(self.params)).resolver(self.estado)
+        self.assertTrue(resultado.convergiu)
+        self.assertLess(resultado.residuo, 1e-8)
+        historico = resultado.historico
+        self.assertEqual(len(historico), resultado.iteracoes + 1)
+        self.assertTrue(any(np.isfinite(h['tau']) for h in historico))
+        self.assertTrue(np.isinf(historico[-1]['tau']))
+
+        equilibrio = self.estado.dados.copy()
+        dinamica = Dinamica(self.params)
+        for _ in range(20):
+            dinamica.passo(self.estado)
+        np.testing.assert_allclose(self.estado.dados, equilibrio, rtol=1e-8)
+
+    def test_newton_perto_do_equilibrio(self):
+        solver = SolverEquilibrio(Dinamica(self.params))
+        solver.resolver(self.estado)
+        self.estado.K *= 1.01
+        resultado = solver.resolver(self.estado)
+        self.assertTrue(resultado.convergiu)
+        self.assertLessEqual(resultado.iteracoes, 6)
+        self.assertTrue(all(np.isinf(h['tau']) for h in resultado.historico))
+
+class TestTransferencia(unittest.TestCase):
+    def test_conservacao(self):
+        np.random.seed(4)
+        Z = np.random.rand(2, 25, 18) + 1.0
+        grosso = restringir(Z, (13, 9))
+        # Integral preservada (células de área 1/(n0 n1) no mesmo domínio)
+        np.testing.assert_allclose(grosso.mean(axis=(-2, -1)), Z.mean(axis=(-2, -1)))
+        fino = prolongar(grosso, (25, 18))
+        np.testing.assert_allclose(restringir(fino, (13, 9)), grosso, atol=1e-13)
+
+    def test_prolongamento_de_segunda_ordem(self):
+        erros = []
+        for n in (32, 64):
+            x = (np.arange(n) + 0.5) / n
+            Z = np.sin(3 * x)[:, None] + np.cos(2 * x)[None, :]
+            erros.append(np.abs(prolongar(restringir(Z, (n // 2, n // 2)), (n, n)) - Z).max())
+        self.assertLess(erros[1], erros[0] / 3.5)
+
+class TestPassoEsparso(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=50, Ny=45, sigma=1.5, chi=0.005, dt=0.05)
+
+    def test_todos_ativos_reproduz_passo(self):
+        np.random.seed(8)
+        referencia = Estado(self.params)
+        referencia.inicializar_com_ruido()
+        estado = Estado(self.params)
+        estado.dados[...] = referencia.dados
+        dinamica = Dinamica(self.params)
+        esparso = PassoEsparso(Dinamica(self.params), tamanho_bloco=8, tol=0.0, lote=7)
+        for _ in range(10):
+            dinamica.passo(referencia)
+            esparso.passo(estado)
+        np.testing.assert_allclose(estado.dados, referencia.dados, rtol=1e-12, atol=1e-14)
+        self.assertEqual(esparso.estatisticas()['fracao_pulada'], 0.0)
+
+    def test_pula_regioes_em_equilibrio(self):
+        """Com uma perturbação local sobre o equilíbrio, só os blocos próximos são avaliados."""
+        # Equilíbrio uniforme: a partir do estado inicial uniforme, passos
+        # IMEX longos e um polimento com o solver de equilíbrio
+        longo = replace(self.params, integrador='imex', dt=2.0)
+        referencia = Estado(longo)
+        dinamica = Dinamica(longo)
+        for _ in range(600):
+            dinamica.passo(referencia)
+        SolverEquilibrio(Dinamica(self.params)).resolver(referencia)
+        referencia.t = 0.0
+        # Perturbar um canto
+        referencia.K[5:10, 5:10] *= 1.2
+        estado = Estado(self.params)
+        estado.dados[...] = referencia.dados
+        dinamica = Dinamica(self.params)
+        esparso = PassoEsparso(Dinamica(self.params), tamanho_bloco=8, tol=1e-8, revisao=1000)
+        for _ in range(20):
+            dinamica.passo(referencia)
+            esparso.passo(estado)
+        estatisticas = esparso.estatisticas()
+        self.assertGreater(estatisticas['fracao_pulada'], 0.3)
+        self.assertLess(estatisticas['blocos_ativos'], estatisticas['blocos'])
+        erro = np.abs(estado.prognosticos - referencia.prognosticos).max(axis=(1, 2))
+        np.testing.assert_array_less(erro, 1e-6 * referencia.prognosticos.max(axis=(1, 2)))
+
+    def test_passo_completo_conta_variacao_de_A(self):
+        """Depois de um passo completo que move A além de tol_spillover, o spillover é recalculado."""
+        np.random.seed(8)
+        estado = Estado(self.params)
+        estado.inicializar_com_ruido()
+        dA = Dinamica(self.params).tendencias(estado).dA
+        variacao = float(np.abs(dA).max()) * self.params.dt
+        esparso = PassoEsparso(Dinamica(self.params), tamanho_bloco=8, revisao=2,
+                               tol_spillover=0.5 * variacao)
+        esparso.passo(estado)  # completo
+        self.assertEqual(esparso.recalculos_spillover, 0)
+        esparso.passo(estado)  # esparso
+        self.assertEqual(esparso.recalculos_spillover, 1)
+
+    def test_so_euler(self):
+        with self.assertRaises(ValueError):
+            PassoEsparso(Dinamica(Parametros(Nx=20, Ny=20, integrador='imex')))
+
+class TestCache(unittest.TestCase):
+    def test_acertos_e_descarte_lru(self):
+        cache = CacheOperadores(max_bytes=2 * 800)
+        construidos = []
+
+        def construir(n):
+            construidos.append(n)
+            return np.full(100, float(n))
+        for n in (1, 2, 1, 3):
+            cache.obter('teste', n, lambda: construir(n))
+        # 2 era o menos usado quando 3 entrou
+        self.assertEqual(construidos, [1, 2, 3])
+        cache.obter('teste', 1, lambda: construir(1))
+        cache.obter('teste', 2, lambda: construir(2))
+        self.assertEqual(construidos, [1, 2, 3, 2])
+        estatisticas = cache.estatisticas()
+        self.assertEqual((estatisticas['acertos'], estatisticas['faltas']), (2, 4))
+        self.assertEqual(estatisticas['entradas'], 2)
+        self.assertEqual(estatisticas['bytes'], 1600)
+        with self.assertRaises(ValueError):
+            cache.obter('teste', 2, None)[0] = 0.0  # somente leitura
+
+    def test_persistencia_em_disco(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as diretorio:
+            original = (np.arange(6.0).reshape(2, 3), np.ones(4, dtype=np.complex128))
+            CacheOperadores(diretorio=diretorio).obter('par', ('a', 3), lambda: original)
+            outro = CacheOperadores(diretorio=diretorio)
+            lido = outro.obter('par', ('a', 3), lambda: self.fail("deveria vir do disco"))
+            for a, b in zip(original, lido):
+                np.testing.assert_array_equal(a, b)
+                self.assertEqual(a.dtype, b.dtype)
+            self.assertEqual(outro.estatisticas()['lidos_disco'], 1)
+
+    def test_operadores_compartilhados_entre_instancias(self):
+        params = Parametros(Nx=24, Ny=20)
+        a, b = Dinamica(params), Dinamica(params)
+        self.assertIs(a.kernel_spillover, b.kernel_spillover)
+        Z = np.random.default_rng(0).random((24, 20))
+        a.spillover.aplicar(Z)
+        b.spillover.aplicar(Z)
+        self.assertIs(a.spillover.plano(Z.shape).espectro, b.spillover.plano(Z.shape).espectro)
+        self.assertIs(Estado(params).X, Estado(params).X)
+
+class TestDiagnostico(unittest.TestCase):
+    def setUp(self):
+        self.params = Parametros(Nx=32, Ny=24, sigma=1.5, chi=0.005, integrador='imex', dt=0.1)
+        np.random.seed(1)
+        self.estado = Estado(self.params)
+        self.estado.inicializar_com_ruido(0.5)
+        self.dinamica = Dinamica(self.params)
+
+    def test_desigualdade(self):
+        ws = self.dinamica.tendencias(self.estado)
+        gini, theil = Desigualdade()(self.estado, ws)
+        Y, L = self.estado.Y.ravel(), self.estado.L.ravel()
+        y = Y / L
+        ordem = np.argsort(y)
+        p, s = L[ordem] / L.sum(), Y[ordem] / Y.sum()
+        self.assertAlmostEqual(gini, 1 - np.sum(p * (2 * (np.cumsum(s) - s) + s)), places=4)
+        self.assertAlmostEqual(theil, np.sum(Y / Y.sum() * np.log(y * L.sum() / Y.sum())), places=10)
+
+    def test_series_com_memoria_fixa(self):
+        diagnostico = Diagnostico(capacidade=8)
+        self.dinamica.diagnostico = diagnostico
+        Y_total = []
+        for _ in range(50):
+            self.dinamica.passo(self.estado)
+            Y_total.append(self.estado.Y.sum() * self.estado.dx * self.estado.dy)
+        series = diagnostico.series()
+        self.assertLessEqual(len(series['passo']), 8)
+        self.assertEqual(diagnostico.espacamento, 8)
+        np.testing.assert_array_equal(series['passo'], np.arange(0, 50, 8))
+        np.testing.assert_allclose(series['Y_total'], np.array(Y_total)[::8])
+        resumo = diagnostico.resumo()
+        self.assertAlmostEqual(resumo['Y_total']['media'], np.mean(Y_total))
+        self.assertAlmostEqual(resumo['Y_total']['max'], np.max(Y_total))
+        contagens = diagnostico.histogramas()['exposicao'][1]
+        area = self.estado.dx * self.estado.dy
+        self.assertAlmostEqual(contagens.sum() * area / 50, resumo['L_total']['media'])
+
+    def test_outros_passos(self):
+        """ControladorPasso chama o diagnóstico a cada passo aceito; PassoEsparso o recusa."""
+        params = Parametros(Nx=32, Ny=24, sigma=1.5, chi=0.005)
+        dinamica = Dinamica(params)
+        dinamica.diagnostico = Diagnostico()
+        controlador = ControladorPasso(dinamica, dt_inicial=0.05)
+        aceitos = controlador.avancar_ate(self.estado, 1.0)
+        self.assertEqual(len(dinamica.diagnostico.series()['passo']), aceitos)
+        with self.assertRaises(ValueError):
+            PassoEsparso(dinamica, tamanho_bloco=8).passo(self.estado)
+
+    def test_ensemble_por_membro(self):
+        params = Parametros(Nx=32, Ny=24, sigma=1.5, chi=0.005, integrador='imex', dt=0.1,
+                            theta=[1.0, 0.5])
+        estado = Estado(params)
+        estado.dados[:] = self.estado.dados[:, None]
+        dinamica = Dinamica(params)
+        dinamica.diagnostico = Diagnostico()
+        self.dinamica.diagnostico = Diagnostico()
+        for _ in range(3):
+            dinamica.passo(estado)
+            self.dinamica.passo(self.estado)
+        conjunto, unico = dinamica.diagnostico.series(), self.dinamica.diagnostico.series()
+        self.assertEqual(conjunto['gini'].shape, (3, 2))
+        for nome in ('Y_total', 'gini', 'theil', 'exposicao_P', 'fluxo_L'):
+            np.testing.assert_allclose(conjunto[nome][:, 0], unico[nome], rtol=1e-6)
+
+
 if __name__ == '__main__':
     unittest.main()